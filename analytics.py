@@ -0,0 +1,273 @@
+"""Vectorized analytics over the tracker's numeric history.
+
+The numeric columns of mood_entries are loaded once into NumPy arrays and
+every statistic is computed on whole columns: correlation matrices, rolling
+means, EWMA, linear trends with confidence intervals and day-of-week effects.
+
+NumPy is optional for the rest of the app; `numpy_available()` tells callers
+whether this module can be used. It is only imported then, as importing it
+takes longer than the rest of startup.
+"""
+
+import functools
+
+# Set by numpy_available()
+np = None
+
+
+# Numeric mood_entries columns loaded by the engine
+METRICS = ('mood_score', 'energy_level', 'sleep_hours', 'stress_level', 'anxiety_level')
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Two-sided 95% normal quantile for trend confidence intervals
+Z_95 = 1.959963984540054
+
+# EWMA is evaluated in closed form over blocks short enough that
+# (1 - alpha) ** -block stays well inside float range
+EWMA_MAX_GROWTH = 1e150
+
+
+@functools.cache
+def numpy_available():
+    """Whether NumPy is installed, importing it on the first call"""
+    global np
+    try:
+        import numpy
+    except ImportError:  # The tracker works without NumPy, just without this module
+        return False
+    np = numpy
+    return True
+
+
+class AnalyticsEngine:
+    """Columnar view of the entry history with vectorized statistics.
+
+    `days` holds each entry's date as days since 1970-01-01 in ascending
+    order, NaN for dates that aren't ISO dates; every metric is a float array
+    aligned with it, with NaN where a value was not recorded.
+    """
+
+    def __init__(self, days, columns):
+        if not numpy_available():
+            raise RuntimeError("NumPy is required for the analytics engine")
+        self.days = np.asarray(days, dtype=np.float64)
+        self.columns = {name: np.asarray(columns[name], dtype=np.float64) for name in METRICS}
+
+    @classmethod
+    def from_connection(cls, conn):
+        """Load the numeric columns with a single ordered scan"""
+        if not numpy_available():
+            raise RuntimeError("NumPy is required for the analytics engine")
+        # SQLite turns the ISO dates into epoch days, so no Python date parsing
+        rows = conn.execute(f'''
+            SELECT CAST(julianday(date) - 2440587.5 AS INTEGER), {', '.join(METRICS)}
+            FROM mood_entries ORDER BY date
+        ''').fetchall()
+        if not rows:
+            return cls(np.empty(0), {name: np.empty(0) for name in METRICS})
+
+        # None becomes NaN in a float array
+        table = np.array(rows, dtype=np.float64)
+        columns = {name: table[:, i + 1] for i, name in enumerate(METRICS)}
+        return cls(table[:, 0], columns)
+
+    @classmethod
+    def from_cache(cls, cache):
+        """Build from an EntryCache's packed columns without querying SQLite"""
+        return cls(cache.numpy_column('days'),
+                   {name: cache.numpy_column(name) for name in METRICS})
+
+    def __len__(self):
+        return len(self.days)
+
+    def correlation_matrix(self, method='pearson'):
+        """Pairwise correlations between metrics, using rows where both are set.
+
+        `method` is 'pearson' or 'spearman'. Returns (names, matrix).
+        """
+        if method not in ('pearson', 'spearman'):
+            raise ValueError(f"unknown correlation method {method!r}")
+        data = np.vstack([self.columns[name] for name in METRICS])
+        present = ~np.isnan(data)
+
+        size = len(METRICS)
+        matrix = np.full((size, size), np.nan)
+        for i in range(size):
+            matrix[i, i] = 1.0
+            for j in range(i + 1, size):
+                both = present[i] & present[j]
+                if both.sum() > 2:
+                    x, y = data[i][both], data[j][both]
+                    if method == 'spearman':
+                        # Ranked among the rows both are set in, not all of each column
+                        x, y = rank_with_nan(x), rank_with_nan(y)
+                    matrix[i, j] = matrix[j, i] = pearson(x, y)
+        return METRICS, matrix
+
+    def rolling_mean(self, metric, window=7):
+        """Mean over the last `window` entries at each position, ignoring NaN.
+
+        Positions with no recorded value in their window are NaN.
+        """
+        values = self.columns[metric]
+        present = ~np.isnan(values)
+        sums = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+        counts = np.concatenate(([0], np.cumsum(present)))
+        start = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+        end = np.arange(1, len(values) + 1)
+        window_counts = counts[end] - counts[start]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (sums[end] - sums[start]) / window_counts
+
+    def ewma(self, metric, alpha=0.2):
+        """Exponentially weighted moving average, carrying forward over NaN"""
+        values = self.columns[metric]
+        present = ~np.isnan(values)
+        if not present.any():
+            return np.full(len(values), np.nan)
+
+        # Gaps repeat the previous average, as if the value had not changed
+        first = int(np.argmax(present))
+        index = np.where(present, np.arange(len(values)), 0)
+        np.maximum.accumulate(index, out=index)
+        filled = values[index]
+
+        result = np.full(len(values), np.nan)
+        decay = 1.0 - alpha
+        if decay <= 0:
+            result[first:] = filled[first:]
+            return result
+
+        block = max(1, int(np.log(EWMA_MAX_GROWTH) / -np.log(decay)))
+        previous = filled[first]
+        for start in range(first, len(values), block):
+            chunk = filled[start:start + block]
+            powers = decay ** np.arange(1, len(chunk) + 1)
+            # y_k = decay^k * y_0 + alpha * sum_{i<=k} decay^(k-i) * x_i
+            result[start:start + len(chunk)] = powers * (previous + alpha * np.cumsum(chunk / powers))
+            previous = result[start + len(chunk) - 1]
+        return result
+
+    def trend(self, metric='mood_score', last_days=None):
+        """Least squares slope of `metric` per day with a 95% interval.
+
+        Uses entries in the last `last_days` days (all when None). Returns a
+        dict with slope, ci_low, ci_high, r_squared and n, or None when there
+        are fewer than three points.
+        """
+        values = self.columns[metric]
+        mask = ~np.isnan(values) & ~np.isnan(self.days)
+        if last_days is not None and mask.any():
+            mask &= self.days > np.nanmax(self.days) - last_days
+        x = self.days[mask]
+        y = values[mask]
+        n = len(x)
+        if n < 3:
+            return None
+
+        x_mean = x.mean()
+        y_mean = y.mean()
+        sxx = np.sum((x - x_mean) ** 2)
+        if sxx == 0:
+            return None
+        slope = np.sum((x - x_mean) * (y - y_mean)) / sxx
+        residuals = y - (y_mean + slope * (x - x_mean))
+        ss_res = np.sum(residuals ** 2)
+        ss_tot = np.sum((y - y_mean) ** 2)
+        stderr = np.sqrt(ss_res / (n - 2) / sxx)
+        return {
+            'slope': float(slope),
+            'ci_low': float(slope - Z_95 * stderr),
+            'ci_high': float(slope + Z_95 * stderr),
+            'r_squared': float(1 - ss_res / ss_tot) if ss_tot else 0.0,
+            'n': n,
+        }
+
+    def day_of_week(self, metric='mood_score'):
+        """Mean of `metric` per weekday (Monday first) and its offset from the overall mean"""
+        values = self.columns[metric]
+        present = ~np.isnan(values) & ~np.isnan(self.days)
+        # 1970-01-01 was a Thursday
+        weekday = (self.days[present].astype(np.int64) + 3) % 7
+        counts = np.bincount(weekday, minlength=7)
+        sums = np.bincount(weekday, weights=values[present], minlength=7)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        overall = values[present].mean() if present.any() else np.nan
+        return [(WEEKDAYS[i], int(counts[i]), float(means[i]), float(means[i] - overall))
+                for i in range(7)]
+
+    def summary(self):
+        """Everything the Insights tab shows, as plain Python values"""
+        names, pearson_matrix = self.correlation_matrix('pearson')
+        _, spearman_matrix = self.correlation_matrix('spearman')
+        return {
+            'entries': len(self),
+            'metrics': list(names),
+            'pearson': pearson_matrix.tolist(),
+            'spearman': spearman_matrix.tolist(),
+            'trend_30': self.trend('mood_score', 30),
+            'trend_all': self.trend('mood_score'),
+            'day_of_week': self.day_of_week('mood_score'),
+            'mood_rolling_7': float(self.rolling_mean('mood_score', 7)[-1]) if len(self) else None,
+            'mood_ewma': float(self.ewma('mood_score')[-1]) if len(self) else None,
+        }
+
+
+def pearson(x, y):
+    """Pearson correlation of two equal-length arrays without NaN"""
+    x = x - x.mean()
+    y = y - y.mean()
+    denominator = np.sqrt(np.dot(x, x) * np.dot(y, y))
+    return float(np.dot(x, y) / denominator) if denominator else np.nan
+
+
+def rank_with_nan(values):
+    """Average ranks (ties share their mean rank); NaN stays NaN"""
+    ranks = np.full(len(values), np.nan)
+    present = ~np.isnan(values)
+    _, inverse, counts = np.unique(values[present], return_inverse=True, return_counts=True)
+    # Rank of a value = rows below it + the middle of its tie group
+    upper = np.cumsum(counts)
+    ranks[present] = (upper - (counts - 1) / 2.0)[inverse]
+    return ranks
+
+
+def format_analytics(summary):
+    """Render an AnalyticsEngine.summary() as Insights text"""
+    lines = ["ADVANCED ANALYTICS:\n"]
+
+    names = summary['metrics']
+    mood = names.index('mood_score')
+    labels = {'energy_level': 'energy', 'sleep_hours': 'sleep',
+              'stress_level': 'stress', 'anxiety_level': 'anxiety'}
+    for i, name in enumerate(names):
+        if i == mood:
+            continue
+        r = summary['pearson'][mood][i]
+        rho = summary['spearman'][mood][i]
+        if r == r:  # not NaN
+            lines.append(f"• Mood vs {labels[name]}: r = {r:+.2f}, rho = {rho:+.2f}\n")
+
+    for label, trend in (("last 30 days", summary['trend_30']), ("all time", summary['trend_all'])):
+        if trend:
+            per_week = trend['slope'] * 7
+            significant = trend['ci_low'] > 0 or trend['ci_high'] < 0
+            lines.append(f"• Mood trend ({label}): {per_week:+.2f} points/week "
+                         f"(95% CI {trend['ci_low'] * 7:+.2f} to {trend['ci_high'] * 7:+.2f}"
+                         f"{'' if significant else ', not significant'})\n")
+
+    weekdays = [d for d in summary['day_of_week'] if d[1]]
+    if len(weekdays) > 1:
+        best = max(weekdays, key=lambda d: d[2])
+        worst = min(weekdays, key=lambda d: d[2])
+        lines.append(f"• Best day: {best[0]} ({best[3]:+.2f}), "
+                     f"hardest day: {worst[0]} ({worst[3]:+.2f})\n")
+
+    rolling = summary['mood_rolling_7']
+    if rolling is not None and rolling == rolling:
+        lines.append(f"• Mood 7-entry average: {rolling:.1f}, "
+                     f"smoothed (EWMA): {summary['mood_ewma']:.1f}\n")
+    lines.append("\n")
+    return "".join(lines)
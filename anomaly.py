@@ -0,0 +1,147 @@
+"""Streaming anomaly detection over saved entries.
+
+Each metric keeps running statistics updated in O(1) per save: Welford's
+mean and spread (the usual level, exact under edits and deletes), an EWMA
+of the recent level and a one-sided CUSUM in the concerning direction. A
+reading READING_SCORE deviations out is flagged, and so is a downturn once
+the CUSUM crosses CUSUM_THRESHOLD. tracker_core stores the state and alerts.
+"""
+
+import math
+
+
+# Bumped whenever the state layout changes, invalidating stored state
+STATE_FORMAT = 1
+
+# Metric -> (label, concerning direction: -1 for low values, 1 for high)
+ANOMALY_METRICS = {
+    'mood_score': ("Mood", -1),
+    'sleep_hours': ("Sleep", -1),
+    'stress_level': ("Stress", 1),
+    'anxiety_level': ("Anxiety", 1),
+}
+
+# Values of a metric seen before it can raise alerts
+MIN_READINGS = 14
+
+# Standard deviations from the usual level that flag a single reading
+READING_SCORE = 2.5
+
+# Weight of the newest value in the EWMA
+EWMA_ALPHA = 0.3
+
+# CUSUM allowance per day and alarm level, both in standard deviations
+CUSUM_SLACK = 0.5
+CUSUM_THRESHOLD = 5.0
+
+# Floor for the standard deviation, so someone who always logs the same
+# value isn't alerted about a one-point change
+MIN_DEVIATION = 0.5
+
+
+def new_metric_state():
+    return {'count': 0, 'mean': 0.0, 'm2': 0.0, 'ewma': None, 'cusum': 0.0,
+            'last_date': None, 'previous': None}
+
+
+class AnomalyDetector:
+    """Running statistics per ANOMALY_METRICS metric.
+
+    `version` is the database change counter the state reflects, as for
+    forecast.MoodModel.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.metrics = {metric: new_metric_state() for metric in ANOMALY_METRICS}
+
+    def update(self, date, entry, previous=None):
+        """Take in the entry saved for `date`, replacing `previous` if it
+        existed (both dicts of metric values); returns the alerts it raises.
+        Back-dated entries only update the usual levels, not EWMA and CUSUM"""
+        alerts = []
+        for metric, (label, direction) in ANOMALY_METRICS.items():
+            state = self.metrics[metric]
+            if previous is not None and previous.get(metric) is not None:
+                remove_value(state, previous[metric])
+            value = entry.get(metric)
+            if value is None:
+                continue
+            mean, deviation = state['mean'], standard_deviation(state)
+            ready = state['count'] >= MIN_READINGS
+            score = direction * (value - mean) / deviation
+            if ready and score >= READING_SCORE:
+                low_high = 'low' if direction < 0 else 'high'
+                alerts.append(alert(date, metric, 'reading', value, mean, score,
+                                    f"{label} of {value:g} is unusually {low_high} for you "
+                                    f"(usually {mean:.1f} ± {deviation:.1f})"))
+            add_value(state, value)
+
+            if state['last_date'] == date and state['previous'] is not None:
+                state['ewma'], state['cusum'] = state['previous']
+            elif state['last_date'] is not None and date < state['last_date']:
+                continue
+            state['previous'] = (state['ewma'], state['cusum'])
+            state['last_date'] = date
+            state['ewma'] = value if state['ewma'] is None else \
+                EWMA_ALPHA * value + (1 - EWMA_ALPHA) * state['ewma']
+            if ready:
+                state['cusum'] = max(0.0, state['cusum'] + min(score, READING_SCORE) - CUSUM_SLACK)
+                if state['cusum'] >= CUSUM_THRESHOLD:
+                    lower_higher = 'lower' if direction < 0 else 'higher'
+                    alerts.append(alert(date, metric, 'downturn', state['ewma'], mean,
+                                        state['cusum'],
+                                        f"{label} has been {lower_higher} than usual for "
+                                        f"several days (recently {state['ewma']:.1f}, "
+                                        f"usually {mean:.1f})"))
+                    state['cusum'] = 0.0
+        return alerts
+
+    def remove(self, entry):
+        """Take a deleted entry's values out of the usual levels"""
+        for metric in ANOMALY_METRICS:
+            if entry.get(metric) is not None:
+                remove_value(self.metrics[metric], entry[metric])
+
+    def to_dict(self):
+        return {'format': STATE_FORMAT, 'version': self.version, 'metrics': self.metrics}
+
+    @classmethod
+    def from_dict(cls, state):
+        """Restore a detector; raises ValueError for another format"""
+        if state.get('format') != STATE_FORMAT or set(state['metrics']) != set(ANOMALY_METRICS):
+            raise ValueError("stored detector state has a different layout")
+        detector = cls(state['version'])
+        for metric, values in state['metrics'].items():
+            if values['previous'] is not None:
+                values['previous'] = tuple(values['previous'])
+            detector.metrics[metric].update(values)
+        return detector
+
+
+def add_value(state, value):
+    state['count'] += 1
+    delta = value - state['mean']
+    state['mean'] += delta / state['count']
+    state['m2'] += delta * (value - state['mean'])
+
+
+def remove_value(state, value):
+    if state['count'] <= 1:
+        state.update(count=0, mean=0.0, m2=0.0)
+        return
+    state['count'] -= 1
+    delta = value - state['mean']
+    state['mean'] -= delta / state['count']
+    state['m2'] = max(0.0, state['m2'] - delta * (value - state['mean']))
+
+
+def standard_deviation(state):
+    if state['count'] < 2:
+        return MIN_DEVIATION
+    return max(math.sqrt(state['m2'] / (state['count'] - 1)), MIN_DEVIATION)
+
+
+def alert(date, metric, kind, value, expected, score, message):
+    return {'date': date, 'metric': metric, 'kind': kind, 'value': value,
+            'expected': expected, 'score': score, 'message': message}
@@ -0,0 +1,332 @@
+"""Compact columnar archive of mood entries (.mha files).
+
+An archive stores entries in date order, split into blocks of BLOCK_ROWS
+rows. Inside a block every column is stored contiguously:
+
+    days         int32    days since 1970-01-01
+    sleep_hours  float64  NaN for NULL
+    ratings      int8     one array per rating, -128 for NULL
+    tags         uint16 or uint32 indexes into the archive's tag dictionary
+                 (activities, triggers, medications; 0 is NULL)
+    text         zlib-compressed notes and created_at strings
+
+The file starts with a fixed HEADER that points at the tag dictionary and
+at the block index, which holds every block's first and last day. Readers
+memory-map the file, find the blocks overlapping a date range with a
+binary search over the index and decode only those, and only the columns
+asked for, so the notes of a block are not even decompressed unless
+needed. All integers are little-endian.
+"""
+
+import bisect
+import datetime
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+
+ARCHIVE_MAGIC = b'MHTA'
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = '.mha'
+
+# Columns of an archived entry: ENTRY_COLUMNS plus created_at
+ARCHIVE_COLUMNS = ('date', 'mood_score', 'energy_level', 'sleep_hours', 'stress_level',
+                   'anxiety_level', 'notes', 'activities', 'triggers', 'medications',
+                   'created_at')
+
+# Fixed-width columns in block order: name -> (array typecode, value standing in for NULL)
+NUMERIC_COLUMNS = {
+    'days': ('i', -2 ** 31),
+    'sleep_hours': ('d', float('nan')),
+    'mood_score': ('b', -128),
+    'energy_level': ('b', -128),
+    'stress_level': ('b', -128),
+    'anxiety_level': ('b', -128),
+}
+
+# Columns stored as indexes into the tag dictionary
+TAG_COLUMNS = ('activities', 'triggers', 'medications')
+
+# Columns stored in a block's compressed text section
+TEXT_COLUMNS = ('notes', 'created_at')
+
+# Rows per block; the unit of both compression and random access
+BLOCK_ROWS = 4096
+
+COMPRESSION_LEVEL = 6
+
+# magic, version, entries, blocks, dictionary offset, dictionary length, index offset
+HEADER = struct.Struct('<4sH2xQIQIQ')
+
+# first day, last day, rows, offset, length of the fixed-width columns,
+# length of the compressed text, typecode of the tag indexes
+BLOCK_ENTRY = struct.Struct('<iiIQII1s3x')
+
+EPOCH = datetime.date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def to_little_endian(values):
+    """The bytes of an array in the archive's byte order"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_little_endian(typecode, data):
+    """An array decoded from the archive's byte order"""
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def pack_strings(strings):
+    """Byte lengths (-1 for None) followed by the UTF-8 text of each string"""
+    encoded = [None if s is None else s.encode('utf-8') for s in strings]
+    lengths = array('i', [-1 if b is None else len(b) for b in encoded])
+    return to_little_endian(lengths) + b''.join(b for b in encoded if b)
+
+
+def unpack_strings(data, count, position=0):
+    """Inverse of pack_strings for `count` strings starting at `position`.
+
+    Returns the strings and the offset just past them.
+    """
+    lengths = from_little_endian('i', data[position:position + 4 * count])
+    strings = []
+    position += 4 * count
+    for length in lengths:
+        if length < 0:
+            strings.append(None)
+        else:
+            strings.append(data[position:position + length].decode('utf-8'))
+            position += length
+    return strings, position
+
+
+class ArchiveError(ValueError):
+    """Raised for files that are not valid archives"""
+
+
+class ArchiveWriter:
+    """Write ARCHIVE_COLUMNS rows, in date order, to a binary file object.
+
+    Rows are buffered into blocks; close() writes the last block, the tag
+    dictionary, the block index and finally the header.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.pending = []
+        self.entries = 0
+        self.index = []
+        self.tags = {None: 0}
+        self.last_day = None
+        f.write(bytes(HEADER.size))
+
+    def add_rows(self, rows):
+        """Append rows; their dates must be ascending and unique"""
+        self.pending.extend(rows)
+        while len(self.pending) >= BLOCK_ROWS:
+            self.write_block()
+
+    def write_block(self):
+        rows = self.pending[:BLOCK_ROWS]
+        del self.pending[:BLOCK_ROWS]
+        values = dict(zip(ARCHIVE_COLUMNS, zip(*rows)))
+
+        try:
+            days = [datetime.date.fromisoformat(d).toordinal() - EPOCH_ORDINAL
+                    for d in values['date']]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"can't archive entry date: {e}") from None
+        previous = self.last_day
+        for day in days:
+            if previous is not None and day <= previous:
+                raise ValueError("archive rows must be in ascending date order")
+            previous = day
+        self.last_day = previous
+        values['days'] = days
+
+        parts = []
+        for name, (typecode, null) in NUMERIC_COLUMNS.items():
+            try:
+                column = array(typecode, [null if v is None else v for v in values[name]])
+            except (TypeError, OverflowError):
+                raise ValueError(f"{name} values don't fit the archive format") from None
+            parts.append(to_little_endian(column))
+
+        # New tags take the next id; len() is evaluated before setdefault inserts
+        tags = self.tags
+        tag_ids = [[tags.setdefault(v, len(tags)) for v in values[name]] for name in TAG_COLUMNS]
+        typecode = 'H' if max(map(max, tag_ids)) < 1 << 16 else 'I'
+        parts.extend(to_little_endian(array(typecode, ids)) for ids in tag_ids)
+        columns = b''.join(parts)
+
+        text = zlib.compress(b''.join(pack_strings(values[name]) for name in TEXT_COLUMNS),
+                             COMPRESSION_LEVEL)
+
+        self.index.append(BLOCK_ENTRY.pack(days[0], days[-1], len(rows), self.f.tell(),
+                                           len(columns), len(text), typecode.encode()))
+        self.f.write(columns)
+        self.f.write(text)
+        self.entries += len(rows)
+
+    def close(self):
+        """Finish the archive; the file object is left open"""
+        if self.pending:
+            self.write_block()
+        dictionary_offset = self.f.tell()
+        strings = sorted(self.tags, key=self.tags.get)[1:]
+        dictionary = zlib.compress(len(strings).to_bytes(4, 'little') + pack_strings(strings),
+                                   COMPRESSION_LEVEL)
+        self.f.write(dictionary)
+        index_offset = self.f.tell()
+        self.f.write(b''.join(self.index))
+        end = self.f.tell()
+        self.f.seek(0)
+        self.f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, self.entries, len(self.index),
+                                 dictionary_offset, len(dictionary), index_offset))
+        self.f.seek(end)
+
+
+class ArchiveReader:
+    """Memory-mapped, read-only view of an archive file.
+
+    Use as a context manager or call close(). Rows come back as tuples of
+    the requested ARCHIVE_COLUMNS with dates as ISO strings.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ArchiveError(f"{filename} is empty") from None
+        try:
+            self.read_index()
+        except (ArchiveError, struct.error):
+            self.close()
+            raise ArchiveError(f"{filename} is not a mood entry archive") from None
+        self.tags = None
+        self.position = 0
+
+    def read_index(self):
+        magic, version, self.entries, blocks, self.dictionary_offset, \
+            self.dictionary_length, index_offset = HEADER.unpack_from(self.map)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ArchiveError()
+        self.blocks = [BLOCK_ENTRY.unpack_from(self.map, index_offset + i * BLOCK_ENTRY.size)
+                       for i in range(blocks)]
+        self.first_days = [block[0] for block in self.blocks]
+        self.last_days = [block[1] for block in self.blocks]
+
+    def __len__(self):
+        return self.entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def date_range(self):
+        """(first, last) ISO date in the archive, or None if it is empty"""
+        if not self.blocks:
+            return None
+        return (EPOCH.fromordinal(self.first_days[0] + EPOCH_ORDINAL).isoformat(),
+                EPOCH.fromordinal(self.last_days[-1] + EPOCH_ORDINAL).isoformat())
+
+    def tell(self):
+        """Offset just past the last block decoded, for progress reporting"""
+        return self.position
+
+    def tag_strings(self):
+        """The tag dictionary, decompressed on first use"""
+        if self.tags is None:
+            data = zlib.decompress(self.map[self.dictionary_offset:
+                                            self.dictionary_offset + self.dictionary_length])
+            count = int.from_bytes(data[:4], 'little')
+            self.tags = [None] + unpack_strings(data, count, 4)[0]
+        return self.tags
+
+    def iter_batches(self, start_date=None, end_date=None, columns=ARCHIVE_COLUMNS):
+        """Yield one list of row tuples per block overlapping [start_date, end_date].
+
+        Either bound may be None. Only the blocks in range are read, and
+        only the requested columns of them are decoded.
+        """
+        unknown = set(columns) - set(ARCHIVE_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown archive columns {sorted(unknown)}")
+        first = -2 ** 31 if start_date is None else to_day(start_date)
+        last = 2 ** 31 - 1 if end_date is None else to_day(end_date)
+
+        for i in range(bisect.bisect_left(self.last_days, first), len(self.blocks)):
+            if self.first_days[i] > last:
+                break
+            block = self.read_block(i, columns)
+            days = block.pop('days')
+            start = bisect.bisect_left(days, first)
+            end = bisect.bisect_right(days, last)
+            if start < end:
+                yield list(zip(*(block[name][start:end] for name in columns)))
+
+    def iter_records(self, start_date=None, end_date=None):
+        """Yield each entry in range as a dict of ARCHIVE_COLUMNS"""
+        for rows in self.iter_batches(start_date, end_date):
+            for row in rows:
+                yield dict(zip(ARCHIVE_COLUMNS, row))
+
+    def read_block(self, i, columns):
+        """Decode the requested columns of block i, plus days"""
+        _, _, rows, offset, length, text_length, typecode = self.blocks[i]
+        typecode = typecode.decode()
+        self.position = offset + length + text_length
+        values = {}
+        position = offset
+        for name, (numeric_type, null) in NUMERIC_COLUMNS.items():
+            size = rows * array(numeric_type).itemsize
+            if name == 'days' or name in columns:
+                column = from_little_endian(numeric_type, self.map[position:position + size])
+                if name == 'days':
+                    values[name] = column
+                elif null != null:  # NaN never compares equal, so test each value against itself
+                    values[name] = [None if v != v else v for v in column]
+                else:
+                    values[name] = [None if v == null else v for v in column]
+            position += size
+
+        size = rows * array(typecode).itemsize
+        for name in TAG_COLUMNS:
+            if name in columns:
+                tags = self.tag_strings()
+                values[name] = [tags[t] for t in from_little_endian(
+                    typecode, self.map[position:position + size])]
+            position += size
+
+        if any(name in columns for name in TEXT_COLUMNS):
+            text = zlib.decompress(self.map[position:position + text_length])
+            position = 0
+            for name in TEXT_COLUMNS:
+                values[name], position = unpack_strings(text, rows, position)
+
+        if 'date' in columns:
+            values['date'] = [EPOCH.fromordinal(d + EPOCH_ORDINAL).isoformat()
+                              for d in values['days']]
+        return values
+
+
+def to_day(date):
+    """Days since 1970-01-01 for an ISO date string"""
+    return datetime.date.fromisoformat(date).toordinal() - EPOCH_ORDINAL
@@ -0,0 +1,291 @@
+"""Online snapshots of a tracker database, and restoring from them.
+
+Snapshots are copied with SQLite's online backup API a few pages at a time,
+so saves carry on meanwhile, then gzip-compressed next to a manifest with
+their SHA-256. Only the newest `keep` are kept. A restore verifies the
+snapshot and snapshots the current data first.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from tracker_core import DEFAULT_PROFILE, connect, data_version, drop_entry_cache, insights_cache
+
+
+# Pages copied per backup step, and the pause between steps
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_PAUSE = 0.005
+
+# Snapshots kept per database; older ones are deleted after each new one
+KEEP_SNAPSHOTS = 7
+
+# Default time between scheduled snapshots, in seconds
+BACKUP_INTERVAL = 24 * 60 * 60
+
+# Compression takes most of a snapshot's time; level 1 is about three times faster
+# than the default 6 for files around 10% larger
+BACKUP_COMPRESSION_LEVEL = 1
+
+SNAPSHOT_SUFFIX = '.db.gz'
+
+CHUNK_SIZE = 1 << 20
+
+
+class BackupError(ValueError):
+    """Raised for missing, corrupt or unverifiable snapshots"""
+
+
+def backup_dir_for(db_path):
+    """Default backup directory of a database file"""
+    return db_path + '.backups'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def create_snapshot(db_path, backup_dir=None, keep=KEEP_SNAPSHOTS, profile=DEFAULT_PROFILE,
+                    pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE, label=None):
+    """Snapshot `db_path` into `backup_dir`; returns the snapshot's manifest.
+
+    The manifest dict also says how long the copy and the compression
+    took; `label` is stored with it, e.g. 'pre-restore'.
+    """
+    if not db_path or db_path == ':memory:':
+        raise ValueError("in-memory databases can't be backed up")
+    backup_dir = backup_dir or backup_dir_for(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    started = datetime.datetime.now(datetime.timezone.utc)
+    name = (os.path.splitext(os.path.basename(db_path))[0]
+            + started.strftime('-%Y%m%dT%H%M%S%fZ') + SNAPSHOT_SUFFIX)
+    path = os.path.join(backup_dir, name)
+
+    fd, copy_path = tempfile.mkstemp(suffix='.db', dir=backup_dir)
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        source = connect(db_path, profile)
+        steps = [0]
+
+        def progress(status, remaining, total):
+            steps[0] += 1
+            if remaining:
+                time.sleep(pause)
+
+        try:
+            target = sqlite3.connect(copy_path)
+            try:
+                wal = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+                if wal:
+                    # Pin the copy to one read snapshot, so saves made meanwhile don't
+                    # restart it; with a rollback journal this would block writers,
+                    # so there the copy is made in one step
+                    source.execute('BEGIN')
+                    source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+                source.backup(target, pages=pages if wal else -1, progress=progress)
+                if wal:
+                    source.rollback()
+                version = target.execute('SELECT value FROM change_counter').fetchone()[0]
+                entries = target.execute('SELECT COUNT(*) FROM mood_entries').fetchone()[0]
+            finally:
+                target.close()
+        finally:
+            source.close()
+        copy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(copy_path, 'rb') as src, \
+                gzip.open(path + '.tmp', 'wb', BACKUP_COMPRESSION_LEVEL) as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.replace(path + '.tmp', path)
+        compress_seconds = time.perf_counter() - start
+        size = os.path.getsize(copy_path)
+    finally:
+        for leftover in (copy_path, path + '.tmp'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    manifest = {
+        'snapshot': name,
+        'database': os.path.abspath(db_path),
+        'created_at': started.isoformat(),
+        'label': label,
+        'entries': entries,
+        'change_counter': version,
+        'size': size,
+        'compressed_size': os.path.getsize(path),
+        'sha256': file_sha256(path),
+        'steps': steps[0],
+        'copy_seconds': copy_seconds,
+        'compress_seconds': compress_seconds,
+    }
+    with open(path[:-len(SNAPSHOT_SUFFIX)] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    rotate_snapshots(backup_dir, keep)
+    return manifest
+
+
+def list_snapshots(backup_dir):
+    """Manifests of the snapshots in `backup_dir`, oldest first"""
+    manifests = []
+    if not os.path.isdir(backup_dir):
+        return manifests
+    for name in sorted(os.listdir(backup_dir)):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(backup_dir, name), encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if os.path.exists(os.path.join(backup_dir, manifest.get('snapshot', ''))):
+                manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m['created_at'])
+
+
+def rotate_snapshots(backup_dir, keep=KEEP_SNAPSHOTS):
+    """Delete all but the newest `keep` snapshots; returns the deleted names"""
+    snapshots = list_snapshots(backup_dir)
+    deleted = []
+    for manifest in snapshots[:max(len(snapshots) - keep, 0)]:
+        path = os.path.join(backup_dir, manifest['snapshot'])
+        os.remove(path)
+        os.remove(path[:-len(SNAPSHOT_SUFFIX)] + '.json')
+        deleted.append(manifest['snapshot'])
+    return deleted
+
+
+def find_snapshot(backup_dir, name):
+    """The manifest of a snapshot by file name, or the newest for 'latest'"""
+    snapshots = list_snapshots(backup_dir)
+    if name == 'latest' and snapshots:
+        return snapshots[-1]
+    for manifest in snapshots:
+        if manifest['snapshot'] in (name, os.path.basename(name)):
+            return manifest
+    raise BackupError(f"no snapshot {name!r} in {backup_dir}")
+
+
+def verify_snapshot(backup_dir, manifest):
+    """Check a snapshot's checksum; raises BackupError if it doesn't match"""
+    path = os.path.join(backup_dir, manifest['snapshot'])
+    if file_sha256(path) != manifest['sha256']:
+        raise BackupError(f"{manifest['snapshot']} does not match its checksum")
+
+
+def restore_snapshot(conn, backup_dir, name, keep=KEEP_SNAPSHOTS):
+    """Replace the contents of `conn`'s database with a snapshot.
+
+    The current data is snapshotted first (labelled 'pre-restore'), so a
+    restore can itself be undone. The change counter and the change log
+    sequence are moved past their pre-restore values, so caches keyed on
+    the counter and sync peers never mistake restored data for data they
+    have already seen. Returns the restored snapshot's manifest.
+    """
+    manifest = find_snapshot(backup_dir, name)
+    verify_snapshot(backup_dir, manifest)
+    path, version = data_version(conn)
+    sequence = conn.execute('''
+        SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'change_log'
+    ''').fetchone()[0]
+
+    fd, copy_path = tempfile.mkstemp(suffix='.db', dir=backup_dir)
+    os.close(fd)
+    try:
+        with gzip.open(os.path.join(backup_dir, manifest['snapshot']), 'rb') as src, \
+                open(copy_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        copy = sqlite3.connect(copy_path)
+        try:
+            if copy.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
+                raise BackupError(f"{manifest['snapshot']} failed the integrity check")
+            create_snapshot(path, backup_dir, keep=keep + 1, label='pre-restore')
+            copy.backup(conn)
+        finally:
+            copy.close()
+    finally:
+        os.remove(copy_path)
+
+    conn.execute('UPDATE change_counter SET value = MAX(value, ?) + 1', (version,))
+    conn.execute('''
+        UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'change_log'
+    ''', (sequence,))
+    conn.commit()
+    drop_entry_cache(conn)
+    insights_cache.pop(path, None)
+    return manifest
+
+
+class BackupScheduler:
+    """Takes a snapshot every `interval` seconds on a background thread.
+
+    The first one is taken straight away unless the newest snapshot is
+    younger than `interval`. on_done(manifest) or on_error(exception) is
+    called on the scheduler's thread after each attempt.
+    """
+
+    def __init__(self, db_path, backup_dir=None, interval=BACKUP_INTERVAL, keep=KEEP_SNAPSHOTS,
+                 profile=DEFAULT_PROFILE, on_done=None, on_error=None):
+        self.db_path = db_path
+        self.backup_dir = backup_dir or backup_dir_for(db_path)
+        self.interval = interval
+        self.keep = keep
+        self.profile = profile
+        self.on_done = on_done
+        self.on_error = on_error
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def next_delay(self):
+        snapshots = list_snapshots(self.backup_dir)
+        if not snapshots:
+            return 0
+        newest = datetime.datetime.fromisoformat(snapshots[-1]['created_at'])
+        age = (datetime.datetime.now(datetime.timezone.utc) - newest).total_seconds()
+        return max(self.interval - age, 0)
+
+    def snapshot_now(self):
+        """Take a snapshot on the calling thread, reporting to the callbacks"""
+        with self.lock:
+            try:
+                manifest = create_snapshot(self.db_path, self.backup_dir, self.keep, self.profile)
+            except (OSError, sqlite3.Error, ValueError) as e:
+                if self.on_error:
+                    self.on_error(e)
+                return None
+        if self.on_done:
+            self.on_done(manifest)
+        return manifest
+
+    def _run(self):
+        while not self.stopping.wait(self.next_delay()):
+            if self.snapshot_now() is None:
+                # Don't retry a failing backup in a tight loop
+                self.stopping.wait(min(self.interval, 60 * 60))
+
+
+def format_snapshot(manifest):
+    """One-line description of a snapshot manifest"""
+    label = f" [{manifest['label']}]" if manifest.get('label') else ""
+    return (f"{manifest['snapshot']}{label}: {manifest['entries']} entries, "
+            f"{manifest['compressed_size'] / 1024:.0f} KB "
+            f"(from {manifest['size'] / 1024:.0f} KB) in "
+            f"{manifest['copy_seconds'] + manifest['compress_seconds']:.2f}s")
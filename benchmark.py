@@ -0,0 +1,406 @@
+"""Benchmarks for the tracker's hot paths.
+
+Builds a temporary database filled with deterministic synthetic entries, then
+times the operations behind the GUI headlessly:
+
+    history    first History page plus paging through the next pages, from
+               SQLite and then from the entry cache
+    entry_cache_load   filling the columnar entry cache (memory per entry
+               is reported alongside)
+    insights   the Insights report, uncached and cached
+    chart_*    a full-history Charts redraw with each downsampling method
+    export_*   CSV, JSON, NDJSON and binary archive exports
+    archive_month  reading one month of entries back from the archive
+    forecast_train retraining the mood forecast model from the database
+    forecast   a next-day forecast from the trained model
+    import     bulk import of the CSV export into an empty database
+    save       single entry saves, one commit each
+    backup     an online snapshot: copy, compression and checksum
+    save_idle / save_during_backup   latency of each single save, alone and
+               while a snapshot is taken on another thread
+    goal_rebuild   evaluating BENCHMARK_GOALS from the database, as a save
+               would have to without the goals' sliding-window state
+    save_with_goals   single saves while BENCHMARK_GOALS are tracked
+
+Results (latency percentiles, throughput and peak Python memory) are written
+as JSON and can be compared against a stored baseline:
+
+    python benchmark.py --sizes 1000 100000 --output bench.json
+    python benchmark.py --sizes 1000 100000 --baseline bench.json
+
+Entry dates are unique, so one database can hold at most about 3.6 million
+entries (one per day up to 9999-12-31); MAX_ENTRIES is the exact limit.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from archive import ArchiveReader
+from backup import create_snapshot
+from charts import DOWNSAMPLERS, chart_points, load_chart_series, series_range
+from tracker_core import (
+    HISTORY_PAGE_SIZE, build_insights_report, bulk_load_entries,
+    compute_insights_report, entry_cache, entry_caches, export_archive, export_csv,
+    export_json, export_ndjson, fetch_history_page, forecast_mood, import_entries,
+    insert_goal, load_goal_progress, mood_model, mood_model_path, mood_models, open_database,
+    rebuild_goal_progress, upsert_entry,
+)
+
+
+# Metric goals tracked by save_with_goals, as insert_goal() keyword arguments;
+# the benchmark's saves never meet them, so they stay open throughout
+BENCHMARK_GOALS = (
+    {'kind': 'average', 'metric': 'sleep_hours', 'comparison': '>=', 'target': 9,
+     'window_days': 30},
+    {'kind': 'average', 'metric': 'stress_level', 'comparison': '<=', 'target': 1,
+     'window_days': 365},
+    {'kind': 'count', 'metric': 'swimming', 'target': 7, 'window_days': 7},
+)
+
+ACTIVITIES = ['walk', 'run', 'yoga', 'gym', 'reading', 'meditation', 'cooking',
+              'gaming', 'music', 'friends', 'family', 'work', 'study', 'cycling',
+              'swimming', 'journaling', 'therapy', 'gardening', 'movie', 'nap']
+TRIGGERS = ['work deadline', 'poor sleep', 'argument', 'traffic', 'bills',
+            'exams', 'social media', 'loneliness', 'illness', 'news', 'noise']
+MEDICATIONS = ['sertraline 50mg', 'vitamin d', 'melatonin', 'ibuprofen',
+               'magnesium', 'omega-3']
+NOTE_OPENINGS = ['Felt', 'Woke up', 'Mostly', 'Ended the day', 'Started the morning']
+NOTE_MOODS = ['calm', 'tired', 'anxious', 'hopeful', 'restless', 'content',
+              'overwhelmed', 'focused', 'low', 'energised']
+NOTE_DETAILS = ['after a long walk', 'despite the rain', 'before a big meeting',
+                'with friends around', 'without much sleep', 'after therapy',
+                'while working from home', 'during a quiet weekend']
+
+# Generated histories end on LAST_DATE when they fit, and otherwise start at
+# 0001-01-01. Days after the history are left free for the save benchmark.
+LAST_DATE = datetime.date(2025, 12, 31)
+SAVE_RESERVE_DAYS = 10000
+MAX_ENTRIES = datetime.date(9999, 12, 31).toordinal() - SAVE_RESERVE_DAYS
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 5
+HISTORY_PAGES = 5
+SAVE_COUNT = 50
+CHART_WIDTH = 800
+CHART_HEIGHT = 400
+REGRESSION_THRESHOLD = 0.2
+
+
+def history_start(count):
+    """Ordinal of the first generated date for a history of `count` entries"""
+    return max(LAST_DATE.toordinal() - count + 1, 1)
+
+
+def generate_entries(count, seed=0):
+    """Yield `count` deterministic, plausible ENTRY_COLUMNS tuples.
+
+    Dates run forward one day at a time so they stay unique. Sleep, stress
+    and anxiety drift slowly and mood follows them, so the data has the kind
+    of correlations real journals show.
+    """
+    if count > MAX_ENTRIES:
+        raise ValueError(f"at most {MAX_ENTRIES} entries fit in one database")
+    rng = random.Random(seed)
+    start = history_start(count)
+    stress = 5.0
+    anxiety = 5.0
+
+    for i in range(count):
+        date = datetime.date.fromordinal(start + i).isoformat()
+        stress = min(max(stress + rng.gauss(0, 1), 1), 10)
+        anxiety = min(max(0.7 * anxiety + 0.3 * stress + rng.gauss(0, 1), 1), 10)
+        sleep = round(min(max(rng.gauss(7.2, 1.2) - (stress - 5) * 0.15, 3), 12) * 2) / 2
+        mood = round(min(max(6 + (sleep - 7) * 0.6 - (stress - 5) * 0.4 + rng.gauss(0, 1.2), 1), 10))
+        energy = round(min(max(mood + rng.gauss(0, 1.5), 1), 10))
+
+        activities = ','.join(rng.sample(ACTIVITIES, rng.randint(0, 3)))
+        triggers = ','.join(rng.sample(TRIGGERS, rng.randint(0, 2))) if stress > 5 else ''
+        medications = rng.choice(MEDICATIONS) if rng.random() < 0.3 else ''
+        notes = ''
+        if rng.random() < 0.7:
+            notes = (f"{rng.choice(NOTE_OPENINGS)} {rng.choice(NOTE_MOODS)} "
+                     f"{rng.choice(NOTE_DETAILS)}.")
+
+        yield (date, mood, energy, sleep, round(stress), round(anxiety),
+               notes, activities, triggers, medications)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(func, repeat, rows=None):
+    """Time `func` `repeat` times, then once more under tracemalloc.
+
+    Memory is traced in a separate run so it does not skew the timings.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    mean = sum(timings) / len(timings)
+    result = {
+        'repeat': repeat,
+        'mean_ms': mean * 1e3,
+        'p50_ms': percentile(timings, 0.5) * 1e3,
+        'p95_ms': percentile(timings, 0.95) * 1e3,
+        'p99_ms': percentile(timings, 0.99) * 1e3,
+        'min_ms': timings[0] * 1e3,
+        'max_ms': timings[-1] * 1e3,
+        'peak_memory_kb': peak / 1024,
+    }
+    if rows is not None:
+        result['rows'] = rows
+        result['rows_per_sec'] = rows / mean if mean else 0.0
+    return result
+
+
+def latency_stats(latencies):
+    """measure()-style percentiles of individually timed operations"""
+    latencies = sorted(latencies)
+    return {
+        'repeat': len(latencies),
+        'mean_ms': sum(latencies) / len(latencies) * 1e3,
+        'p50_ms': percentile(latencies, 0.5) * 1e3,
+        'p95_ms': percentile(latencies, 0.95) * 1e3,
+        'p99_ms': percentile(latencies, 0.99) * 1e3,
+        'min_ms': latencies[0] * 1e3,
+        'max_ms': latencies[-1] * 1e3,
+    }
+
+
+def benchmark_size(size, repeat, workdir, seed):
+    """Run every benchmark against a database of `size` entries"""
+    db_path = os.path.join(workdir, f'bench_{size}.db')
+    conn = open_database(db_path)
+    start = time.perf_counter()
+    bulk_load_entries(conn, generate_entries(size, seed))
+    results = {'load_seconds': time.perf_counter() - start}
+
+    def page_history():
+        rows = fetch_history_page(conn)
+        for _ in range(HISTORY_PAGES - 1):
+            if len(rows) < HISTORY_PAGE_SIZE:
+                break
+            rows = fetch_history_page(conn, rows[-1][1])
+
+    history_rows = min(size, HISTORY_PAGE_SIZE * HISTORY_PAGES)
+    results['history'] = measure(page_history, repeat, rows=history_rows)
+    
+    def load_cache():
+        entry_caches.clear()
+        entry_cache(conn)
+    
+    results['entry_cache_load'] = measure(load_cache, max(1, repeat // 2), rows=size)
+    results['cache_bytes_per_entry'] = entry_cache(conn).memory_usage()['bytes_per_entry']
+    results['history_cached'] = measure(page_history, repeat, rows=history_rows)
+    results['insights_uncached'] = measure(lambda: compute_insights_report(conn), repeat)
+    build_insights_report(conn)
+    results['insights_cached'] = measure(lambda: build_insights_report(conn), repeat)
+
+    series = load_chart_series(conn)
+    view = series_range(series)
+    if view is not None:
+        for method in DOWNSAMPLERS:
+            name = 'chart_' + method.lower().replace('/', '_')
+            results[name] = measure(
+                lambda: chart_points(series, view, CHART_WIDTH, CHART_HEIGHT, method=method),
+                repeat)
+    
+    for name, exporter in (('csv', export_csv), ('json', export_json), ('ndjson', export_ndjson),
+                           ('mha', export_archive)):
+        path = os.path.join(workdir, f'export_{size}.{name}')
+        results[f'export_{name}'] = measure(lambda: exporter(conn, path), repeat, rows=size)
+        results[f'export_{name}']['bytes'] = os.path.getsize(path)
+
+    # The month in the middle of the history, from a freshly opened archive
+    middle = datetime.date.fromordinal(history_start(size) + size // 2)
+    month_start = middle.replace(day=1).isoformat()
+    month_end = middle.replace(day=28).isoformat()
+
+    def read_archive_month():
+        with ArchiveReader(os.path.join(workdir, f'export_{size}.mha')) as archive:
+            return sum(len(rows) for rows in archive.iter_batches(month_start, month_end))
+
+    results['archive_month'] = measure(read_archive_month, repeat)
+
+    def train_forecast():
+        mood_models.clear()
+        if os.path.exists(mood_model_path(db_path)):
+            os.remove(mood_model_path(db_path))
+        mood_model(conn)
+
+    results['forecast_train'] = measure(train_forecast, max(1, repeat // 2))
+    results['forecast'] = measure(lambda: forecast_mood(conn), repeat)
+
+    csv_path = os.path.join(workdir, f'export_{size}.csv')
+
+    def import_csv():
+        import_path = os.path.join(workdir, 'import.db')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(import_path + suffix):
+                os.remove(import_path + suffix)
+        target = open_database(import_path)
+        import_entries(target, csv_path)
+        target.close()
+
+    results['import'] = measure(import_csv, max(1, repeat // 2), rows=size)
+
+    # Single saves on dates just after the generated history
+    next_day = [history_start(size) + size]
+
+    def save_entries():
+        for _ in range(SAVE_COUNT):
+            next_day[0] += 1
+            date = datetime.date.fromordinal(next_day[0]).isoformat()
+            upsert_entry(conn, (date, 6, 6, 7.5, 4, 4, 'benchmark', 'walk', '', ''))
+
+    save = measure(save_entries, repeat, rows=SAVE_COUNT)
+    save['per_save_ms'] = save['mean_ms'] / SAVE_COUNT
+    results['save'] = save
+
+    backup_dir = os.path.join(workdir, f'backups_{size}')
+    results['backup'] = measure(lambda: create_snapshot(db_path, backup_dir, keep=1),
+                                max(1, repeat // 2), rows=size)
+
+    def save_latencies(during_backup):
+        """Time saves one by one; during a backup, until the backup is done"""
+        thread = None
+        if during_backup:
+            thread = threading.Thread(target=create_snapshot, args=(db_path, backup_dir),
+                                      kwargs={'keep': 1})
+            thread.start()
+        latencies = []
+        while len(latencies) < SAVE_COUNT or thread is not None and thread.is_alive():
+            next_day[0] += 1
+            date = datetime.date.fromordinal(next_day[0]).isoformat()
+            start = time.perf_counter()
+            upsert_entry(conn, (date, 6, 6, 7.5, 4, 4, 'benchmark', 'walk', '', ''))
+            latencies.append(time.perf_counter() - start)
+        if thread is not None:
+            thread.join()
+        return latencies
+
+    results['save_idle'] = latency_stats(save_latencies(False))
+    results['save_during_backup'] = latency_stats(save_latencies(True))
+
+    start_date = datetime.date.fromordinal(history_start(size)).isoformat()
+    for goal in BENCHMARK_GOALS:
+        insert_goal(conn, 'benchmark', '', None, start_date=start_date, **goal)
+    results['goal_rebuild'] = measure(
+        lambda: [rebuild_goal_progress(conn, goal) for _, goal, _ in load_goal_progress(conn)],
+        repeat)
+    save = measure(save_entries, repeat, rows=SAVE_COUNT)
+    save['per_save_ms'] = save['mean_ms'] / SAVE_COUNT
+    results['save_with_goals'] = save
+
+    conn.close()
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return a list of regressions of p50 latency beyond `threshold`"""
+    regressions = []
+    for size, operations in results['results'].items():
+        for name, current in operations.items():
+            previous = baseline.get('results', {}).get(size, {}).get(name)
+            if not isinstance(current, dict) or not isinstance(previous, dict):
+                continue
+            if previous['p50_ms'] > 0 and current['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+                regressions.append(
+                    f"{name} @ {size}: p50 {previous['p50_ms']:.2f} ms -> "
+                    f"{current['p50_ms']:.2f} ms "
+                    f"(+{(current['p50_ms'] / previous['p50_ms'] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_summary(results):
+    for size, operations in results['results'].items():
+        print(f"\n{size} entries (loaded in {operations['load_seconds']:.2f}s, "
+              f"{operations['cache_bytes_per_entry']:.0f} cached bytes per entry)")
+        print(f"  {'operation':<18} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} "
+              f"{'rows/s':>12} {'peak KB':>10}")
+        for name, stats in operations.items():
+            if not isinstance(stats, dict):
+                continue
+            rate = f"{stats['rows_per_sec']:.0f}" if 'rows_per_sec' in stats else '-'
+            peak = f"{stats['peak_memory_kb']:.0f}" if 'peak_memory_kb' in stats else '-'
+            print(f"  {name:<18} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+                  f"{stats['p99_ms']:>10.2f} {rate:>12} {peak:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the tracker's hot paths")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="database sizes in entries (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="compare against a previous results file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed p50 slowdown before failing (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': {},
+    }
+
+    workdir = tempfile.mkdtemp(prefix='mht_bench_')
+    try:
+        for size in args.sizes:
+            print(f"Benchmarking {size} entries...", file=sys.stderr)
+            results['results'][str(size)] = benchmark_size(size, args.repeat, workdir, args.seed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_summary(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
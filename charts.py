@@ -0,0 +1,206 @@
+"""Time-series preparation for the Charts tab.
+
+Series come from the daily, weekly and monthly rollups, so loading them costs
+one row per bucket rather than one per entry. For each redraw the finest
+period that still fits the visible range is picked, the visible slice is cut
+out with a binary search and then reduced to at most a few points per pixel
+column with LTTB (largest triangle three buckets) or min/max per column.
+Everything here is plain Python and headless; tracker_gui only copies the
+resulting coordinates onto a Canvas.
+"""
+
+import bisect
+import datetime
+
+from tracker_core import fetch_rollups
+
+
+# Charted metrics: rollup prefix -> (label, line colour)
+CHART_METRICS = {
+    'mood': ('Mood', '#2e86de'),
+    'energy': ('Energy', '#10ac84'),
+    'sleep': ('Sleep (h)', '#8854d0'),
+    'stress': ('Stress', '#ee5253'),
+    'anxiety': ('Anxiety', '#ff9f43'),
+}
+
+# Rollup periods from finest to coarsest
+CHART_PERIODS = ('day', 'week', 'month')
+
+# Downsampling methods offered in the Charts tab
+DOWNSAMPLERS = ('LTTB', 'Min/max')
+
+# Use a period only while it has at most this many visible buckets per pixel
+MAX_POINTS_PER_PIXEL = 2
+
+# Values above this are clipped to the top of the plot
+CHART_Y_MAX = 12
+
+
+def bucket_ordinal(period, bucket):
+    """Date ordinal at the middle of a rollup bucket"""
+    if period == 'day':
+        return datetime.date.fromisoformat(bucket).toordinal()
+    if period == 'week':
+        # Buckets are strftime('%Y-W%W'): week 1 starts on the year's first
+        # Monday and week 0 holds the days before it
+        year, week = bucket.split('-W')
+        new_year = datetime.date(int(year), 1, 1).toordinal()
+        first_monday = new_year + (7 - datetime.date.fromordinal(new_year).weekday()) % 7
+        return first_monday + (int(week) - 1) * 7 + 3
+    year, month = bucket.split('-')
+    return datetime.date(int(year), int(month), 15).toordinal()
+
+
+def load_chart_series(conn):
+    """Read every period's rollups as {period: {metric: (xs, ys)}}.
+
+    Buckets without a value for a metric are left out of that metric's series.
+    """
+    series = {}
+    for period in CHART_PERIODS:
+        rows = fetch_rollups(conn, period)
+        xs = [bucket_ordinal(period, row[0]) for row in rows]
+        series[period] = {}
+        for i, metric in enumerate(CHART_METRICS):
+            # fetch_rollups rows are (bucket, entries, mean, std, mean, std, ...)
+            means = [row[2 + 2 * i] for row in rows]
+            points = [(x, y) for x, y in zip(xs, means) if y is not None]
+            series[period][metric] = ([p[0] for p in points], [p[1] for p in points])
+    return series
+
+
+def series_range(series):
+    """(first, last) date ordinal over all metrics, or None without data"""
+    ends = [(xs[0], xs[-1]) for xs, _ in series['day'].values() if xs]
+    if not ends:
+        return None
+    return min(e[0] for e in ends), max(e[1] for e in ends)
+
+
+def visible_slice(xs, x0, x1):
+    """Index range of the points in [x0, x1] plus one neighbour either side,
+    so lines run to the plot edges"""
+    start = max(bisect.bisect_left(xs, x0) - 1, 0)
+    end = min(bisect.bisect_right(xs, x1) + 1, len(xs))
+    return start, end
+
+
+def choose_period(series, x0, x1, width):
+    """The finest period with at most MAX_POINTS_PER_PIXEL buckets per pixel"""
+    for period in CHART_PERIODS:
+        most = max((len(range(*visible_slice(xs, x0, x1)))
+                    for xs, _ in series[period].values()), default=0)
+        if most <= width * MAX_POINTS_PER_PIXEL:
+            return period
+    return CHART_PERIODS[-1]
+
+
+def lttb(xs, ys, threshold):
+    """Largest triangle three buckets: keep `threshold` points of the series
+    that best preserve its visual shape"""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return xs, ys
+
+    out_x = [xs[0]]
+    out_y = [ys[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        start = int(i * every) + 1
+        end = next_start
+        ax, ay = xs[a], ys[a]
+        best = start
+        best_area = -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+
+def min_max_columns(xs, ys, x0, x1, width):
+    """Keep the lowest and highest point of every pixel column, in x order"""
+    if len(xs) <= 2 * width:
+        return xs, ys
+
+    scale = width / ((x1 - x0) or 1)
+    out_x = []
+    out_y = []
+    column = None
+    low = high = 0
+    for i, x in enumerate(xs):
+        pixel = int((x - x0) * scale)
+        if pixel != column:
+            if column is not None:
+                for j in sorted({low, high}):
+                    out_x.append(xs[j])
+                    out_y.append(ys[j])
+            column = pixel
+            low = high = i
+        elif ys[i] < ys[low]:
+            low = i
+        elif ys[i] > ys[high]:
+            high = i
+    for j in sorted({low, high}):
+        out_x.append(xs[j])
+        out_y.append(ys[j])
+    return out_x, out_y
+
+
+def chart_points(series, view, width, height, metrics=CHART_METRICS, method='LTTB',
+                 left=0, top=0):
+    """Canvas coordinates for each metric in a width x height plot at (left, top).
+
+    `view` is the visible (first, last) date ordinal. Returns (period,
+    {metric: [x0, y0, x1, y1, ...]}) with at most about two points per pixel
+    column per metric.
+    """
+    x0, x1 = view
+    span = (x1 - x0) or 1
+    period = choose_period(series, x0, x1, width)
+    lines = {}
+    for metric in metrics:
+        xs, ys = series[period][metric]
+        start, end = visible_slice(xs, x0, x1)
+        xs, ys = xs[start:end], ys[start:end]
+        if method == 'LTTB':
+            xs, ys = lttb(xs, ys, width)
+        else:
+            xs, ys = min_max_columns(xs, ys, x0, x1, width)
+
+        coords = []
+        x_scale = width / span
+        y_scale = height / CHART_Y_MAX
+        bottom = top + height
+        for x, y in zip(xs, ys):
+            coords.append(left + (x - x0) * x_scale)
+            coords.append(bottom - min(y, CHART_Y_MAX) * y_scale)
+        lines[metric] = coords
+    return period, lines
+
+
+def date_ticks(x0, x1, count=6):
+    """About `count` evenly spaced (ordinal, label) ticks for the date axis"""
+    span = x1 - x0
+    if span <= 0:
+        return [(x0, datetime.date.fromordinal(int(x0)).isoformat())]
+    step = span / count
+    fmt = '%Y-%m-%d' if span < 120 else ('%Y-%m' if span < 3 * 365 else '%Y')
+    return [(x0 + i * step, datetime.date.fromordinal(int(x0 + i * step)).strftime(fmt))
+            for i in range(count + 1)]
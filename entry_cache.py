@@ -0,0 +1,253 @@
+"""Columnar in-memory copy of mood_entries.
+
+An EntryCache holds one column per table column instead of one tuple per row:
+ratings are packed into signed-byte arrays, sleep hours into doubles and ids
+into 64-bit integers, while repeated text (tags, timestamps) is interned so
+equal values share one string object. Rows are kept in date order, so
+History pages are a binary search and a slice.
+
+The cache only knows about the rows it was given. tracker_core decides when
+to load it, applies each save and delete to it (write-through) and reloads it
+when the database changed behind its back. Reads and writes hold the
+cache's lock, so one cache can be shared by several threads.
+"""
+
+import bisect
+import datetime
+import itertools
+import sys
+import threading
+from array import array
+
+
+# Column order of SELECT * FROM mood_entries
+TABLE_COLUMNS = ('id', 'date', 'mood_score', 'energy_level', 'sleep_hours', 'stress_level',
+                 'anxiety_level', 'notes', 'activities', 'triggers', 'medications', 'created_at')
+
+# Packed columns: name -> (array typecode, value standing in for NULL).
+# `days` is derived from `date` (days since 1970-01-01) for vectorized analytics.
+PACKED_COLUMNS = {
+    'id': ('q', None),
+    'days': ('i', -2 ** 31),
+    'mood_score': ('b', -128),
+    'energy_level': ('b', -128),
+    'sleep_hours': ('d', float('nan')),
+    'stress_level': ('b', -128),
+    'anxiety_level': ('b', -128),
+}
+
+# Text columns whose values repeat often enough to be worth interning
+INTERNED_COLUMNS = ('activities', 'triggers', 'medications', 'created_at')
+
+# Columns of a History row, as returned by fetch_history_page()
+HISTORY_COLUMNS = ('id', 'date', 'mood_score', 'energy_level', 'sleep_hours',
+                   'stress_level', 'anxiety_level', 'notes')
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Every change to any cache takes the next generation, so a reader can tell
+# whether what it rendered is still current
+generations = itertools.count(1)
+
+
+def epoch_day(date):
+    """Days since 1970-01-01 for an ISO date string, or None if it isn't one"""
+    try:
+        return datetime.date.fromisoformat(date).toordinal() - EPOCH_ORDINAL
+    except (TypeError, ValueError):
+        return None
+
+
+def pack_column(name, values):
+    """Store `values` compactly, falling back to a list if they don't fit"""
+    typecode, null = PACKED_COLUMNS[name]
+    try:
+        return array(typecode, [null if v is None else v for v in values])
+    except (TypeError, OverflowError):
+        # Out-of-range or non-numeric legacy data; keep it exactly as stored
+        return list(values)
+
+
+def unpack(name, values):
+    """Turn values read from a packed array back into SQLite values"""
+    null = PACKED_COLUMNS[name][1]
+    if null != null:  # NaN never compares equal, so test each value against itself
+        return [None if v != v else v for v in values]
+    return [None if v == null else v for v in values]
+
+
+def column_slice(name, column, start, end, positions=None):
+    """Values of a column for rows start..end (or for positions[start:end]),
+    as SQLite would return them"""
+    if positions is not None:
+        values = [column[i] for i in positions[start:end]]
+    else:
+        values = column[start:end]
+    if name in PACKED_COLUMNS and not isinstance(column, list):
+        return unpack(name, values)
+    return values
+
+
+class EntryCache:
+    """Columnar copy of one database's mood entries, sorted by date.
+
+    `version` is the database's change counter the contents correspond to and
+    `generation` changes whenever the contents do.
+    """
+
+    def __init__(self, version, rows=()):
+        self.version = version
+        self.generation = next(generations)
+        self.columns = {}
+        self.lock = threading.RLock()
+        self.load_rows(list(rows))
+
+    @classmethod
+    def load(cls, conn, version):
+        """Read every entry from `conn` in date order"""
+        rows = conn.execute(f'''
+            SELECT {', '.join(TABLE_COLUMNS)} FROM mood_entries ORDER BY date
+        ''').fetchall()
+        return cls(version, rows)
+
+    def load_rows(self, rows):
+        """Replace the contents with TABLE_COLUMNS rows sorted by date"""
+        values = dict(zip(TABLE_COLUMNS, zip(*rows))) if rows else {}
+        columns = {}
+        for name in TABLE_COLUMNS:
+            column = values.get(name, ())
+            if name in PACKED_COLUMNS:
+                columns[name] = pack_column(name, column)
+            elif name in INTERNED_COLUMNS:
+                columns[name] = [v if v is None else sys.intern(v) for v in column]
+            else:
+                columns[name] = list(column)
+        columns['days'] = pack_column('days', map(epoch_day, columns['date']))
+        with self.lock:
+            self.columns = columns
+            self.generation = next(generations)
+
+    def __len__(self):
+        return len(self.columns['date'])
+
+    def store(self, name, position, value, insert):
+        """Set or insert one value, unpacking the column if it no longer fits"""
+        column = self.columns[name]
+        if name in PACKED_COLUMNS and not isinstance(column, list):
+            stored = PACKED_COLUMNS[name][1] if value is None else value
+            try:
+                if insert:
+                    column.insert(position, stored)
+                else:
+                    column[position] = stored
+                return
+            except (TypeError, OverflowError):
+                column = self.columns[name] = unpack(name, column)
+        elif name in INTERNED_COLUMNS and value is not None:
+            value = sys.intern(value)
+        if insert:
+            column.insert(position, value)
+        else:
+            column[position] = value
+
+    def upsert(self, entry_id, entry, created_at):
+        """Apply a saved ENTRY_COLUMNS tuple (write-through from upsert_entry)"""
+        row = dict(zip(TABLE_COLUMNS, (entry_id,) + tuple(entry) + (created_at,)))
+        row['days'] = epoch_day(row['date'])
+        with self.lock:
+            dates = self.columns['date']
+            position = bisect.bisect_left(dates, row['date'])
+            insert = position == len(dates) or dates[position] != row['date']
+            for name, value in row.items():
+                self.store(name, position, value, insert)
+            self.generation = next(generations)
+
+    def delete(self, entry_id, date):
+        """Remove the entry saved for `date` if it has this id (write-through
+        from delete_entries)"""
+        with self.lock:
+            dates = self.columns['date']
+            position = bisect.bisect_left(dates, date)
+            if position == len(dates) or self.columns['id'][position] != entry_id:
+                return
+            for column in self.columns.values():
+                del column[position]
+            self.generation = next(generations)
+
+    def history_page(self, before_date=None, limit=None):
+        """Up to `limit` HISTORY_COLUMNS rows older than `before_date`, newest first"""
+        with self.lock:
+            dates = self.columns['date']
+            end = len(dates) if before_date is None else bisect.bisect_left(dates, before_date)
+            start = 0 if limit is None else max(end - limit, 0)
+            rows = list(zip(*(column_slice(name, self.columns[name], start, end)
+                              for name in HISTORY_COLUMNS)))
+        rows.reverse()
+        return rows
+
+    def iter_batches(self, columns=TABLE_COLUMNS, batch_size=1000, order='date'):
+        """Yield lists of row tuples, in date order or (order='id') insertion order.
+
+        Rows come from a snapshot taken when iteration starts, so writes made
+        meanwhile neither show up nor get in the way.
+        """
+        if order not in ('date', 'id'):
+            raise ValueError(f"unknown order {order!r}")
+        with self.lock:
+            snapshot = {name: self.columns[name][:] for name in set(columns) | {'id'}}
+
+        positions = None
+        ids = snapshot['id']
+        if order == 'id' and any(a > b for a, b in zip(ids, itertools.islice(ids, 1, None))):
+            positions = sorted(range(len(ids)), key=ids.__getitem__)
+
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            yield list(zip(*(column_slice(name, snapshot[name], start, end, positions)
+                             for name in columns)))
+
+    def numpy_column(self, name):
+        """A NumPy copy of a numeric column: int64 for id, float64 with NaN
+        for missing values otherwise (for days, dates that aren't ISO dates)"""
+        import numpy as np  # Only needed here, and slow to import at startup
+
+        with self.lock:
+            column = self.columns[name][:]
+        if name == 'id':
+            return np.array(column, dtype=np.int64)
+        if isinstance(column, list):
+            return np.array(column, dtype=np.float64)
+        raw = np.frombuffer(column, dtype=column.typecode)
+        values = raw.astype(np.float64)
+        null = PACKED_COLUMNS[name][1]
+        if null == null:
+            values[raw == null] = np.nan
+        return values
+
+    def memory_usage(self):
+        """Bytes held by the cache, counting each distinct object once"""
+        with self.lock:
+            columns = [column[:] for column in self.columns.values()]
+        seen = set()
+        total = sys.getsizeof(self.columns)
+        for column in columns:
+            total += sys.getsizeof(column)
+            if isinstance(column, array):
+                continue
+            for value in column:
+                # None and small ints are shared interpreter-wide
+                if value is None or isinstance(value, int) or id(value) in seen:
+                    continue
+                seen.add(id(value))
+                total += sys.getsizeof(value)
+        return {
+            'entries': len(self),
+            'bytes': total,
+            'bytes_per_entry': total / len(self) if len(self) else 0.0,
+        }
+
+
+def format_cache_stats(stats):
+    """One-line summary of EntryCache.memory_usage()"""
+    return (f"{stats['entries']} entries cached in {stats['bytes'] / 1e6:.1f} MB "
+            f"({stats['bytes_per_entry']:.0f} bytes per entry)")
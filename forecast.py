@@ -0,0 +1,162 @@
+"""Next-day mood forecasts from an incrementally trained ridge regression.
+
+Each example pairs a day's ratings, sleep, hashed tags and the weekday being
+predicted with the mood recorded the day after. Recursive least squares
+takes in one example in O(features^2), so the model is never refitted.
+tracker_core decides which examples to feed it and where the state is stored.
+"""
+
+import datetime
+import json
+import math
+import os
+import zlib
+
+
+# Bumped whenever the feature layout changes, invalidating stored models
+MODEL_FORMAT = 1
+
+# Day-level inputs, centred so that a missing value (0) means "typical"
+NUMERIC_FEATURES = {
+    'mood_score': 5.5,
+    'energy_level': 5.5,
+    'sleep_hours': 7.5,
+    'stress_level': 5.5,
+    'anxiety_level': 5.5,
+}
+
+# Tags are hashed into this many counters
+TAG_BUCKETS = 8
+
+# bias, numeric inputs, weekday of the predicted day, tag counters
+FEATURE_COUNT = 1 + len(NUMERIC_FEATURES) + 7 + TAG_BUCKETS
+
+# L2 penalty; the initial inverse Gram matrix is I / RIDGE
+RIDGE = 1.0
+
+# Examples needed before forecasts are made
+MIN_EXAMPLES = 14
+
+# Forecasts at or below this mood flag a likely low day
+LOW_MOOD = 4.0
+
+
+def features(entry, tags, target_date):
+    """Feature vector for predicting the mood of `target_date` from the
+    previous day's `entry` (a dict of NUMERIC_FEATURES columns) and its
+    (kind, name) `tags`"""
+    x = [0.0] * FEATURE_COUNT
+    x[0] = 1.0
+    for i, (name, centre) in enumerate(NUMERIC_FEATURES.items(), start=1):
+        value = entry.get(name)
+        if value is not None:
+            x[i] = float(value) - centre
+    weekday = datetime.date.fromisoformat(target_date).weekday()
+    x[1 + len(NUMERIC_FEATURES) + weekday] = 1.0
+    tag_start = FEATURE_COUNT - TAG_BUCKETS
+    for kind, name in tags:
+        # crc32 rather than hash() so buckets survive interpreter restarts
+        bucket = zlib.crc32(f'{kind}:{name.lower()}'.encode('utf-8')) % TAG_BUCKETS
+        x[tag_start + bucket] += 1.0
+    return x
+
+
+class MoodModel:
+    """Ridge regression of next-day mood, updated one example at a time.
+
+    `version` is the database change counter the model has seen, so callers
+    can tell when the data changed without the model being told.
+    """
+
+    def __init__(self, version=None):
+        n = FEATURE_COUNT
+        self.version = version
+        self.weights = [0.0] * n
+        self.inverse = [[1.0 / RIDGE if i == j else 0.0 for j in range(n)] for i in range(n)]
+        self.examples = 0
+        # Squared error of each prediction made before its example was learnt
+        self.squared_error = 0.0
+
+    def predict(self, x):
+        """Predicted mood for a feature vector, clipped to the 1-10 scale"""
+        return min(max(sum(w * v for w, v in zip(self.weights, x)), 1.0), 10.0)
+
+    def update(self, x, y):
+        """Learn one example (recursive least squares update)"""
+        inverse = self.inverse
+        # Column indexes of non-zero features; most tag and weekday slots are 0
+        active = [j for j, v in enumerate(x) if v]
+        px = [sum(row[j] * x[j] for j in active) for row in inverse]
+        denominator = 1.0 + sum(x[j] * px[j] for j in active)
+        error = y - sum(self.weights[j] * x[j] for j in active)
+
+        if self.examples >= MIN_EXAMPLES:
+            self.squared_error += (y - self.predict(x)) ** 2
+        gain = [p / denominator for p in px]
+        for i, row in enumerate(inverse):
+            self.weights[i] += gain[i] * error
+            g = gain[i]
+            if g:
+                for j, p in enumerate(px):
+                    row[j] -= g * p
+        self.examples += 1
+
+    def rmse(self):
+        """Root mean squared error of the forecasts made so far, or None"""
+        scored = self.examples - MIN_EXAMPLES
+        return math.sqrt(self.squared_error / scored) if scored > 0 else None
+
+    def ready(self):
+        return self.examples >= MIN_EXAMPLES
+
+    def to_dict(self):
+        return {
+            'format': MODEL_FORMAT,
+            'version': self.version,
+            'examples': self.examples,
+            'squared_error': self.squared_error,
+            'weights': self.weights,
+            'inverse': self.inverse,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Restore a model; raises ValueError for another format"""
+        if state.get('format') != MODEL_FORMAT:
+            raise ValueError("stored model has a different feature layout")
+        model = cls(state['version'])
+        model.examples = state['examples']
+        model.squared_error = state['squared_error']
+        model.weights = [float(w) for w in state['weights']]
+        model.inverse = [[float(v) for v in row] for row in state['inverse']]
+        if len(model.weights) != FEATURE_COUNT or len(model.inverse) != FEATURE_COUNT:
+            raise ValueError("stored model has a different feature layout")
+        return model
+
+    def save(self, path):
+        """Write the model to `path` atomically"""
+        temp = path + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a saved model, or return None if there is no usable one"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+
+def format_forecast(forecast):
+    """One-line description of a forecast dict from tracker_core.forecast_mood()"""
+    if forecast is None:
+        return f"Not enough consecutive days yet to forecast mood (needs {MIN_EXAMPLES})."
+    text = f"Predicted mood for {forecast['date']}: {forecast['mood']:.1f}/10"
+    if forecast['rmse'] is not None:
+        text += f" (typically within ±{forecast['rmse']:.1f})"
+    if forecast['low']:
+        text += " - likely a low day"
+    return text
@@ -0,0 +1,181 @@
+"""Goals tied to tracked metrics, with progress kept current on every save.
+
+An average goal holds a metric's average over the last `window_days` days at
+or beyond `target` (e.g. sleep >= 7 over 30 days); a count goal logs an
+activity on `target` of them (e.g. exercise on 4 days of 7). Each goal keeps
+a sliding window of its days' values, so a save costs O(window) at worst and
+nothing is requeried. tracker_core stores the windows and completes met goals.
+"""
+
+import bisect
+import datetime
+import math
+
+
+# Bumped whenever the state layout changes, invalidating stored state
+STATE_FORMAT = 1
+
+GOAL_KINDS = ('average', 'count')
+
+GOAL_COMPARISONS = ('>=', '<=')
+
+# Metrics an average goal can track -> (label, unit)
+GOAL_METRICS = {
+    'mood_score': ("mood", ""),
+    'energy_level': ("energy", ""),
+    'sleep_hours': ("sleep", "h"),
+    'stress_level': ("stress", ""),
+    'anxiety_level': ("anxiety", ""),
+}
+
+# Goal columns defining what is tracked, as stored in the goals table
+GOAL_SPEC_FIELDS = ('kind', 'metric', 'comparison', 'target', 'window_days', 'start_date')
+
+# Share of an average goal's window that must be logged before it can be met
+GOAL_COVERAGE = 0.8
+
+# Longest window a goal can have, in days
+MAX_WINDOW_DAYS = 366
+
+
+def check_goal(kind, metric, comparison, target, window_days):
+    """Validate a goal definition; returns it normalised as a tuple.
+
+    Raises ValueError describing the first problem found.
+    """
+    if kind not in GOAL_KINDS:
+        raise ValueError(f"goal kind must be one of {', '.join(GOAL_KINDS)}")
+    if kind == 'average':
+        if metric not in GOAL_METRICS:
+            raise ValueError(f"average goals track one of {', '.join(GOAL_METRICS)}")
+        if comparison not in GOAL_COMPARISONS:
+            raise ValueError(f"comparison must be one of {', '.join(GOAL_COMPARISONS)}")
+    else:
+        metric = ' '.join(str(metric or '').split())
+        if not metric or ',' in metric:
+            raise ValueError("count goals need a single activity name")
+        comparison = '>='
+    target = float(target)
+    if not target > 0:
+        raise ValueError("goal target must be above 0")
+    window_days = int(window_days)
+    if not 1 <= window_days <= MAX_WINDOW_DAYS:
+        raise ValueError(f"goal window must be 1-{MAX_WINDOW_DAYS} days")
+    if kind == 'count' and target > window_days:
+        raise ValueError(f"can't log an activity on {target:g} of {window_days} days")
+    return kind, metric, comparison, target, window_days
+
+
+class GoalProgress:
+    """Sliding-window accumulator for one goal.
+
+    `goal` is a dict of GOAL_SPEC_FIELDS. `version` is the database change
+    counter the state reflects, as for anomaly.AnomalyDetector.
+    """
+
+    def __init__(self, goal, version=None):
+        self.goal = goal
+        self.version = version
+        self.dates = []
+        self.values = []
+        self.total = 0.0
+        self.end = None
+
+    def window_start(self):
+        """First date in the window: window_days back from the end, or the goal's start"""
+        first = (datetime.date.fromisoformat(self.end)
+                 - datetime.timedelta(days=self.goal['window_days'] - 1)).isoformat()
+        return max(first, self.goal['start_date'])
+
+    def update(self, date, value):
+        """Set the value saved for `date`; None when the day doesn't count"""
+        if date < self.goal['start_date']:
+            return
+        if self.end is None or date > self.end:
+            self.end = date
+            self.evict()
+        elif date < self.window_start():
+            return
+        self.set_day(date, value)
+
+    def remove(self, date):
+        """Forget a deleted day. Returns False if the state can't follow the
+        delete (the window's last day went) and must be rebuilt"""
+        if date == self.end:
+            return False
+        if self.end is not None and date >= self.window_start():
+            self.set_day(date, None)
+        return True
+
+    def set_day(self, date, value):
+        i = bisect.bisect_left(self.dates, date)
+        if i < len(self.dates) and self.dates[i] == date:
+            self.total -= self.values[i]
+            del self.dates[i], self.values[i]
+        if value is not None:
+            self.dates.insert(i, date)
+            self.values.insert(i, value)
+            self.total += value
+
+    def evict(self):
+        i = bisect.bisect_left(self.dates, self.window_start())
+        if i:
+            self.total -= sum(self.values[:i])
+            del self.dates[:i], self.values[:i]
+
+    def evaluate(self):
+        """Returns (value, days logged, progress from 0 to 1, met).
+
+        The value is the window's average for average goals and the number
+        of days with the activity for count goals; None with nothing logged.
+        """
+        goal = self.goal
+        logged = len(self.dates)
+        if goal['kind'] == 'count':
+            return self.total, logged, min(self.total / goal['target'], 1.0), \
+                self.total >= goal['target']
+        if not logged:
+            return None, 0, 0.0, False
+        value = self.total / logged
+        if goal['comparison'] == '>=':
+            ratio = value / goal['target']
+        else:
+            ratio = goal['target'] / value if value > 0 else 1.0
+        needed = max(math.ceil(round(GOAL_COVERAGE * goal['window_days'], 6)), 1)
+        coverage = min(logged / needed, 1.0)
+        return value, logged, max(min(ratio, 1.0), 0.0) * coverage, ratio >= 1 and coverage >= 1
+
+    def to_dict(self):
+        return {'format': STATE_FORMAT, 'version': self.version, 'goal': self.goal,
+                'end': self.end, 'dates': self.dates, 'values': self.values, 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, state, goal):
+        """Restore an accumulator; raises ValueError for another format or goal"""
+        if state.get('format') != STATE_FORMAT or state['goal'] != goal:
+            raise ValueError("stored goal state doesn't match the goal")
+        progress = cls(goal, state['version'])
+        progress.end = state['end']
+        progress.dates = state['dates']
+        progress.values = state['values']
+        progress.total = state['total']
+        return progress
+
+
+def describe_goal(goal):
+    """What a metric goal asks for, e.g. 'average sleep >= 7h over 30 days'"""
+    if goal['kind'] == 'count':
+        return f"{goal['metric']} on {goal['target']:g} of every {goal['window_days']} days"
+    label, unit = GOAL_METRICS[goal['metric']]
+    return (f"average {label} {goal['comparison']} {goal['target']:g}{unit} "
+            f"over {goal['window_days']} days")
+
+
+def format_goal_progress(goal, value, logged, progress):
+    """Progress line for a metric goal, e.g. '62% (6.4h over 19 of 30 days)'"""
+    if goal['kind'] == 'count':
+        return f"{progress:.0%} ({value or 0:g} of {goal['target']:g} days)"
+    if value is None:
+        return f"{progress:.0%} (nothing logged yet)"
+    unit = GOAL_METRICS[goal['metric']][1]
+    return f"{progress:.0%} ({value:.1f}{unit} over {logged} of {goal['window_days']} days)"
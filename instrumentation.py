@@ -0,0 +1,284 @@
+"""Timing spans for the tracker's hot paths.
+
+A span records how long one piece of work took, on which thread, and how
+many rows it returned. Three kinds are recorded while instrumentation is
+enabled:
+
+    sql    every statement run through a connection from
+           tracker_core.connect(), including the time spent fetching its
+           rows; SQL spans keep their parameters so EXPLAIN QUERY PLAN can
+           be run on them later
+    db     tracker_core functions marked with @traced
+    ui     GUI work such as filling a Treeview, wrapped in `with span(...)`
+
+Spans go into a ring buffer of the last SPAN_BUFFER_SIZE, which the
+Diagnostics tab summarises, and can be written out with write_trace() in
+the Chrome trace event format (open it in chrome://tracing or Perfetto).
+
+Instrumentation starts disabled. Disabled, span() returns a shared no-op
+object and the wrappers cost one global lookup per call.
+"""
+
+import collections
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# Spans kept for the Diagnostics tab; older ones are dropped
+SPAN_BUFFER_SIZE = 5000
+
+# SQL spans are named after their statement, whitespace collapsed and cut to this length
+SQL_NAME_LENGTH = 80
+
+enabled = False
+spans = collections.deque(maxlen=SPAN_BUFFER_SIZE)
+
+
+def set_enabled(flag):
+    """Turn span recording on or off for the whole process"""
+    global enabled
+    enabled = bool(flag)
+
+
+def clear():
+    """Forget every recorded span"""
+    spans.clear()
+
+
+class Span:
+    """One timed piece of work; use as a context manager"""
+
+    __slots__ = ('category', 'name', 'start', 'seconds', 'rows', 'thread', 'sql', 'parameters')
+
+    def __init__(self, category, name, sql=None, parameters=None):
+        self.category = category
+        self.name = name
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        self.rows = None
+        self.thread = threading.current_thread().name
+        self.sql = sql
+        self.parameters = parameters
+        spans.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+
+
+class NullSpan:
+    """Stands in for a Span while instrumentation is disabled"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(category, name):
+    """A Span for `with span('ui', 'history.populate') as s: ...; s.rows = n`"""
+    return Span(category, name) if enabled else NULL_SPAN
+
+
+def add_span(category, name, seconds, rows=None, start=None):
+    """Add a span whose duration was measured elsewhere"""
+    if enabled:
+        s = Span(category, name)
+        if start is not None:
+            s.start = start
+        s.seconds = seconds
+        s.rows = rows
+
+
+def traced(category='db'):
+    """Decorator recording a span per call, named after the function.
+
+    List results are counted as rows.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with Span(category, func.__name__) as s:
+                result = func(*args, **kwargs)
+                if isinstance(result, list):
+                    s.rows = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def sql_name(sql):
+    """Short single-line name for a statement"""
+    name = " ".join(sql.split())
+    return name if len(name) <= SQL_NAME_LENGTH else name[:SQL_NAME_LENGTH - 3] + "..."
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor recording a span per statement, including fetching its rows"""
+
+    span = None
+
+    def timed(self, start, rows):
+        self.span.seconds += time.perf_counter() - start
+        self.span.rows += rows
+
+    def execute(self, sql, parameters=()):
+        self.span = Span('sql', sql_name(sql), sql, parameters)
+        self.span.rows = 0
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.timed(start, 0)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.span = Span('sql', sql_name(sql), sql)
+        self.span.rows = 0
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.timed(start, max(self.rowcount, 0))
+
+    def executescript(self, script):
+        self.span = Span('sql', sql_name(script))
+        self.span.rows = 0
+        start = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            self.timed(start, 0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.timed(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.timed(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.timed(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.timed(start, 0)
+            raise
+        self.timed(start, 1)
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection handing out TracedCursors while instrumentation is enabled"""
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TracedCursor if enabled else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if not enabled:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not enabled:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        if not enabled:
+            return super().executescript(script)
+        return self.cursor().executescript(script)
+
+
+def explain_query_plan(conn, sql, parameters=()):
+    """SQLite's query plan for a statement, one indented line per step"""
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, parameters or ()).fetchall()
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return "\n".join(lines) if lines else "(no query plan)"
+
+
+def summarize(records=None):
+    """Totals per (category, name) over the buffered spans, largest total first.
+
+    Each dict also holds the slowest span of its group, so the Diagnostics
+    tab can explain the statement behind it.
+    """
+    groups = {}
+    for s in list(spans) if records is None else records:
+        group = groups.get((s.category, s.name))
+        if group is None:
+            group = groups[(s.category, s.name)] = {
+                'category': s.category, 'name': s.name, 'calls': 0,
+                'seconds': 0.0, 'max_seconds': 0.0, 'rows': None, 'slowest': s,
+            }
+        group['calls'] += 1
+        group['seconds'] += s.seconds
+        if s.seconds >= group['max_seconds']:
+            group['max_seconds'] = s.seconds
+            group['slowest'] = s
+        if s.rows is not None:
+            group['rows'] = (group['rows'] or 0) + s.rows
+    return sorted(groups.values(), key=lambda g: g['seconds'], reverse=True)
+
+
+def write_trace(filename, records=None):
+    """Write spans as Chrome trace events; returns the number written"""
+    records = list(spans) if records is None else records
+    origin = min((s.start for s in records), default=0.0)
+    pid = os.getpid()
+    threads = {}
+    events = []
+    for s in records:
+        tid = threads.setdefault(s.thread, len(threads) + 1)
+        args = {} if s.rows is None else {'rows': s.rows}
+        if s.sql is not None:
+            args['sql'] = s.sql
+        events.append({'name': s.name, 'cat': s.category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                       'ts': (s.start - origin) * 1e6, 'dur': s.seconds * 1e6, 'args': args})
+    for name, tid in threads.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                       'args': {'name': name}})
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+    return len(records)
+
+
+def format_summary(groups, limit=20):
+    """Text table of summarize() output"""
+    lines = [f"{'Kind':<4} {'Calls':>6} {'Total ms':>9} {'Mean ms':>8} {'Max ms':>8} {'Rows':>8}  Name"]
+    for g in groups[:limit]:
+        rows = "" if g['rows'] is None else g['rows']
+        lines.append(f"{g['category']:<4} {g['calls']:>6} {g['seconds'] * 1e3:>9.2f} "
+                     f"{g['seconds'] / g['calls'] * 1e3:>8.2f} {g['max_seconds'] * 1e3:>8.2f} "
+                     f"{rows:>8}  {g['name']}")
+    return "\n".join(lines)
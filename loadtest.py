@@ -0,0 +1,221 @@
+"""Load test for the HTTP server mode.
+
+Starts `mental.py serve` in a subprocess on a free local port with freshly
+seeded user databases (or targets an already running server with --url),
+then runs client threads with keep-alive connections for a fixed time. Each
+client request goes to a random user and is one of:
+
+    history   GET  /entries (first History page)
+    save      POST /entries (add or replace a random day)
+    search    GET  /search
+    goals     GET  /goals
+    insights  GET  /insights
+
+Throughput (req/s) and latency percentiles are printed per operation and
+overall, and can be written as JSON:
+
+    python loadtest.py --users 8 --clients 16 --seconds 10
+    python loadtest.py --url http://127.0.0.1:8000 --users 8 --output load.json
+"""
+
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmark import ACTIVITIES, LAST_DATE, generate_entries, percentile
+from tracker_core import bulk_load_entries, open_database
+
+
+# Operation -> share of requests
+MIX = {
+    'history': 0.55,
+    'save': 0.2,
+    'search': 0.1,
+    'goals': 0.1,
+    'insights': 0.05,
+}
+
+DEFAULT_USERS = 8
+DEFAULT_CLIENTS = 16
+DEFAULT_SECONDS = 10
+DEFAULT_SEED_ENTRIES = 1000
+STARTUP_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed_databases(data_dir, users, entries, seed):
+    """Create user databases filled with synthetic history"""
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(users):
+        conn = open_database(os.path.join(data_dir, f'user{i}.db'))
+        bulk_load_entries(conn, generate_entries(entries, seed + i))
+        conn.close()
+
+
+def start_server(data_dir, port):
+    """Run the server in a subprocess and wait until /health answers"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mental.py')
+    process = subprocess.Popen([sys.executable, script, 'serve', '--data-dir', data_dir,
+                                '--port', str(port), '--quiet'],
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+def request_for(operation, user, rng, history_days):
+    """(method, path, body) for one request"""
+    base = f'/users/{user}'
+    if operation == 'history':
+        return 'GET', f'{base}/entries?limit=50', None
+    if operation == 'save':
+        day = LAST_DATE - datetime.timedelta(days=rng.randrange(history_days))
+        return 'POST', f'{base}/entries', {
+            'date': day.isoformat(),
+            'mood_score': rng.randint(1, 10),
+            'energy_level': rng.randint(1, 10),
+            'sleep_hours': rng.choice([6, 6.5, 7, 7.5, 8]),
+            'stress_level': rng.randint(1, 10),
+            'notes': 'load test',
+            'activities': rng.choice(ACTIVITIES),
+        }
+    if operation == 'search':
+        return 'GET', f'{base}/search?q={rng.choice(ACTIVITIES)}&limit=20', None
+    return 'GET', f'{base}/{operation}', None
+
+
+def run_client(host, port, users, deadline, seed, history_days, timings, errors):
+    """Send requests until `deadline`, appending (operation, seconds) to timings"""
+    rng = random.Random(seed)
+    operations = list(MIX)
+    weights = list(MIX.values())
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while time.monotonic() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        method, path, body = request_for(operation, f'user{rng.randrange(users)}',
+                                         rng, history_days)
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, data, headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(f"{operation}: {e}")
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        timings.append((operation, time.perf_counter() - start))
+        if response.status != 200:
+            errors.append(f"{operation}: HTTP {response.status}")
+    conn.close()
+
+
+def summarise(timings, seconds):
+    """Request count, req/s and latency percentiles per operation and overall"""
+    groups = {'all': [t for _, t in timings]}
+    for operation, t in timings:
+        groups.setdefault(operation, []).append(t)
+    summary = {}
+    for name, values in groups.items():
+        values.sort()
+        summary[name] = {
+            'requests': len(values),
+            'req_per_sec': len(values) / seconds,
+            'p50_ms': percentile(values, 0.5) * 1e3 if values else 0.0,
+            'p95_ms': percentile(values, 0.95) * 1e3 if values else 0.0,
+            'p99_ms': percentile(values, 0.99) * 1e3 if values else 0.0,
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the tracker's HTTP server")
+    parser.add_argument('--url', help="test a running server instead of starting one")
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS)
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS,
+                        help="concurrent client threads (default: %(default)s)")
+    parser.add_argument('--seconds', type=float, default=DEFAULT_SECONDS)
+    parser.add_argument('--seed-entries', type=int, default=DEFAULT_SEED_ENTRIES,
+                        help="history per seeded user (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    process = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        workdir = tempfile.mkdtemp(prefix='mht_load_')
+        print(f"Seeding {args.users} users with {args.seed_entries} entries...", file=sys.stderr)
+        seed_databases(workdir, args.users, args.seed_entries, args.seed)
+        host, port = '127.0.0.1', free_port()
+        process = start_server(workdir, port)
+
+    timings = []
+    errors = []
+    try:
+        deadline = time.monotonic() + args.seconds
+        clients = [threading.Thread(target=run_client,
+                                    args=(host, port, args.users, deadline, args.seed + i,
+                                          max(args.seed_entries, 1), timings, errors))
+                   for i in range(args.clients)]
+        start = time.monotonic()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.monotonic() - start
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = summarise(timings, elapsed)
+    print(f"\n{args.clients} clients, {args.users} users, {elapsed:.1f}s, {len(errors)} errors")
+    print(f"  {'operation':<10} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in summary.items():
+        print(f"  {name:<10} {stats['requests']:>9} {stats['req_per_sec']:>9.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    for error in errors[:10]:
+        print(f"  error: {error}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'clients': args.clients, 'users': args.users, 'seconds': elapsed,
+                       'errors': len(errors), 'results': summary}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Batch Insights reports for many user databases at once.
+
+Takes database files and directories of them (such as a server --data-dir,
+which holds <user id>.db per user) and computes each user's Insights report
+in a pool of worker processes, one per core by default. Every database is
+opened, migrated and reported on by a single worker, so the pool scales
+with cores rather than sharing one GIL. The output directory gets:
+
+    <user>.txt, <user>.json, <user>.html   one report per user and format
+    index.json, index.html                 every user's headline figures and
+                                           totals across all of them
+    progress.ndjson                        one line per finished database
+
+Progress lines are appended as each database finishes. With resume, a
+database whose size and modification time still match its progress line
+is not reported again, so an interrupted run picks up where it stopped.
+
+Start it with `python mental.py report users --output reports`.
+"""
+
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tracker_core import (
+    DEFAULT_PROFILE, SUMMARY_METRICS, build_insights_report, forecast_mood,
+    insights_summary, open_database,
+)
+
+
+REPORT_FORMATS = ('txt', 'json', 'html')
+
+PROGRESS_FILE = 'progress.ndjson'
+
+DATABASE_EXTENSION = '.db'
+
+
+def find_databases(sources):
+    """(user id, path) for each database file given or found in a given directory.
+
+    User ids are the file names without extension and must be unique.
+    """
+    databases = {}
+    for source in sources:
+        if os.path.isdir(source):
+            paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                           if name.endswith(DATABASE_EXTENSION))
+        elif os.path.isfile(source):
+            paths = [source]
+        else:
+            raise ValueError(f"{source} is not a database file or directory")
+        for path in paths:
+            user_id = os.path.splitext(os.path.basename(path))[0]
+            if user_id in databases and databases[user_id] != os.path.abspath(path):
+                raise ValueError(f"{databases[user_id]} and {path} would both be "
+                                 f"reported as user {user_id!r}")
+            databases[user_id] = os.path.abspath(path)
+    return sorted(databases.items())
+
+
+def file_state(path):
+    """(size, modification time) used to tell whether a database changed since its report"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def render_html(user_id, text):
+    """A standalone HTML page for one user's report"""
+    title = html.escape(f"Mental health insights: {user_id}")
+    return (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title></head>\n"
+            f"<body>\n<h1>{title}</h1>\n<pre>{html.escape(text)}</pre>\n</body></html>\n")
+
+
+def report_database(user_id, path, output_dir, formats, profile):
+    """Write one user's reports; runs in a worker process.
+
+    Returns a progress record. Errors are recorded rather than raised so
+    that one broken database doesn't stop the batch.
+    """
+    start = time.perf_counter()
+    record = {'user': user_id, 'path': path, 'pid': os.getpid()}
+    try:
+        conn = open_database(path, profile)
+        try:
+            text = build_insights_report(conn)
+            summary = insights_summary(conn)
+            summary['forecast'] = forecast_mood(conn)
+        finally:
+            conn.close()
+        base = os.path.join(output_dir, user_id)
+        if 'txt' in formats:
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(text)
+        if 'json' in formats:
+            with open(base + '.json', 'w', encoding='utf-8') as f:
+                json.dump({'user': user_id, 'summary': summary, 'text': text}, f, indent=2)
+        if 'html' in formats:
+            with open(base + '.html', 'w', encoding='utf-8') as f:
+                f.write(render_html(user_id, text))
+        record['summary'] = summary
+        record['error'] = None
+    except Exception as e:
+        record['summary'] = None
+        record['error'] = f"{type(e).__name__}: {e}"
+    # Stat after closing: closing checkpoints the WAL into the database file
+    record['state'] = file_state(path) if os.path.exists(path) else None
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+def read_progress(output_dir):
+    """Successful progress records by database path, the last one winning"""
+    records = {}
+    try:
+        with open(os.path.join(output_dir, PROGRESS_FILE), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+                if record.get('error') is None:
+                    records[record['path']] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def generate_reports(sources, output_dir, formats=REPORT_FORMATS, workers=None,
+                     resume=False, profile=DEFAULT_PROFILE, on_progress=None):
+    """Report on every database in `sources`; returns the run statistics.
+
+    `workers` defaults to the number of cores. on_progress(done, total,
+    record) is called in this process as each database finishes.
+    """
+    unknown = set(formats) - set(REPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"unknown report formats {sorted(unknown)}")
+    databases = find_databases(sources)
+    os.makedirs(output_dir, exist_ok=True)
+
+    done = read_progress(output_dir) if resume else {}
+    pending = []
+    records = []
+    for user_id, path in databases:
+        record = done.get(path)
+        if record and record['state'] == list(file_state(path)):
+            records.append(record)
+        else:
+            pending.append((user_id, path))
+    skipped = len(records)
+
+    start = time.perf_counter()
+    mode = 'a' if resume else 'w'
+    with open(os.path.join(output_dir, PROGRESS_FILE), mode, encoding='utf-8') as progress, \
+            ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(report_database, user_id, path, output_dir, tuple(formats), profile)
+                   for user_id, path in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            progress.write(json.dumps(record) + '\n')
+            progress.flush()
+            records.append(record)
+            if on_progress:
+                on_progress(len(records) - skipped, len(pending), record)
+    seconds = time.perf_counter() - start
+
+    write_index(output_dir, records, formats)
+    fresh = records[skipped:]
+    return {
+        'databases': len(databases),
+        'reported': sum(r['error'] is None for r in fresh),
+        'skipped': skipped,
+        'failed': [r for r in fresh if r['error'] is not None],
+        'seconds': seconds,
+        'workers': worker_stats(fresh),
+    }
+
+
+def worker_stats(records):
+    """Reports, entries and busy time per worker process"""
+    workers = {}
+    for record in records:
+        stats = workers.setdefault(record['pid'], {'pid': record['pid'], 'reports': 0,
+                                                   'entries': 0, 'seconds': 0.0})
+        stats['reports'] += 1
+        stats['seconds'] += record['seconds']
+        if record['summary']:
+            stats['entries'] += record['summary']['entries']
+    return sorted(workers.values(), key=lambda w: w['pid'])
+
+
+def write_index(output_dir, records, formats):
+    """Write index.json and index.html summarising every user"""
+    users = sorted((r for r in records if r['error'] is None), key=lambda r: r['user'])
+    entries = sum(r['summary']['entries'] for r in users)
+    totals = {'users': len(users), 'entries': entries, 'averages': {}}
+    for metric in SUMMARY_METRICS:
+        # Weighted by entries so that every logged day counts once
+        weighted = [(r['summary']['averages'][metric], r['summary']['entries']) for r in users
+                    if r['summary']['averages'][metric] is not None]
+        weight = sum(n for _, n in weighted)
+        totals['averages'][metric] = sum(v * n for v, n in weighted) / weight if weight else None
+    totals['low_forecasts'] = sum(1 for r in users
+                                  if r['summary']['forecast'] and r['summary']['forecast']['low'])
+
+    with open(os.path.join(output_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'totals': totals,
+                   'users': [{'user': r['user'], **r['summary']} for r in users]}, f, indent=2)
+
+    link = 'html' if 'html' in formats else formats[0] if formats else None
+    rows = []
+    for r in users:
+        s = r['summary']
+        name = html.escape(r['user'])
+        if link:
+            name = f'<a href="{html.escape(r["user"])}.{link}">{name}</a>'
+        forecast = s['forecast']
+        rows.append(
+            f"<tr><td>{name}</td><td>{s['entries']}</td>"
+            f"<td>{s['first_date'] or ''}</td><td>{s['last_date'] or ''}</td>"
+            + "".join(f"<td>{format_value(s['averages'][m])}</td>" for m in SUMMARY_METRICS)
+            + f"<td>{'' if forecast is None else format_value(forecast['mood'])}"
+              f"{' (low)' if forecast and forecast['low'] else ''}</td></tr>")
+    headings = ("User", "Entries", "First", "Last", "Mood", "Energy", "Sleep", "Stress",
+                "Anxiety", "Forecast")
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                "<title>Mental health insights</title></head>\n<body>\n"
+                f"<h1>Mental health insights: {totals['users']} users, "
+                f"{totals['entries']} entries</h1>\n<table>\n<tr>"
+                + "".join(f"<th>{h}</th>" for h in headings) + "</tr>\n"
+                + "\n".join(rows) + "\n</table>\n</body></html>\n")
+
+
+def format_value(value):
+    return "" if value is None else f"{value:.1f}"
+
+
+def format_report_stats(stats):
+    """Multi-line run summary with throughput per worker process"""
+    lines = [f"{stats['reported']} of {stats['databases']} databases reported in "
+             f"{stats['seconds']:.2f}s ({stats['skipped']} unchanged since the last run, "
+             f"{len(stats['failed'])} failed)"]
+    for record in stats['failed']:
+        lines.append(f"  failed: {record['path']}: {record['error']}")
+    if stats['workers']:
+        lines.append(f"  {'pid':>8} {'reports':>8} {'entries':>10} {'busy s':>8} "
+                     f"{'reports/s':>10} {'entries/s':>10}")
+        for w in stats['workers']:
+            rate = 1 / w['seconds'] if w['seconds'] else 0.0
+            lines.append(f"  {w['pid']:>8} {w['reports']:>8} {w['entries']:>10} "
+                         f"{w['seconds']:>8.2f} {w['reports'] * rate:>10.1f} "
+                         f"{w['entries'] * rate:>10.0f}")
+        busy = sum(w['seconds'] for w in stats['workers'])
+        if stats['seconds']:
+            lines.append(f"  {len(stats['workers'])} processes busy "
+                         f"{busy / stats['seconds']:.1f}x the wall-clock time")
+    return "\n".join(lines)
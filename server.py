@@ -0,0 +1,416 @@
+"""HTTP/JSON server mode for running the tracker as a shared service.
+
+Every user gets a database of their own, <data dir>/<user id>.db, served by
+a ConnectionPool of one writer and several reader connections. Routes live
+under /users/<user id> (see ROUTES and the README). There is no
+authentication, so run it behind a proxy that authenticates users.
+"""
+
+import json
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from goals import GOAL_SPEC_FIELDS
+from tracker_core import (
+    DEFAULT_PROFILE, HISTORY_PAGE_SIZE, build_insights_report, coerce_entry, connect,
+    data_version, delete_entry_by_id, delete_goal_by_id, dismiss_alerts, drop_entry_cache,
+    drop_mood_model, export_csv, export_json, export_ndjson, fetch_alerts, fetch_goals,
+    fetch_history_page, forecast_mood, insert_goal, insights_cache, run_maintenance,
+    run_migrations, search_entries, set_goal_completed, tag_analytics, upsert_entry,
+)
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+
+# Reader connections per user database
+DEFAULT_READERS = 4
+
+# Open user databases kept at once; the least recently used idle one is
+# closed beyond this
+DEFAULT_MAX_POOLS = 64
+
+# Largest accepted request body and page size
+MAX_BODY_BYTES = 1 << 20
+MAX_PAGE_SIZE = 1000
+
+USER_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}\Z')
+
+HISTORY_FIELDS = ('id', 'date', 'mood_score', 'energy_level', 'sleep_hours',
+                  'stress_level', 'anxiety_level', 'notes')
+SEARCH_FIELDS = HISTORY_FIELDS[:-1] + ('snippet',)
+GOAL_FIELDS = ('id', 'title', 'description', 'target_date', 'completed') + GOAL_SPEC_FIELDS + (
+    'value', 'days_logged', 'progress')
+
+EXPORTS = {
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+    'json': (export_json, 'application/json'),
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+}
+
+
+class HTTPError(Exception):
+    """Raised by route handlers to answer with an error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ConnectionPool:
+    """A writer connection and a set of reader connections to one database"""
+
+    def __init__(self, db_path, profile=DEFAULT_PROFILE, readers=DEFAULT_READERS):
+        self.writer_conn = connect(db_path, profile, check_same_thread=False)
+        run_migrations(self.writer_conn)
+        self.write_lock = threading.Lock()
+        # LIFO so the most recently used, warmest connections are reused first
+        self.readers = queue.LifoQueue()
+        self.reader_count = readers
+        for _ in range(readers):
+            self.readers.put(connect(db_path, profile, check_same_thread=False))
+        # Requests currently using the pool; guarded by the PoolManager lock
+        self.active = 0
+
+    @contextmanager
+    def reader(self):
+        """Borrow a reader connection, waiting if all are busy"""
+        conn = self.readers.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Hold the writer connection; SQLite allows one writer at a time"""
+        with self.write_lock:
+            try:
+                yield self.writer_conn
+            except BaseException:
+                self.writer_conn.rollback()
+                raise
+
+    def close(self):
+        """Close every connection once the pool is idle, and free the
+        in-memory state kept for its database"""
+        for _ in range(self.reader_count):
+            self.readers.get().close()
+        with self.write_lock:
+            run_maintenance(self.writer_conn, closing=True)
+            drop_entry_cache(self.writer_conn)
+            drop_mood_model(self.writer_conn)
+            insights_cache.pop(data_version(self.writer_conn)[0], None)
+            self.writer_conn.close()
+
+
+class PoolManager:
+    """Opens a ConnectionPool per user database and closes idle ones"""
+
+    def __init__(self, data_dir, profile=DEFAULT_PROFILE, readers=DEFAULT_READERS,
+                 max_pools=DEFAULT_MAX_POOLS):
+        self.data_dir = data_dir
+        self.profile = profile
+        self.readers = readers
+        self.max_pools = max_pools
+        self.pools = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(data_dir, exist_ok=True)
+
+    def database_path(self, user_id):
+        if not USER_ID_PATTERN.match(user_id):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid user id {user_id!r}")
+        return os.path.join(self.data_dir, f'{user_id}.db')
+
+    @contextmanager
+    def checkout(self, user_id):
+        """Use the pool of `user_id`, opening it if needed"""
+        path = self.database_path(user_id)
+        with self.lock:
+            pool = self.pools.get(user_id)
+            if pool is None:
+                pool = self.pools[user_id] = ConnectionPool(path, self.profile, self.readers)
+            self.pools.move_to_end(user_id)
+            pool.active += 1
+            evicted = self.evict()
+        for idle in evicted:
+            idle.close()
+        try:
+            yield pool
+        finally:
+            with self.lock:
+                pool.active -= 1
+
+    def evict(self):
+        """Remove least recently used idle pools beyond max_pools; returns them"""
+        evicted = []
+        for user_id, pool in list(self.pools.items()):
+            if len(self.pools) <= self.max_pools:
+                break
+            if pool.active == 0:
+                evicted.append(self.pools.pop(user_id))
+        return evicted
+
+    def close(self):
+        with self.lock:
+            pools = list(self.pools.values())
+            self.pools.clear()
+        for pool in pools:
+            pool.close()
+
+
+def query_int(query, name, default, maximum=None):
+    """An integer query parameter, or `default` when it is absent"""
+    value = query.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    return value if maximum is None else min(value, maximum)
+
+
+def list_entries(conn, ids, query, body):
+    rows = fetch_history_page(conn, query.get('before'),
+                              query_int(query, 'limit', HISTORY_PAGE_SIZE, MAX_PAGE_SIZE))
+    return [dict(zip(HISTORY_FIELDS, row)) for row in rows]
+
+
+def save_entry(conn, ids, query, body):
+    entry = coerce_entry(body)
+    entry_id = upsert_entry(conn, entry)
+    return {'id': entry_id, 'alerts': fetch_alerts(conn, date=entry[0])}
+
+
+def delete_entry(conn, ids, query, body):
+    delete_entry_by_id(conn, int(ids[0]))
+    return {'deleted': int(ids[0])}
+
+
+def search(conn, ids, query, body):
+    rows = search_entries(conn, query.get('q', ''),
+                          query_int(query, 'limit', HISTORY_PAGE_SIZE, MAX_PAGE_SIZE))
+    return [dict(zip(SEARCH_FIELDS, row)) for row in rows]
+
+
+def list_tags(conn, ids, query, body):
+    return tag_analytics(conn, query.get('kind'), query_int(query, 'min_entries', 3))
+
+
+def list_goals(conn, ids, query, body):
+    return [dict(zip(GOAL_FIELDS, row)) for row in fetch_goals(conn)]
+
+
+def add_goal(conn, ids, query, body):
+    title = str(body.get('title') or '').strip()
+    if not title:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "title is required")
+    target_date = body.get('target_date') or None
+    tracking = {field: body[field] for field in GOAL_SPEC_FIELDS if body.get(field) is not None}
+    if tracking and 'kind' not in tracking:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "kind is required for a metric goal")
+    try:
+        goal_id = insert_goal(conn, title, str(body.get('description') or ''), target_date,
+                              **tracking)
+    except TypeError as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid goal: {e}")
+    return {'id': goal_id}
+
+
+def complete_goal(conn, ids, query, body):
+    set_goal_completed(conn, int(ids[0]))
+    return {'completed': int(ids[0])}
+
+
+def delete_goal(conn, ids, query, body):
+    delete_goal_by_id(conn, int(ids[0]))
+    return {'deleted': int(ids[0])}
+
+
+def insights(conn, ids, query, body):
+    return {'text': build_insights_report(conn)}
+
+
+def forecast(conn, ids, query, body):
+    return forecast_mood(conn)
+
+
+def list_alerts(conn, ids, query, body):
+    return fetch_alerts(conn, query.get('all') in ('1', 'true'),
+                        limit=query_int(query, 'limit', HISTORY_PAGE_SIZE, MAX_PAGE_SIZE))
+
+
+def dismiss_alert(conn, ids, query, body):
+    dismiss_alerts(conn, [int(ids[0])])
+    return {'dismissed': int(ids[0])}
+
+
+# (method, path below /users/<id>/, handler, needs the writer connection)
+ROUTES = [
+    ('GET', r'entries', list_entries, False),
+    ('POST', r'entries', save_entry, True),
+    ('DELETE', r'entries/(\d+)', delete_entry, True),
+    ('GET', r'search', search, False),
+    ('GET', r'tags', list_tags, False),
+    ('GET', r'goals', list_goals, False),
+    ('POST', r'goals', add_goal, True),
+    ('POST', r'goals/(\d+)/complete', complete_goal, True),
+    ('DELETE', r'goals/(\d+)', delete_goal, True),
+    ('GET', r'insights', insights, False),
+    ('GET', r'forecast', forecast, False),
+    ('GET', r'alerts', list_alerts, False),
+    ('POST', r'alerts/(\d+)/dismiss', dismiss_alert, True),
+]
+ROUTES = [(method, re.compile(pattern + r'\Z'), handler, write)
+          for method, pattern, handler, write in ROUTES]
+USER_PATH = re.compile(r'/users/([^/]+)/(.+)\Z')
+
+
+class TrackerRequestHandler(BaseHTTPRequestHandler):
+    """Maps HTTP requests onto the tracker_core functions"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MentalHealthTracker'
+    # Headers and body are written separately; without TCP_NODELAY keep-alive
+    # responses stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def handle_request(self, method):
+        url = urlsplit(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            body = self.read_body()
+            if url.path == '/health':
+                return self.send_json(HTTPStatus.OK, {'status': 'ok'})
+            match = USER_PATH.match(url.path)
+            if not match:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"no such path {url.path}")
+            user_id, rest = match.groups()
+            if method == 'GET' and rest == 'export':
+                return self.send_export(user_id, query.get('format', 'json'))
+            handler, ids, write = self.route(method, rest)
+            with self.server.pools.checkout(user_id) as pool:
+                with (pool.writer() if write else pool.reader()) as conn:
+                    result = handler(conn, ids, query, body)
+            self.send_json(HTTPStatus.OK, result)
+        except HTTPError as e:
+            self.send_json(e.status, {'error': str(e)})
+        except ValueError as e:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+        except sqlite3.Error as e:
+            self.log_error("database error: %s", e)
+            self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "database error"})
+        except Exception as e:
+            # Answer rather than drop the connection; the details go to the log only
+            self.log_error("error handling %s %s: %r", method, url.path, e)
+            self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "internal error"})
+
+    def route(self, method, path):
+        allowed = False
+        for route_method, pattern, handler, write in ROUTES:
+            match = pattern.match(path)
+            if match:
+                if route_method == method:
+                    return handler, match.groups(), write
+                allowed = True
+        if allowed:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed here")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"no such resource {path}")
+
+    def read_body(self):
+        """The decoded JSON request body, or {} without one"""
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "request body must be a JSON object")
+        return body
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_export(self, user_id, fmt):
+        """Export to a temporary file on a reader connection, then stream it"""
+        if fmt not in EXPORTS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown export format {fmt!r}")
+        exporter, content_type = EXPORTS[fmt]
+        fd, path = tempfile.mkstemp(suffix='.' + fmt, dir=self.server.pools.data_dir)
+        os.close(fd)
+        try:
+            with self.server.pools.checkout(user_id) as pool:
+                with pool.reader() as conn:
+                    exporter(conn, path)
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(os.path.getsize(path)))
+            self.send_header('Content-Disposition',
+                             f'attachment; filename="{user_id}.{fmt}"')
+            self.end_headers()
+            with open(path, 'rb') as f:
+                while chunk := f.read(1 << 16):
+                    self.wfile.write(chunk)
+        finally:
+            os.remove(path)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class TrackerServer(ThreadingHTTPServer):
+    """Threaded HTTP server sharing one PoolManager across requests"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, pools, quiet=False):
+        super().__init__(address, TrackerRequestHandler)
+        self.pools = pools
+        self.quiet = quiet
+
+
+def serve(data_dir, host=DEFAULT_HOST, port=DEFAULT_PORT, profile=DEFAULT_PROFILE,
+          readers=DEFAULT_READERS, max_pools=DEFAULT_MAX_POOLS, quiet=False):
+    """Run the server until interrupted"""
+    pools = PoolManager(data_dir, profile, readers, max_pools)
+    server = TrackerServer((host, port), pools, quiet)
+    print(f"Serving user databases from {data_dir} on http://{host}:{server.server_port}",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pools.close()
@@ -0,0 +1,286 @@
+"""Incremental sync of mood entries and goals between tracker databases.
+
+Triggers record every change in the database's change_log. A sync sends
+each side the latest change of every row the other hasn't seen, matching
+rows on entry date and goal uid; when both sides changed a row, the later
+change wins on both. Databases sync as two files or over a local TCP
+socket (`mental.py sync --listen PORT`), which has no authentication.
+"""
+
+import json
+import socket
+import socketserver
+import sqlite3
+
+from goals import GOAL_SPEC_FIELDS
+from tracker_core import ENTRY_COLUMNS, merge_staged_entries, traced
+
+
+# Goal columns sent with a goal change, after its uid
+GOAL_COLUMNS = ('title', 'description', 'target_date', 'completed', 'created_at') + GOAL_SPEC_FIELDS
+
+DEFAULT_SYNC_HOST = '127.0.0.1'
+DEFAULT_SYNC_PORT = 8765
+
+
+def instance_id(conn):
+    """This database's sync identity"""
+    return conn.execute('SELECT instance_id FROM sync_identity').fetchone()[0]
+
+
+def received_seq(conn, peer_id):
+    """The last of `peer_id`'s change numbers applied here"""
+    row = conn.execute('SELECT received_seq FROM sync_peers WHERE peer_id = ?',
+                       (peer_id,)).fetchone()
+    return row[0] if row else 0
+
+
+@traced()
+def changes_since(conn, seq, exclude_origin=None):
+    """The latest change of each row changed after `seq`, with the row's data.
+
+    Changes made by `exclude_origin` are left out; they would only be sent
+    back where they came from. Returns (changes, last sequence number
+    covered); each change is a dict that can be passed to apply_changes()
+    on another database, as is or through JSON.
+    """
+    me = instance_id(conn)
+    conn.execute('BEGIN')
+    try:
+        last = max(conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0], seq)
+        # Bare columns take their values from the row with MAX(seq)
+        rows = conn.execute('''
+            SELECT table_name, row_key, op, changed_at, COALESCE(origin, ?), MAX(seq)
+            FROM change_log WHERE seq > ? AND seq <= ?
+            GROUP BY table_name, row_key ORDER BY MAX(seq)
+        ''', (me, seq, last)).fetchall()
+        changes = []
+        for table, key, op, changed_at, origin, _ in rows:
+            if origin == exclude_origin:
+                continue
+            change = {'table': table, 'key': key, 'op': op, 'changed_at': changed_at,
+                      'origin': origin, 'row': None}
+            if op == 'upsert':
+                change['row'] = list(read_row(conn, table, key))
+            changes.append(change)
+    finally:
+        conn.rollback()
+    return changes, last
+
+
+def read_row(conn, table, key):
+    if table == 'mood_entries':
+        return conn.execute(f'SELECT {", ".join(ENTRY_COLUMNS)} FROM mood_entries WHERE date = ?',
+                            (key,)).fetchone()
+    return conn.execute(f'SELECT {", ".join(GOAL_COLUMNS)} FROM goals WHERE uid = ?',
+                        (key,)).fetchone()
+
+
+def latest_change(conn, me, table, key):
+    row = conn.execute('''
+        SELECT changed_at, COALESCE(origin, ?) FROM change_log
+        WHERE table_name = ? AND row_key = ? ORDER BY seq DESC LIMIT 1
+    ''', (me, table, key)).fetchone()
+    return tuple(row) if row else None
+
+
+@traced()
+def apply_changes(conn, peer_id, changes, last_seq):
+    """Apply a peer's changes_since() output in one transaction.
+
+    A change is applied unless this database holds a later change of the
+    same row. The applied changes are logged with the peer's times and
+    origins, not as new changes made here. Returns the number applied.
+    """
+    me = instance_id(conn)
+    if peer_id == me:
+        raise ValueError("both databases have the same sync identity; "
+                         "one is probably a copy of the other")
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        winners = [c for c in changes
+                   if (c['changed_at'], c['origin']) > (latest_change(conn, me, c['table'], c['key'])
+                                                       or ('', ''))]
+        seq_before = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+
+        entries = [c['row'] for c in winners if c['table'] == 'mood_entries' and c['op'] == 'upsert']
+        if entries:
+            conn.execute('''
+                CREATE TEMP TABLE import_staging (
+                    date TEXT PRIMARY KEY, mood_score INTEGER, energy_level INTEGER,
+                    sleep_hours REAL, stress_level INTEGER, anxiety_level INTEGER,
+                    notes TEXT, activities TEXT, triggers TEXT, medications TEXT
+                )
+            ''')
+            conn.executemany('INSERT INTO temp.import_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             entries)
+            merge_staged_entries(conn)
+            conn.execute('DROP TABLE temp.import_staging')
+        conn.executemany('DELETE FROM mood_entries WHERE date = ?',
+                         [(c['key'],) for c in winners
+                          if c['table'] == 'mood_entries' and c['op'] == 'delete'])
+
+        updated = [c for c in GOAL_COLUMNS if c != 'created_at']
+        conn.executemany(f'''
+            INSERT INTO goals (uid, {", ".join(GOAL_COLUMNS)})
+            VALUES (?, {", ".join("?" for _ in GOAL_COLUMNS)})
+            ON CONFLICT(uid) DO UPDATE SET
+                {", ".join(f"{c} = excluded.{c}" for c in updated)}
+        ''', [[c['key']] + c['row'] for c in winners
+              if c['table'] == 'goals' and c['op'] == 'upsert'])
+        conn.executemany('DELETE FROM goals WHERE uid = ?',
+                         [(c['key'],) for c in winners if c['table'] == 'goals' and c['op'] == 'delete'])
+
+        # Replace what the triggers logged with the changes as the peer made them
+        conn.execute('DELETE FROM change_log WHERE seq > ?', (seq_before,))
+        conn.executemany('''
+            INSERT INTO change_log (table_name, row_key, op, changed_at, origin)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(c['table'], c['key'], c['op'], c['changed_at'], c['origin']) for c in winners])
+
+        conn.execute('''
+            INSERT INTO sync_peers (peer_id, received_seq, synced_at)
+            VALUES (?, ?, strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+            ON CONFLICT(peer_id) DO UPDATE SET
+                received_seq = MAX(received_seq, excluded.received_seq),
+                synced_at = excluded.synced_at
+        ''', (peer_id, last_seq))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        conn.execute('DROP TABLE IF EXISTS temp.import_staging')
+        raise
+    return len(winners)
+
+
+class LocalPeer:
+    """A database to sync with, opened in this process"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.bytes_sent = self.bytes_received = 0
+
+    def instance_id(self):
+        return instance_id(self.conn)
+
+    def received_seq(self, peer_id):
+        return received_seq(self.conn, peer_id)
+
+    def changes_since(self, seq, exclude_origin):
+        return changes_since(self.conn, seq, exclude_origin)
+
+    def apply_changes(self, peer_id, changes, last_seq):
+        return apply_changes(self.conn, peer_id, changes, last_seq)
+
+
+class RemotePeer:
+    """A database served by `mental.py sync --listen`, reached over TCP"""
+
+    def __init__(self, host=DEFAULT_SYNC_HOST, port=DEFAULT_SYNC_PORT, timeout=60):
+        self.socket = socket.create_connection((host, port), timeout)
+        self.file = self.socket.makefile('rwb')
+        self.bytes_sent = self.bytes_received = 0
+
+    def call(self, method, *args):
+        request = json.dumps({'method': method, 'args': args}).encode('utf-8') + b'\n'
+        self.file.write(request)
+        self.file.flush()
+        line = self.file.readline()
+        self.bytes_sent += len(request)
+        self.bytes_received += len(line)
+        if not line:
+            raise ConnectionError("sync peer closed the connection")
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise ValueError(f"sync peer: {reply['error']}")
+        return reply['result']
+
+    def instance_id(self):
+        return self.call('instance_id')
+
+    def received_seq(self, peer_id):
+        return self.call('received_seq', peer_id)
+
+    def changes_since(self, seq, exclude_origin):
+        return tuple(self.call('changes_since', seq, exclude_origin))
+
+    def apply_changes(self, peer_id, changes, last_seq):
+        return self.call('apply_changes', peer_id, changes, last_seq)
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def sync(conn, peer):
+    """Exchange changes between `conn` and a LocalPeer or RemotePeer.
+
+    Returns counts of the changes sent and received and how many of each
+    were applied.
+    """
+    local = LocalPeer(conn)
+    me, other = local.instance_id(), peer.instance_id()
+    if me == other:
+        raise ValueError("both databases have the same sync identity; "
+                         "one is probably a copy of the other")
+
+    outgoing, last = local.changes_since(peer.received_seq(me), other)
+    sent_applied = peer.apply_changes(me, outgoing, last)
+
+    incoming, last = peer.changes_since(local.received_seq(other), me)
+    received_applied = local.apply_changes(other, incoming, last)
+    return {
+        'sent': len(outgoing),
+        'sent_applied': sent_applied,
+        'received': len(incoming),
+        'received_applied': received_applied,
+        'bytes_sent': peer.bytes_sent,
+        'bytes_received': peer.bytes_received,
+    }
+
+
+def format_sync_stats(stats):
+    text = (f"Sent {stats['sent']} changes ({stats['sent_applied']} applied), "
+            f"received {stats['received']} ({stats['received_applied']} applied)")
+    if stats['bytes_sent'] or stats['bytes_received']:
+        text += f"; {stats['bytes_sent']} bytes out, {stats['bytes_received']} bytes in"
+    return text
+
+
+class SyncHandler(socketserver.StreamRequestHandler):
+    """Serves the LocalPeer methods of the server's database, one JSON line per call"""
+
+    def handle(self):
+        peer = self.server.peer
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get('method') not in SYNC_METHODS:
+                    raise ValueError(f"unknown method {request.get('method')!r}")
+                reply = {'result': getattr(peer, request['method'])(*request.get('args', []))}
+            except (ValueError, TypeError, KeyError) as e:
+                reply = {'error': str(e)}
+            except sqlite3.Error as e:
+                # e.g. a locked database; the peer reports it instead of hanging up
+                reply = {'error': f"database error: {e}"}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+
+SYNC_METHODS = ('instance_id', 'received_seq', 'changes_since', 'apply_changes')
+
+
+def serve_sync(conn, host=DEFAULT_SYNC_HOST, port=DEFAULT_SYNC_PORT):
+    """Serve `conn` to RemotePeers until interrupted, one connection at a time"""
+    with socketserver.TCPServer((host, port), SyncHandler) as server:
+        server.peer = LocalPeer(conn)
+        print(f"Serving sync on {host}:{server.server_address[1]}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
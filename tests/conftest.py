@@ -0,0 +1,19 @@
+"""Fixtures shared by the tracker tests"""
+
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to mental.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracker_core import open_database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A migrated tracker database in a temporary directory"""
+    conn = open_database(str(tmp_path / 'tracker.db'))
+    yield conn
+    conn.close()
@@ -0,0 +1,119 @@
+"""The NumPy analytics engine against straightforward reference computations"""
+
+import datetime
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from tracker_core import bulk_load_entries, build_insights_report, mood_slope
+
+np = pytest.importorskip('numpy')
+import analytics  # noqa: E402
+from analytics import METRICS, AnalyticsEngine, rank_with_nan  # noqa: E402
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def random_engine(count, seed=0, missing=0.0):
+    rng = random.Random(seed)
+    days = np.cumsum([rng.randint(1, 3) for _ in range(count)]) + 19000
+    columns = {name: [float(rng.randint(1, 10)) if rng.random() >= missing else np.nan
+                      for _ in range(count)] for name in METRICS}
+    return AnalyticsEngine(days, columns)
+
+
+def test_pearson_matches_numpy():
+    engine = random_engine(200)
+    names, matrix = engine.correlation_matrix()
+    assert names == METRICS
+    expected = np.corrcoef(np.vstack([engine.columns[name] for name in METRICS]))
+    assert matrix == pytest.approx(expected)
+
+
+def test_spearman_ranks_ties_by_their_mean():
+    assert rank_with_nan(np.array([3.0, np.nan, 1.0, 3.0, 2.0])).tolist()[2:] == [1.0, 3.5, 2.0]
+
+    engine = random_engine(200, seed=1)
+    _, matrix = engine.correlation_matrix('spearman')
+    ranks = np.vstack([rank_with_nan(engine.columns[name]) for name in METRICS])
+    assert matrix == pytest.approx(np.corrcoef(ranks))
+    with pytest.raises(ValueError):
+        engine.correlation_matrix('kendall')
+
+
+def test_correlations_use_rows_where_both_are_set():
+    engine = random_engine(300, seed=2, missing=0.3)
+    _, matrix = engine.correlation_matrix()
+    mood, sleep = engine.columns['mood_score'], engine.columns['sleep_hours']
+    both = ~np.isnan(mood) & ~np.isnan(sleep)
+    assert matrix[0, 2] == pytest.approx(np.corrcoef(mood[both], sleep[both])[0, 1])
+
+    _, matrix = engine.correlation_matrix('spearman')
+    ranks = [rank_with_nan(mood[both]), rank_with_nan(sleep[both])]
+    assert matrix[0, 2] == pytest.approx(np.corrcoef(ranks)[0, 1])
+
+
+def test_rolling_mean_and_ewma():
+    engine = random_engine(4000, seed=3, missing=0.2)
+    values = engine.columns['mood_score']
+
+    rolling = engine.rolling_mean('mood_score', 7)
+    for i in (0, 5, 100, 3999):
+        window = values[max(0, i - 6):i + 1]
+        window = window[~np.isnan(window)]
+        assert rolling[i] == pytest.approx(window.mean()) if len(window) else np.isnan(rolling[i])
+
+    # Long enough to cross several closed-form blocks; gaps repeat the last value
+    ewma = engine.ewma('mood_score', alpha=0.2)
+    average = last = None
+    for i, value in enumerate(values):
+        last = last if np.isnan(value) else value
+        if last is not None:
+            average = last if average is None else 0.8 * average + 0.2 * last
+        assert (average is None and np.isnan(ewma[i])) or ewma[i] == pytest.approx(average)
+
+
+def test_trend_and_day_of_week():
+    engine = random_engine(120, seed=4, missing=0.1)
+    mood = engine.columns['mood_score']
+    present = ~np.isnan(mood)
+    trend = engine.trend('mood_score')
+    assert trend['n'] == present.sum()
+    assert trend['slope'] == pytest.approx(np.polyfit(engine.days[present], mood[present], 1)[0])
+    assert trend['ci_low'] < trend['slope'] < trend['ci_high']
+    assert engine.trend('mood_score', last_days=2) is None
+
+    weekdays = engine.day_of_week()
+    for name, count, mean, offset in weekdays:
+        values = [m for d, m in zip(engine.days, mood) if not np.isnan(m)
+                  and (EPOCH + datetime.timedelta(days=int(d))).strftime('%A') == name]
+        assert count == len(values)
+        if values:
+            assert mean == pytest.approx(np.mean(values))
+            assert offset == pytest.approx(np.mean(values) - np.nanmean(mood))
+
+
+def test_mood_slope():
+    assert mood_slope([('2024-01-01', 3), ('2024-01-02', 4), ('2024-01-04', 6)]) == pytest.approx(1)
+    assert mood_slope([('2024-01-01', 3)]) == 0.0
+
+
+def test_engine_loads_the_database(db):
+    bulk_load_entries(db, [('2024-01-01', 5, 5, None, 3, 3, '', '', '', ''),
+                           ('2024-01-03', 7, 6, 8.0, 2, 2, '', '', '', ''),
+                           ('2024-01-02', 6, 5, 7.0, 3, 3, '', '', '', '')])
+    engine = AnalyticsEngine.from_connection(db)
+    assert engine.days.tolist() == [(datetime.date(2024, 1, d) - EPOCH).days for d in (1, 2, 3)]
+    assert engine.columns['mood_score'].tolist() == [5, 6, 7]
+    assert np.isnan(engine.columns['sleep_hours'][0])
+    assert "ADVANCED ANALYTICS:" in build_insights_report(db)
+
+
+def test_numpy_is_imported_on_first_use():
+    code = ("import sys, analytics; assert 'numpy' not in sys.modules; "
+            "assert analytics.numpy_available(); assert 'numpy' in sys.modules")
+    subprocess.run([sys.executable, '-c', code],
+                   cwd=os.path.dirname(os.path.abspath(analytics.__file__)), check=True)
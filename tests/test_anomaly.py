@@ -0,0 +1,121 @@
+"""Alerts raised as entries are saved"""
+
+import datetime
+import random
+import sqlite3
+
+import pytest
+
+from anomaly import MIN_READINGS, AnomalyDetector
+from tracker_core import (
+    build_insights_report, delete_entries, dismiss_alerts, fetch_alerts, load_detector,
+    rebuild_detector, upsert_entry,
+)
+
+
+def days(count, start=datetime.date(2024, 1, 1)):
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def entry(date, mood, sleep=7.5, stress=3, anxiety=3):
+    return (date, mood, 5, sleep, stress, anxiety, '', '', '', '')
+
+
+def usual_days(conn, rng, dates):
+    for date in dates:
+        upsert_entry(conn, entry(date, rng.choice([6, 7, 8]), rng.choice([7.0, 7.5, 8.0])))
+
+
+def alert_kinds(conn, **kwargs):
+    return [(a['date'], a['metric'], a['kind']) for a in fetch_alerts(conn, **kwargs)]
+
+
+def test_unusual_reading(db):
+    rng = random.Random(1)
+    dates = days(MIN_READINGS + 6)
+    usual_days(db, rng, dates[:-1])
+    assert fetch_alerts(db) == []
+
+    upsert_entry(db, entry(dates[-1], 1, stress=3))
+    assert alert_kinds(db) == [(dates[-1], 'mood_score', 'reading')]
+    # Re-saving the day replaces its alerts
+    upsert_entry(db, entry(dates[-1], 7))
+    assert fetch_alerts(db) == []
+
+
+def test_downturn_takes_several_days(db):
+    rng = random.Random(2)
+    dates = days(40)
+    usual_days(db, rng, dates[:30])
+    for date in dates[30:]:
+        upsert_entry(db, entry(date, 5, sleep=6.0))
+    downturns = [a for a in fetch_alerts(db) if a['kind'] == 'downturn']
+    assert downturns
+    assert all(date > dates[31] for date, _, kind in alert_kinds(db) if kind == 'downturn')
+    assert all(a['kind'] != 'reading' for a in fetch_alerts(db) if a['metric'] == 'mood_score')
+
+
+def test_dismissed_alerts_are_hidden(db):
+    rng = random.Random(3)
+    dates = days(MIN_READINGS + 2)
+    usual_days(db, rng, dates[:-1])
+    upsert_entry(db, entry(dates[-1], 1, sleep=2.0))
+    alerts = fetch_alerts(db)
+    assert len(alerts) == 2
+    dismiss_alerts(db, [alerts[0]['id']])
+    assert [a['id'] for a in fetch_alerts(db)] == [alerts[1]['id']]
+    assert len(fetch_alerts(db, include_dismissed=True)) == 2
+
+
+def test_dismissed_alerts_leave_the_insights_report(db):
+    rng = random.Random(6)
+    dates = days(MIN_READINGS + 2)
+    usual_days(db, rng, dates[:-1])
+    upsert_entry(db, entry(dates[-1], 1))
+    [alert] = fetch_alerts(db)
+    assert alert['message'] in build_insights_report(db)
+    dismiss_alerts(db, [alert['id']])
+    assert alert['message'] not in build_insights_report(db)
+
+
+def test_stored_state_matches_a_rebuild(db):
+    rng = random.Random(4)
+    dates = days(60)
+    usual_days(db, rng, dates)
+    # Edits and deletes take their replaced values out of the usual levels
+    for date in rng.sample(dates, 10):
+        upsert_entry(db, entry(date, rng.randint(1, 10)))
+    ids = [row[0] for row in db.execute('SELECT id FROM mood_entries ORDER BY date LIMIT 5')]
+    delete_entries(db, ids)
+
+    stored, rebuilt = load_detector(db), rebuild_detector(db)
+    for metric, state in rebuilt.metrics.items():
+        assert stored.metrics[metric]['count'] == state['count']
+        assert stored.metrics[metric]['mean'] == pytest.approx(state['mean'])
+        assert stored.metrics[metric]['m2'] == pytest.approx(state['m2'])
+
+
+def test_stale_state_is_rebuilt(db):
+    rng = random.Random(5)
+    dates = days(30)
+    usual_days(db, rng, dates)
+    path = db.execute('PRAGMA database_list').fetchone()[2]
+    other = sqlite3.connect(path)
+    other.execute("UPDATE mood_entries SET mood_score = 10")
+    other.commit()
+    other.close()
+
+    upsert_entry(db, entry('2024-03-01', 10))
+    stored = load_detector(db)
+    assert stored.metrics['mood_score']['count'] == 31
+    assert stored.metrics['mood_score']['mean'] == pytest.approx(10.0)
+
+
+def test_detector_state_round_trip():
+    detector = AnomalyDetector(3)
+    for i, date in enumerate(days(20)):
+        detector.update(date, {'mood_score': 5 + i % 3, 'sleep_hours': 7.0})
+    copy = AnomalyDetector.from_dict(detector.to_dict())
+    assert copy.to_dict() == detector.to_dict()
+    with pytest.raises(ValueError):
+        AnomalyDetector.from_dict(dict(detector.to_dict(), format=0))
@@ -0,0 +1,85 @@
+"""The .mha columnar archive format"""
+
+import datetime
+import io
+import random
+
+import pytest
+
+from archive import (
+    ARCHIVE_COLUMNS, BLOCK_ROWS, ArchiveError, ArchiveReader, ArchiveWriter,
+)
+
+
+def archived_rows(count, seed=0):
+    rng = random.Random(seed)
+    start = datetime.date(2010, 1, 1)
+    rows = []
+    for i in range(count):
+        rows.append(((start + datetime.timedelta(days=i)).isoformat(), rng.randint(1, 10),
+                     rng.randint(1, 10), rng.choice([None, 6.5, 7.25]), rng.choice([None, 4]),
+                     rng.randint(1, 10), rng.choice(['', f'note {i} ☀', None]),
+                     rng.choice(['', 'walk', 'walk,yoga']), rng.choice(['', 'work', None]), '',
+                     f'2024-01-01 00:00:{i % 60:02d}'))
+    return rows
+
+
+def write_archive(path, rows):
+    with open(path, 'wb') as f:
+        writer = ArchiveWriter(f)
+        for start in range(0, len(rows), 1000):
+            writer.add_rows(rows[start:start + 1000])
+        writer.close()
+
+
+def test_round_trip_over_several_blocks(tmp_path):
+    rows = archived_rows(2 * BLOCK_ROWS + 10)
+    path = str(tmp_path / 'entries.mha')
+    write_archive(path, rows)
+
+    with ArchiveReader(path) as archive:
+        assert len(archive) == len(rows)
+        assert len(archive.blocks) == 3
+        assert archive.date_range() == (rows[0][0], rows[-1][0])
+        assert [row for batch in archive.iter_batches() for row in batch] == rows
+        records = list(archive.iter_records())
+        assert records[5] == dict(zip(ARCHIVE_COLUMNS, rows[5]))
+
+
+def test_date_ranges_and_column_subsets(tmp_path):
+    rows = archived_rows(3 * BLOCK_ROWS)
+    path = str(tmp_path / 'entries.mha')
+    write_archive(path, rows)
+    first, last = rows[BLOCK_ROWS - 5][0], rows[BLOCK_ROWS + 5][0]
+
+    with ArchiveReader(path) as archive:
+        batches = list(archive.iter_batches(first, last, ('date', 'mood_score')))
+        # Only the two blocks around the boundary are read
+        assert [len(batch) for batch in batches] == [5, 6]
+        assert [row for batch in batches for row in batch] == \
+            [row[:2] for row in rows[BLOCK_ROWS - 5:BLOCK_ROWS + 6]]
+        assert list(archive.iter_batches('2000-01-01', '2000-12-31')) == []
+        with pytest.raises(ValueError):
+            list(archive.iter_batches(columns=('id',)))
+
+
+def test_rows_must_be_ascending_and_in_range():
+    with pytest.raises(ValueError, match="ascending"):
+        writer = ArchiveWriter(io.BytesIO())
+        writer.add_rows(archived_rows(2)[::-1])
+        writer.close()
+    row = archived_rows(1)[0]
+    with pytest.raises(ValueError, match="mood_score"):
+        writer = ArchiveWriter(io.BytesIO())
+        writer.add_rows([row[:1] + (1000,) + row[2:]])
+        writer.close()
+
+
+def test_invalid_files(tmp_path):
+    empty = tmp_path / 'empty.mha'
+    empty.write_bytes(b'')
+    other = tmp_path / 'other.mha'
+    other.write_bytes(b'Date,Mood\n' * 10)
+    for path in (empty, other):
+        with pytest.raises(ArchiveError):
+            ArchiveReader(str(path))
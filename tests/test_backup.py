@@ -0,0 +1,62 @@
+"""Snapshots, their rotation and restores"""
+
+import pytest
+
+from backup import (
+    BackupError, create_snapshot, find_snapshot, list_snapshots, restore_snapshot,
+    verify_snapshot,
+)
+from tracker_core import data_version, fetch_history_page, upsert_entry
+
+
+def entry(date, mood):
+    return (date, mood, 5, 7.0, 3, 3, '', '', '', '')
+
+
+@pytest.fixture
+def backups(tmp_path):
+    return str(tmp_path / 'backups')
+
+
+def test_snapshot_and_restore(db, backups):
+    path = data_version(db)[0]
+    upsert_entry(db, entry('2024-01-01', 6))
+    upsert_entry(db, entry('2024-01-02', 7))
+    manifest = create_snapshot(path, backups, pages=1, pause=0)
+    assert manifest['entries'] == 2
+    assert manifest['steps'] > 1
+    verify_snapshot(backups, manifest)
+
+    upsert_entry(db, entry('2024-01-03', 1))
+    # Read through the entry cache, which the restore must drop
+    assert len(fetch_history_page(db)) == 3
+    version = data_version(db)[1]
+    restored = restore_snapshot(db, backups, 'latest')
+    assert restored['snapshot'] == manifest['snapshot']
+    assert [row[1] for row in fetch_history_page(db)] == ['2024-01-02', '2024-01-01']
+    assert data_version(db)[1] > version
+
+    # The data replaced by the restore was kept
+    labels = [m['label'] for m in list_snapshots(backups)]
+    assert labels == [None, 'pre-restore']
+    assert find_snapshot(backups, 'latest')['entries'] == 3
+
+
+def test_old_snapshots_are_rotated(db, backups):
+    path = data_version(db)[0]
+    names = [create_snapshot(path, backups, keep=3)['snapshot'] for _ in range(5)]
+    assert [m['snapshot'] for m in list_snapshots(backups)] == names[2:]
+
+
+def test_damaged_snapshot_is_refused(db, backups):
+    path = data_version(db)[0]
+    upsert_entry(db, entry('2024-01-01', 6))
+    manifest = create_snapshot(path, backups)
+    with open(f"{backups}/{manifest['snapshot']}", 'r+b') as f:
+        f.seek(20)
+        f.write(b'\0\0\0\0')
+    with pytest.raises(BackupError, match="checksum"):
+        restore_snapshot(db, backups, manifest['snapshot'])
+    with pytest.raises(BackupError, match="no snapshot"):
+        find_snapshot(backups, 'missing.db.gz')
+    assert db.execute('SELECT COUNT(*) FROM mood_entries').fetchone()[0] == 1
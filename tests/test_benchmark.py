@@ -0,0 +1,36 @@
+"""The synthetic data generator and the regression check of the benchmark"""
+
+import json
+
+import benchmark
+from tracker_core import ENTRY_COLUMNS, coerce_entry
+
+
+def test_generated_entries_are_valid_and_repeatable():
+    entries = list(benchmark.generate_entries(500, seed=3))
+    assert entries == list(benchmark.generate_entries(500, seed=3))
+    assert entries != list(benchmark.generate_entries(500, seed=4))
+    assert len({entry[0] for entry in entries}) == 500
+    assert entries[-1][0] == benchmark.LAST_DATE.isoformat()
+    for entry in entries:
+        assert coerce_entry(dict(zip(ENTRY_COLUMNS, entry))) == entry
+
+
+def test_compare_reports_slower_operations():
+    baseline = {'results': {'100': {'history': {'p50_ms': 10.0}, 'save': {'p50_ms': 4.0}}}}
+    results = {'results': {'100': {'load_seconds': 0.1, 'history': {'p50_ms': 11.0},
+                                   'save': {'p50_ms': 6.0}, 'import': {'p50_ms': 1.0}}}}
+    regressions = benchmark.compare(results, baseline, threshold=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("save @ 100: p50 4.00 ms -> 6.00 ms")
+
+
+def test_small_run(tmp_path, capsys):
+    output = tmp_path / 'bench.json'
+    assert benchmark.main(['--sizes', '50', '--repeat', '1', '--output', str(output)]) == 0
+    results = json.loads(output.read_text())['results']['50']
+    assert results['export_csv']['rows'] == 50
+    assert results['save']['rows'] == benchmark.SAVE_COUNT
+    # Comparing a run against itself finds no regressions
+    assert benchmark.main(['--sizes', '50', '--repeat', '1', '--baseline', str(output),
+                           '--threshold', '100']) == 0
@@ -0,0 +1,100 @@
+"""Chart series and downsampling, without a display"""
+
+import datetime
+import math
+import random
+
+import pytest
+
+from charts import (
+    CHART_METRICS, DOWNSAMPLERS, bucket_ordinal, chart_points, choose_period,
+    date_ticks, lttb, load_chart_series, min_max_columns, series_range, visible_slice,
+)
+from tracker_core import bulk_load_entries
+
+
+def wave(count):
+    xs = list(range(count))
+    ys = [5 + 4 * math.sin(x / 50) + (3 if x % 997 == 0 else 0) for x in xs]
+    return xs, ys
+
+
+def test_week_buckets_land_in_their_week():
+    day = datetime.date(2021, 1, 1)
+    for _ in range(800):
+        middle = bucket_ordinal('week', day.strftime('%Y-W%W'))
+        # Week 0 can be shorter than seven days, so allow for a partial week
+        assert abs(middle - day.toordinal()) <= 6
+        day += datetime.timedelta(days=1)
+    assert bucket_ordinal('month', '2024-02') == datetime.date(2024, 2, 15).toordinal()
+
+
+def test_series_come_from_the_rollups(db):
+    bulk_load_entries(db, [('2024-01-01', 4, 5, None, 3, 3, '', '', '', ''),
+                           ('2024-01-02', 8, 5, 7.0, 3, 3, '', '', '', ''),
+                           ('2024-02-10', 6, 5, 9.0, 3, 3, '', '', '', '')])
+    series = load_chart_series(db)
+    first = datetime.date(2024, 1, 1).toordinal()
+    assert series['day']['mood'] == ([first, first + 1, first + 40], [4, 8, 6])
+    # No sleep was recorded on the first day
+    assert series['day']['sleep'] == ([first + 1, first + 40], [7, 9])
+    assert series['month']['mood'][1] == [6, 6]
+    assert series_range(series) == (first, first + 40)
+
+
+def test_visible_slice_and_period():
+    xs = list(range(0, 100, 10))
+    assert visible_slice(xs, 25, 55) == (2, 7)
+    assert visible_slice(xs, -50, 500) == (0, 10)
+
+    day = {metric: (list(range(1000)), [5] * 1000) for metric in CHART_METRICS}
+    week = {metric: (list(range(0, 1000, 7)), [5] * 143) for metric in CHART_METRICS}
+    series = {'day': day, 'week': week, 'month': week}
+    assert choose_period(series, 0, 999, 500) == 'day'
+    assert choose_period(series, 0, 999, 100) == 'week'
+
+
+def test_lttb_keeps_the_ends_and_the_spike():
+    xs, ys = wave(5000)
+    out_x, out_y = lttb(xs, ys, 300)
+    assert len(out_x) == 300
+    assert (out_x[0], out_x[-1]) == (xs[0], xs[-1])
+    assert out_x == sorted(out_x)
+    assert 997 in out_x
+    assert lttb(xs[:10], ys[:10], 300) == (xs[:10], ys[:10])
+
+
+def test_min_max_keeps_each_columns_extremes():
+    xs, ys = wave(5000)
+    out_x, out_y = min_max_columns(xs, ys, 0, 4999, 100)
+    # Pixel columns 0 to 100, both ends included
+    assert len(out_x) <= 2 * 101
+    assert out_x == sorted(out_x)
+    assert max(out_y) == max(ys)
+    assert min(out_y) == min(ys)
+
+
+@pytest.mark.parametrize('method', DOWNSAMPLERS)
+def test_chart_points_fit_the_plot(method):
+    rng = random.Random(1)
+    xs = list(range(730000, 734000))
+    series = {period: {metric: (xs, [rng.uniform(0, 14) for _ in xs]) for metric in CHART_METRICS}
+              for period in ('day', 'week', 'month')}
+    period, lines = chart_points(series, (730500, 731200), 400, 200, method=method,
+                                 left=40, top=15)
+    assert period == 'day'
+    for coords in lines.values():
+        assert len(coords) // 2 <= 2 * 400 + 2
+        x_values, y_values = coords[::2], coords[1::2]
+        # One neighbour either side may fall outside the plot horizontally;
+        # values above CHART_Y_MAX are clipped to the top
+        assert all(40 <= x <= 440 for x in x_values[1:-1])
+        assert all(15 <= y <= 215 for y in y_values)
+
+
+def test_date_ticks():
+    start = datetime.date(2024, 1, 1).toordinal()
+    assert date_ticks(start, start)[0][1] == '2024-01-01'
+    ticks = date_ticks(start, start + 3650, count=5)
+    assert len(ticks) == 6
+    assert ticks[0][1] == '2024'
@@ -0,0 +1,112 @@
+"""The command-line interface, which must work without tkinter"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import instrumentation
+import mental
+
+
+@pytest.fixture
+def cli(tmp_path, capsys):
+    db_path = str(tmp_path / 'tracker.db')
+
+    def run(*argv):
+        status = mental.main(['--db', db_path, *argv])
+        out, err = capsys.readouterr()
+        return status, out, err
+
+    return run
+
+
+def test_add_list_and_insights(cli):
+    assert cli('add', '--date', '2024-01-01', '--mood', '6', '--energy', '5', '--notes', 'first')[0] == 0
+    assert cli('add', '--date', '2024-01-02', '--mood', '8', '--energy', '7', '--sleep', '7.5')[0] == 0
+    # Adding the same date again replaces the entry
+    cli('add', '--date', '2024-01-01', '--mood', '4', '--energy', '5', '--notes', 'replaced')
+
+    status, out, _ = cli('list')
+    lines = out.splitlines()[1:]
+    assert status == 0
+    assert [line.split()[:3] for line in lines] == [['2024-01-02', '8', '7'], ['2024-01-01', '4', '5']]
+    assert lines[1].endswith('replaced')
+
+    status, out, _ = cli('insights')
+    assert status == 0
+    assert "Total Entries: 2" in out
+
+
+def test_invalid_entry_is_an_error(cli):
+    status, _, err = cli('add', '--mood', '11', '--energy', '5')
+    assert status == 1
+    assert err.startswith("Error:")
+    assert cli('list')[1].splitlines()[1:] == []
+
+
+def test_export_then_import(cli, tmp_path):
+    cli('add', '--date', '2024-01-01', '--mood', '6', '--energy', '5')
+    filename = str(tmp_path / 'entries.ndjson')
+    assert cli('export', filename)[0] == 0
+
+    copy = str(tmp_path / 'copy.db')
+    assert mental.main(['--db', copy, 'import', filename]) == 0
+    assert cli('export', str(tmp_path / 'entries.xml'))[0] == 1
+
+
+def test_cli_does_not_import_tkinter(tmp_path):
+    code = ("import sys, mental; mental.main(['--db', sys.argv[1], 'list']); "
+            "sys.exit('tkinter' in sys.modules)")
+    subprocess.run([sys.executable, '-c', code, str(tmp_path / 'tracker.db')],
+                   cwd=os.path.dirname(os.path.abspath(mental.__file__)), check=True)
+
+
+def test_pragmas(cli):
+    status, out, _ = cli('--profile', 'safe', 'pragmas')
+    assert status == 0
+    assert out.splitlines()[0] == "Profile: safe"
+    assert "journal_mode         delete" in out
+
+
+def test_search(cli):
+    cli('add', '--date', '2024-01-01', '--mood', '6', '--energy', '5', '--notes', 'long walk')
+    cli('add', '--date', '2024-01-02', '--mood', '7', '--energy', '5', '--activities', 'walking')
+    status, out, _ = cli('search', 'walk*')
+    assert status == 0
+    assert sorted(line.split()[0] for line in out.splitlines()[1:]) == ['2024-01-01', '2024-01-02']
+
+
+def test_tags(cli):
+    for day, mood in ((1, 8), (2, 7), (3, 4)):
+        cli('add', '--date', f'2024-01-0{day}', '--mood', str(mood), '--energy', '5',
+            '--activities', 'walk' if mood > 5 else 'gaming')
+    status, out, _ = cli('tags', '--min-entries', '2')
+    assert status == 0
+    assert out.splitlines()[1].split()[:5] == ['activity', 'walk', '2', '7.5', '+1.2']
+
+
+def test_list_from_an_archive(cli, tmp_path):
+    for day in range(1, 10):
+        cli('add', '--date', f'2024-01-0{day}', '--mood', str(day), '--energy', '5')
+    filename = str(tmp_path / 'entries.mha')
+    assert cli('export', filename)[0] == 0
+
+    status, out, _ = cli('list', '--archive', filename, '--since', '2024-01-03',
+                         '--before', '2024-01-07', '--limit', '3')
+    assert status == 0
+    assert [line.split()[:2] for line in out.splitlines()[1:]] == [
+        ['2024-01-06', '6'], ['2024-01-05', '5'], ['2024-01-04', '4']]
+
+
+def test_trace(cli, tmp_path, monkeypatch):
+    # --trace turns recording on for the rest of the process
+    monkeypatch.setattr(instrumentation, 'enabled', False)
+    filename = tmp_path / 'trace.json'
+    cli('add', '--date', '2024-01-01', '--mood', '6', '--energy', '5')
+    status, _, err = cli('--trace', str(filename), 'insights')
+    assert status == 0
+    assert err.splitlines()[-1].endswith(f"spans written to {filename}")
+    assert json.loads(filename.read_text())['traceEvents']
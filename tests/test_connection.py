@@ -0,0 +1,46 @@
+"""Connection pragma profiles"""
+
+import os
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+from tracker_core import (
+    CONNECTION_PROFILES, DatabaseWorker, active_pragmas, open_database, upsert_entry,
+)
+
+
+@pytest.mark.parametrize('profile', CONNECTION_PROFILES)
+def test_profile_is_applied(tmp_path, profile):
+    conn = open_database(str(tmp_path / 'tracker.db'), profile)
+    pragmas = active_pragmas(conn)
+    for name, value in CONNECTION_PROFILES[profile].items():
+        assert str(pragmas[name]).upper() == str(value).upper(), name
+    conn.close()
+
+
+def test_worker_checkpoints_the_wal_on_stop(tmp_path):
+    path = str(tmp_path / 'tracker.db')
+    # A second connection keeps SQLite from removing the -wal file on close
+    reader = open_database(path)
+    worker = DatabaseWorker(path)
+    worker.start()
+    done = threading.Event()
+
+    def save(conn, job):
+        upsert_entry(conn, ('2024-01-01', 6, 5, 7.0, 3, 3, '', '', '', ''))
+        done.set()
+
+    worker.submit(save)
+    assert done.wait(5)
+    assert os.path.getsize(path + '-wal') > 0
+    worker.stop()
+    assert os.path.getsize(path + '-wal') == 0
+    reader.close()
+    # The entry reached the database file itself, not just the WAL
+    shutil.copy(path, str(tmp_path / 'copy.db'))
+    copy = sqlite3.connect(str(tmp_path / 'copy.db'))
+    assert copy.execute('SELECT COUNT(*) FROM mood_entries').fetchone() == (1,)
+    copy.close()
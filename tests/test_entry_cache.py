@@ -0,0 +1,179 @@
+"""The columnar entry cache and its write-through from tracker_core"""
+
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+from array import array
+
+import pytest
+
+from entry_cache import TABLE_COLUMNS, EntryCache
+from tracker_core import (
+    bulk_load_entries, data_version, delete_entry_by_id, entry_cache, fetch_history_page,
+    open_database, upsert_entry,
+)
+
+
+def random_entry(rng, day):
+    return (f'2024-{day // 28 % 12 + 1:02d}-{day % 28 + 1:02d}', rng.randint(1, 10),
+            rng.randint(1, 10), rng.choice([None, 6.5, 8.0]), rng.choice([None, 3]), 4,
+            f'note {day}', rng.choice(['walk', 'run', '']), '', '')
+
+
+def table_rows(conn):
+    return conn.execute(f'''
+        SELECT {', '.join(TABLE_COLUMNS)} FROM mood_entries ORDER BY date
+    ''').fetchall()
+
+
+def cached_rows(cache):
+    return [row for rows in cache.iter_batches(batch_size=7) for row in rows]
+
+
+def history(conn, before_date=None):
+    """A History page straight from SQLite"""
+    return conn.execute('''
+        SELECT id, date, mood_score, energy_level, sleep_hours, stress_level,
+               anxiety_level, notes FROM mood_entries
+        WHERE ? IS NULL OR date < ? ORDER BY date DESC LIMIT 20
+    ''', (before_date, before_date)).fetchall()
+
+
+def test_columns_are_packed_and_read_back_unchanged(db):
+    rng = random.Random(1)
+    bulk_load_entries(db, [random_entry(rng, day) for day in range(100)])
+    cache = EntryCache.load(db, data_version(db)[1])
+    assert isinstance(cache.columns['mood_score'], array)
+    assert isinstance(cache.columns['sleep_hours'], array)
+    assert cached_rows(cache) == table_rows(db)
+    assert cache.history_page('2024-03-05', 20) == history(db, '2024-03-05')
+    assert cache.memory_usage()['entries'] == 100
+
+
+def test_out_of_range_values_fall_back_to_lists(db):
+    upsert_entry(db, ('2024-01-01', 5, 5, 7.0, 3, 3, '', '', '', ''))
+    # Written by another program, outside the app's 1-10 range
+    db.execute("UPDATE mood_entries SET mood_score = 1000, energy_level = 'high'")
+    db.commit()
+    cache = EntryCache.load(db, 0)
+    assert isinstance(cache.columns['mood_score'], list)
+    assert cached_rows(cache) == table_rows(db)
+
+    cache = EntryCache.load(db, 0)
+    cache.upsert(99, ('2024-01-02', 5, 300, None, None, None, '', '', '', ''), None)
+    assert isinstance(cache.columns['energy_level'], list)
+    assert cache.history_page(limit=1)[0][3] == 300
+
+
+def test_saves_and_deletes_write_through(db):
+    rng = random.Random(2)
+    for day in rng.sample(range(300), 150):
+        upsert_entry(db, random_entry(rng, day))
+    cache = entry_cache(db)
+
+    for day in rng.sample(range(300), 100):
+        upsert_entry(db, random_entry(rng, day))
+    ids = [row[0] for row in db.execute('SELECT id FROM mood_entries')]
+    for entry_id in rng.sample(ids, 50):
+        delete_entry_by_id(db, entry_id)
+
+    # Still the same cache object, updated in place
+    assert entry_cache(db) is cache
+    assert cached_rows(cache) == table_rows(db)
+    assert fetch_history_page(db, limit=20) == history(db)
+
+
+def test_writes_elsewhere_make_it_reload(db, tmp_path):
+    upsert_entry(db, ('2024-01-01', 5, 5, 7.0, 3, 3, '', '', '', ''))
+    cache = entry_cache(db)
+
+    # Another program writes without going through tracker_core
+    other = sqlite3.connect(str(tmp_path / 'tracker.db'))
+    other.execute('''
+        INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('2024-01-02', 6, 5)
+    ''')
+    other.commit()
+    other.close()
+    # Not current any more: history falls back to SQLite until it is reloaded
+    assert entry_cache(db, load=False) is None
+    assert [row[1] for row in fetch_history_page(db)] == ['2024-01-02', '2024-01-01']
+
+    upsert_entry(db, ('2024-01-03', 6, 5, 7.0, 3, 3, '', '', '', ''))
+    reloaded = entry_cache(db)
+    assert reloaded is not cache
+    assert cached_rows(reloaded) == table_rows(db)
+
+
+def test_iteration_in_id_order_and_from_a_snapshot(db):
+    for date in ('2024-01-03', '2024-01-01', '2024-01-02'):
+        upsert_entry(db, (date, 5, 5, 7.0, 3, 3, '', '', '', ''))
+    cache = entry_cache(db)
+    ids = [row[0] for rows in cache.iter_batches(('id',), order='id') for row in rows]
+    assert ids == sorted(ids)
+
+    # Iteration reads a snapshot taken when it starts
+    batches = cache.iter_batches(('date',), batch_size=1)
+    assert next(batches) == [('2024-01-01',)]
+    upsert_entry(db, ('2024-01-04', 5, 5, 7.0, 3, 3, '', '', '', ''))
+    assert [row for rows in batches for row in rows] == [('2024-01-02',), ('2024-01-03',)]
+
+
+def test_in_memory_databases_are_not_shared():
+    conn = open_database(':memory:')
+    upsert_entry(conn, ('2024-01-01', 5, 5, 7.0, 3, 3, '', '', '', ''))
+    assert entry_cache(conn) is not entry_cache(conn)
+    assert len(entry_cache(conn)) == 1
+    conn.close()
+
+
+def test_numpy_columns(db):
+    np = pytest.importorskip('numpy')
+    upsert_entry(db, ('2024-01-01', 5, 5, None, 3, 3, '', '', '', ''))
+    upsert_entry(db, ('2024-01-02', 6, 5, 8.0, None, 3, '', '', '', ''))
+    cache = entry_cache(db)
+    assert cache.numpy_column('days').tolist() == [19723, 19724]
+    assert np.isnan(cache.numpy_column('sleep_hours')[0])
+    assert np.isnan(cache.numpy_column('stress_level')[1])
+    assert cache.numpy_column('mood_score').tolist() == [5.0, 6.0]
+
+    from analytics import AnalyticsEngine
+    cached = AnalyticsEngine.from_cache(cache)
+    loaded = AnalyticsEngine.from_connection(db)
+    assert cached.days.tolist() == loaded.days.tolist()
+    for name, column in loaded.columns.items():
+        np.testing.assert_array_equal(cached.columns[name], column)
+
+
+def test_dates_that_are_not_iso_dates(db):
+    np = pytest.importorskip('numpy')
+    for day, mood in ((1, 5), (2, 6), (3, 7)):
+        upsert_entry(db, (f'2024-01-0{day}', mood, 5, 7.0, 3, 3, '', '', '', ''))
+    db.execute("INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('someday', 1, 5)")
+    db.commit()
+    cache = entry_cache(db)
+    days = cache.numpy_column('days')
+    assert days[:3].tolist() == [19723, 19724, 19725] and np.isnan(days[3])
+
+    from analytics import AnalyticsEngine
+    for engine in (AnalyticsEngine.from_cache(cache), AnalyticsEngine.from_connection(db)):
+        trend = engine.trend('mood_score', last_days=30)
+        assert trend['n'] == 3 and trend['slope'] == pytest.approx(1)
+        assert sum(count for _, count, _, _ in engine.day_of_week()) == 3
+
+
+def test_delete_checks_the_id_saved_for_the_date(db):
+    entry_id = upsert_entry(db, ('2024-01-01', 5, 5, 7.0, 3, 3, '', '', '', ''))
+    cache = entry_cache(db)
+    cache.delete(entry_id + 1, '2024-01-01')
+    cache.delete(entry_id, '2024-01-02')
+    assert len(cache) == 1
+    cache.delete(entry_id, '2024-01-01')
+    assert len(cache) == 0
+
+
+def test_tracker_core_does_not_import_numpy():
+    code = "import sys, tracker_core; sys.exit('numpy' in sys.modules)"
+    subprocess.run([sys.executable, '-c', code],
+                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
@@ -0,0 +1,88 @@
+"""Streaming exporters"""
+
+import csv
+import json
+import os
+
+import pytest
+
+from tracker_core import (
+    CSV_COLUMNS, CSV_HEADER, ENTRY_COLUMNS, EXPORT_BATCH_SIZE, Job, JobCancelled, data_version,
+    entry_caches, export_archive, export_csv, export_json, export_ndjson, insert_goal,
+)
+
+
+def fill(conn, count):
+    """`count` entries over consecutive days, more than one export batch"""
+    conn.executemany(f'''
+        INSERT INTO mood_entries ({', '.join(ENTRY_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'{2000 + i // 336}-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d}', i % 10 + 1, 5,
+           None if i % 7 == 0 else 7.5, 3, None, f'note "{i}",\nline two ☀', 'walk', '', '')
+          for i in range(count)])
+    insert_goal(conn, "Sleep", "8h", '2024-01-01', commit=False)
+    insert_goal(conn, "Walk", None, None, commit=False)
+    conn.commit()
+
+
+def table(conn, name):
+    cursor = conn.execute(f'SELECT * FROM {name}')
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+@pytest.mark.parametrize('count', [0, 2 * EXPORT_BATCH_SIZE + 5])
+def test_json_matches_json_dump(db, tmp_path, count):
+    fill(db, count)
+    filename = str(tmp_path / 'export.json')
+    stats = export_json(db, filename)
+    assert stats['rows'] == count
+
+    with open(filename) as f:
+        text = f.read()
+    expected = {'export_date': json.loads(text)['export_date'],
+                'mood_entries': table(db, 'mood_entries'), 'goals': table(db, 'goals')}
+    assert text == json.dumps(expected, indent=2, default=str)
+
+
+def test_ndjson(db, tmp_path):
+    fill(db, EXPORT_BATCH_SIZE + 1)
+    filename = str(tmp_path / 'export.ndjson')
+    export_ndjson(db, filename)
+
+    with open(filename, encoding='utf-8') as f:
+        header, *lines = [json.loads(line) for line in f]
+    assert 'export_date' in header
+    assert lines == ([{'table': 'mood_entries', 'row': row} for row in table(db, 'mood_entries')]
+                     + [{'table': 'goals', 'row': row} for row in table(db, 'goals')])
+
+
+def test_csv(db, tmp_path):
+    fill(db, EXPORT_BATCH_SIZE + 1)
+    filename = str(tmp_path / 'export.csv')
+    export_csv(db, filename)
+
+    with open(filename, newline='', encoding='utf-8') as f:
+        header, *rows = list(csv.reader(f))
+    assert header == CSV_HEADER
+    assert rows == [['' if value is None else str(value) for value in row]
+                    for row in db.execute(f"SELECT {', '.join(CSV_COLUMNS)} FROM mood_entries ORDER BY date")]
+
+
+@pytest.mark.parametrize('exporter', [export_json, export_ndjson, export_csv])
+def test_cancelled_export_leaves_no_file(db, tmp_path, exporter):
+    fill(db, 10)
+    job = Job(None, None)
+    job.cancel()
+    filename = str(tmp_path / 'export.out')
+    with pytest.raises(JobCancelled):
+        exporter(db, filename, job)
+    assert not os.path.exists(filename)
+
+
+@pytest.mark.parametrize('exporter', [export_json, export_ndjson, export_csv, export_archive])
+def test_exports_stream_from_sqlite(db, tmp_path, exporter):
+    fill(db, EXPORT_BATCH_SIZE + 1)
+    path = data_version(db)[0]
+    # Exports don't load the entry cache just to read it once
+    exporter(db, str(tmp_path / 'export.out'))
+    assert path not in entry_caches
@@ -0,0 +1,100 @@
+"""The next-day mood model, trained on saves and rebuilt when it falls behind"""
+
+import datetime
+import os
+import random
+import sqlite3
+
+import pytest
+
+from forecast import MIN_EXAMPLES, MoodModel, format_forecast
+from tracker_core import (
+    data_version, forecast_mood, mood_model, mood_model_path, mood_models, upsert_entry,
+)
+
+
+def days(count, start=datetime.date(2024, 1, 1)):
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def random_entry(rng, date):
+    return (date, rng.randint(1, 10), rng.randint(1, 10), rng.choice([None, 6.0, 8.5]),
+            rng.randint(1, 10), rng.randint(1, 10), '',
+            rng.choice(['walk', 'run, reading', '']), rng.choice(['work', '']), '')
+
+
+def test_no_forecast_until_enough_examples(db):
+    rng = random.Random(1)
+    for date in days(MIN_EXAMPLES):
+        upsert_entry(db, random_entry(rng, date))
+    # MIN_EXAMPLES consecutive days make one example fewer
+    assert forecast_mood(db) is None
+    assert "Not enough" in format_forecast(None)
+
+    upsert_entry(db, random_entry(rng, days(MIN_EXAMPLES + 1)[-1]))
+    forecast = forecast_mood(db)
+    assert forecast['date'] == days(MIN_EXAMPLES + 2)[-1]
+    assert 1.0 <= forecast['mood'] <= 10.0
+    assert forecast['examples'] == MIN_EXAMPLES
+
+
+def test_saves_train_the_stored_model(db):
+    rng = random.Random(2)
+    dates = days(60)
+    upsert_entry(db, random_entry(rng, dates[0]))
+    path = data_version(db)[0]
+    mood_model(db)
+    for date in dates[1:]:
+        upsert_entry(db, random_entry(rng, date))
+    trained = mood_models[path]
+    assert trained.version == data_version(db)[1]
+    assert trained.examples == len(dates) - 1
+
+    # Learning one example at a time ends where a rebuild from the table does
+    mood_models.pop(path)
+    os.remove(mood_model_path(path))
+    rebuilt = mood_model(db)
+    assert rebuilt is not trained
+    assert rebuilt.examples == trained.examples
+    assert rebuilt.weights == pytest.approx(trained.weights)
+
+
+def test_stored_model_is_reused_until_the_data_changes(db):
+    rng = random.Random(3)
+    for date in days(30):
+        upsert_entry(db, random_entry(rng, date))
+    path, version = data_version(db)
+    model = mood_model(db)
+    mood_models.pop(path)
+    reloaded = mood_model(db)
+    assert reloaded.version == version
+    assert reloaded.weights == model.weights
+
+    # A write from another program moves the counter on, so the model is rebuilt
+    other = sqlite3.connect(path)
+    other.execute("UPDATE mood_entries SET mood_score = 1 WHERE date = '2024-01-10'")
+    other.commit()
+    other.close()
+    rebuilt = mood_model(db)
+    assert rebuilt.version == data_version(db)[1] != version
+    assert rebuilt.weights != model.weights
+
+
+def test_model_round_trip(tmp_path):
+    rng = random.Random(4)
+    model = MoodModel(7)
+    for _ in range(30):
+        x = [1.0] + [rng.uniform(-4, 4) for _ in range(len(model.weights) - 1)]
+        model.update(x, rng.randint(1, 10))
+    path = str(tmp_path / 'model.json')
+    model.save(path)
+    loaded = MoodModel.load(path)
+    assert loaded.to_dict() == model.to_dict()
+    assert loaded.rmse() == model.rmse()
+
+    # Models stored with another feature layout are ignored
+    state = model.to_dict()
+    state['format'] += 1
+    with pytest.raises(ValueError):
+        MoodModel.from_dict(state)
+    assert MoodModel.load(str(tmp_path / 'missing.json')) is None
@@ -0,0 +1,100 @@
+"""Metric goals, their sliding windows and completion on save"""
+
+import datetime
+import random
+
+import pytest
+
+from goals import GoalProgress, check_goal
+from tracker_core import (
+    delete_entries, fetch_goals, insert_goal, load_goal_progress, rebuild_goal_progress,
+    upsert_entry,
+)
+
+
+def days(count, start=datetime.date(2024, 1, 1)):
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def entry(date, sleep, activities=''):
+    return (date, 6, 5, sleep, 3, 3, '', activities, '', '')
+
+
+def goal_state(conn, goal_id):
+    return next(progress for i, _, progress in load_goal_progress(conn) if i == goal_id)
+
+
+def test_saves_match_a_rebuild(db):
+    rng = random.Random(1)
+    # Unreachable targets, so both goals stay open and tracked
+    sleep = insert_goal(db, "Sleep", "", None, 'average', 'sleep_hours', '>=', 24, 14,
+                        start_date='2024-01-01')
+    walks = insert_goal(db, "Walk", "", None, 'count', 'walk', target=30, window_days=30,
+                        start_date='2024-01-05')
+    dates = days(60)
+    for date in rng.sample(dates, 45):
+        upsert_entry(db, entry(date, rng.choice([None, 5.0, 7.5, 9.0]),
+                               rng.choice(['walk', 'Walk, run', 'run', ''])))
+    ids = [row[0] for row in db.execute('SELECT id FROM mood_entries')]
+    delete_entries(db, rng.sample(ids, 10))
+
+    for goal_id in (sleep, walks):
+        stored = goal_state(db, goal_id)
+        rebuilt = rebuild_goal_progress(db, stored.goal)
+        assert (stored.end, stored.dates) == (rebuilt.end, rebuilt.dates)
+        assert stored.total == pytest.approx(rebuilt.total)
+    assert not any(row[4] for row in fetch_goals(db))
+
+
+def test_goal_is_completed_when_met(db):
+    goal_id = insert_goal(db, "Sleep", "", None, 'average', 'sleep_hours', '>=', 7, 5,
+                          start_date='2024-01-01')
+    dates = days(5)
+    for date in dates[:3]:
+        upsert_entry(db, entry(date, 8.0))
+    # Three of five days logged is short of the coverage an average goal needs
+    row = next(row for row in fetch_goals(db) if row[0] == goal_id)
+    assert (row[4], row[11], row[12]) == (0, 8.0, 3)
+    assert 0 < row[13] < 1
+
+    upsert_entry(db, entry(dates[3], 7.0))
+    assert next(row for row in fetch_goals(db) if row[0] == goal_id)[4] == 1
+
+
+def test_days_before_the_start_do_not_count(db):
+    for date in days(10):
+        upsert_entry(db, entry(date, 8.0, 'walk'))
+    goal_id = insert_goal(db, "Walk", "", None, 'count', 'walk', target=3, window_days=7,
+                          start_date='2024-01-09')
+    assert goal_state(db, goal_id).total == 2
+    upsert_entry(db, entry('2024-01-11', 8.0, 'walk'))
+    assert next(row for row in fetch_goals(db) if row[0] == goal_id)[4] == 1
+
+
+def test_window_slides():
+    goal = {'kind': 'count', 'metric': 'walk', 'comparison': '>=', 'target': 2.0,
+            'window_days': 3, 'start_date': '2024-01-01'}
+    progress = GoalProgress(goal)
+    for date, value in zip(days(5), [1, 1, 0, 0, 1]):
+        progress.update(date, value)
+    assert progress.dates == ['2024-01-03', '2024-01-04', '2024-01-05']
+    assert progress.evaluate()[0] == 1
+    # Back-dated saves outside the window are ignored
+    progress.update('2024-01-01', 1)
+    assert progress.total == 1
+
+
+@pytest.mark.parametrize('definition', [
+    ('streak', 'sleep_hours', '>=', 7, 30),
+    ('average', 'notes', '>=', 7, 30),
+    ('average', 'sleep_hours', '>', 7, 30),
+    ('average', 'sleep_hours', '>=', 0, 30),
+    ('average', 'sleep_hours', '>=', 7, 400),
+    ('count', 'walk, run', '>=', 2, 7),
+    ('count', 'walk', '>=', 8, 7),
+])
+def test_invalid_definitions(db, definition):
+    with pytest.raises(ValueError):
+        check_goal(*definition)
+    with pytest.raises(ValueError):
+        insert_goal(db, "Goal", "", None, *definition)
@@ -0,0 +1,238 @@
+"""History tab paging and incremental updates, without a display"""
+
+import datetime
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from tracker_core import DatabaseWorker, HISTORY_PAGE_SIZE, run_migrations
+from tracker_gui import MentalHealthTracker, messagebox
+
+
+class FakeTree:
+    """The parts of ttk.Treeview the History tab uses"""
+
+    def __init__(self):
+        self.rows = []
+        self.selected = ()
+
+    def insert(self, parent, index, iid, values):
+        self.rows.insert(len(self.rows) if index == 'end' else index, (iid, values))
+
+    def get_children(self):
+        return [iid for iid, _ in self.rows]
+
+    def delete(self, *iids):
+        self.rows = [row for row in self.rows if row[0] not in iids]
+
+    def exists(self, iid):
+        return iid in self.get_children()
+
+    def index(self, iid):
+        return self.get_children().index(iid)
+
+    def selection(self):
+        return self.selected
+
+
+class FakeVar:
+    """tk.StringVar without a Tcl interpreter"""
+
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class FakeText:
+    """tk.Text holding one string"""
+
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self, start, end):
+        return self.value
+
+    def delete(self, start, end):
+        self.value = ""
+
+
+def settle(app):
+    """Wait for the worker to finish queued jobs and run their callbacks"""
+    done = threading.Event()
+    app.worker.submit(lambda conn, job: done.set())
+    assert done.wait(5)
+    app.worker.dispatch_results()
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    app = MentalHealthTracker.__new__(MentalHealthTracker)
+    app.db_path = str(tmp_path / 'tracker.db')
+    app.worker = DatabaseWorker(app.db_path)
+    app.worker.start()
+    app.worker.submit(lambda conn, job: run_migrations(conn))
+    # The History tab counts as built, so updates reach the tree; Goals doesn't
+    app.goals_frame = '.notebook.goals'
+    app.tab_builders = {app.goals_frame: None}
+    app.history_frame = '.notebook.history'
+    app.history_tree = FakeTree()
+    app.history_keys = []
+    app.history_exhausted = False
+    app.history_load_pending = False
+    app.history_generation = 0
+    app.history_query = ""
+    app.search_var = FakeVar()
+    app.status_var = FakeVar()
+    app.started = time.perf_counter()
+    app.startup_phases = {}
+    app.first_paint = None
+    app.current_job = None
+    settle(app)
+    yield app
+    app.worker.stop()
+
+
+def add_entries(app, dates):
+    conn = sqlite3.connect(app.db_path)
+    conn.executemany('''
+        INSERT INTO mood_entries (date, mood_score, energy_level, notes) VALUES (?, 5, 5, '')
+    ''', [(date,) for date in dates])
+    conn.commit()
+    conn.close()
+
+
+def days(count, start=datetime.date(2023, 1, 1)):
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def expected_ids(app):
+    conn = sqlite3.connect(app.db_path)
+    ids = [str(row[0]) for row in conn.execute('SELECT id FROM mood_entries ORDER BY date DESC')]
+    conn.close()
+    return ids
+
+
+def test_pages_cover_the_history_once_in_order(tracker):
+    add_entries(tracker, days(450))
+
+    tracker.refresh_history()
+    settle(tracker)
+    assert len(tracker.history_tree.rows) == HISTORY_PAGE_SIZE
+    while not tracker.history_exhausted:
+        tracker.load_history_page()
+        # A second request while one is in flight is ignored
+        tracker.load_history_page()
+        settle(tracker)
+    assert tracker.history_tree.get_children() == expected_ids(tracker)
+    assert tracker.history_keys == sorted(days(450), reverse=True)
+
+
+def test_pages_requested_before_a_refresh_are_dropped(tracker):
+    add_entries(tracker, days(300))
+    tracker.refresh_history()
+    settle(tracker)
+    tracker.load_history_page()
+    tracker.refresh_history()
+    settle(tracker)
+    assert tracker.history_tree.get_children() == expected_ids(tracker)[:HISTORY_PAGE_SIZE]
+
+
+def test_saved_and_deleted_rows_update_the_window(tracker):
+    dates = days(300)
+    missing = dates.pop(250)
+    add_entries(tracker, dates)
+    tracker.refresh_history()
+    settle(tracker)
+
+    add_entries(tracker, [missing])
+    row = int(expected_ids(tracker)[49])
+    tracker.insert_history_row((row, missing, 5, 5, None, None, None, 'new'))
+    # Older than every loaded row: it is left for a later page
+    tracker.insert_history_row((row + 1, '2022-12-31', 5, 5, None, None, None, ''))
+
+    loaded = expected_ids(tracker)[:HISTORY_PAGE_SIZE + 1]
+    assert tracker.history_tree.get_children() == loaded
+
+    tracker.remove_history_row(row)
+    loaded.remove(str(row))
+    assert tracker.history_tree.get_children() == loaded
+    assert missing not in tracker.history_keys
+
+
+def test_search_replaces_the_paged_list(tracker):
+    add_entries(tracker, days(300))
+    conn = sqlite3.connect(tracker.db_path)
+    conn.execute("UPDATE mood_entries SET notes = 'long walk' WHERE date IN ('2023-02-01', '2023-03-01')")
+    conn.commit()
+    conn.close()
+
+    tracker.search_var.set("walk")
+    tracker.search_history()
+    settle(tracker)
+    assert sorted(tracker.history_keys) == ['2023-02-01', '2023-03-01']
+    assert tracker.status_var.get() == "2 matching entries"
+    # Scrolling does not page in the rest of the history
+    tracker.load_history_page()
+    settle(tracker)
+    assert len(tracker.history_tree.rows) == 2
+
+    tracker.clear_search()
+    settle(tracker)
+    assert tracker.history_tree.get_children() == expected_ids(tracker)[:HISTORY_PAGE_SIZE]
+
+
+def test_deleting_selected_rows(tracker, monkeypatch):
+    monkeypatch.setattr(messagebox, 'askyesno', lambda title, question: True)
+    add_entries(tracker, days(30))
+    tracker.refresh_history()
+    settle(tracker)
+
+    ids = expected_ids(tracker)
+    tracker.history_tree.selected = tuple(ids[3:6])
+    tracker.delete_entry()
+    settle(tracker)
+    assert tracker.history_tree.get_children() == expected_ids(tracker) == ids[:3] + ids[6:]
+    assert tracker.status_var.get() == "Deleted 3 entries"
+
+
+def fill_form(app, date, mood, sleep):
+    app.date_var = FakeVar(date)
+    app.mood_var, app.energy_var = FakeVar(mood), FakeVar(5)
+    app.sleep_var = FakeVar(sleep)
+    app.stress_var, app.anxiety_var = FakeVar(3), FakeVar(3)
+    app.notes_text = FakeText("typed by hand")
+    app.activities_var, app.triggers_var, app.medications_var = FakeVar(), FakeVar(), FakeVar()
+
+
+def test_saving_an_entry(tracker, monkeypatch):
+    shown = []
+    for name in ('showinfo', 'showwarning', 'showerror'):
+        monkeypatch.setattr(messagebox, name, lambda title, message: shown.append(title))
+    tracker.refresh_history()
+    settle(tracker)
+
+    # Dates typed without zero padding are stored as ISO
+    fill_form(tracker, ' 2024-3-5 ', 6, "7.5")
+    tracker.save_entry()
+    settle(tracker)
+    assert shown == ["Success"]
+    assert tracker.history_keys == ['2024-03-05']
+    assert tracker.date_var.get() == datetime.date.today().isoformat()
+
+    # The ratings are validated like the CLI's and the server's
+    for mood, sleep in ((11, "7.5"), (6, "lots")):
+        fill_form(tracker, '2024-03-06', mood, sleep)
+        tracker.save_entry()
+        settle(tracker)
+    assert shown == ["Success", "Error", "Error"]
+    conn = sqlite3.connect(tracker.db_path)
+    rows = conn.execute('SELECT date, mood_score, sleep_hours, notes FROM mood_entries').fetchall()
+    assert rows == [('2024-03-05', 6, 7.5, "typed by hand")]
+    conn.close()
@@ -0,0 +1,69 @@
+"""Bulk import, and round trips through every export format"""
+
+import json
+
+import pytest
+
+from tracker_core import (
+    ENTRY_COLUMNS, export_archive, export_csv, export_json, export_ndjson, import_entries,
+    open_database, upsert_entry,
+)
+
+EXPORTERS = {
+    '.csv': export_csv,
+    '.json': export_json,
+    '.ndjson': export_ndjson,
+    '.mha': export_archive,
+}
+
+ENTRIES = [
+    ('2024-01-01', 7, 6, 7.5, 3, 2, 'plain note', 'walk, reading', 'work', 'vitamin d'),
+    ('2024-01-02', 1, 10, None, None, None, '', '', '', ''),
+    ('2024-01-04', 10, 1, 0.0, 10, 10, 'comma, "quotes"\nand a second line', 'run', '', ''),
+    ('2024-02-29', 5, 5, 24.0, 1, 1, 'ünïcödé ☀', '', 'poor sleep, news', 'ibuprofen'),
+]
+
+
+def entries(conn):
+    return conn.execute(f"SELECT {', '.join(ENTRY_COLUMNS)} FROM mood_entries ORDER BY date").fetchall()
+
+
+@pytest.mark.parametrize('extension', EXPORTERS)
+def test_round_trip(db, tmp_path, extension):
+    for entry in ENTRIES:
+        upsert_entry(db, entry)
+    filename = str(tmp_path / f'export{extension}')
+    EXPORTERS[extension](db, filename)
+
+    copy = open_database(str(tmp_path / 'copy.db'))
+    stats = import_entries(copy, filename)
+    assert (stats['rows'], stats['skipped']) == (len(ENTRIES), 0)
+    assert entries(copy) == ENTRIES
+
+    # Importing again replaces the entries instead of duplicating them
+    import_entries(copy, filename, batch_size=2)
+    assert entries(copy) == ENTRIES
+    copy.close()
+
+
+def test_invalid_records_are_skipped(db, tmp_path):
+    filename = tmp_path / 'entries.json'
+    records = [dict(zip(ENTRY_COLUMNS, entry)) for entry in ENTRIES[:2]]
+    records.insert(1, {'date': '2024-01-03', 'mood_score': 11, 'energy_level': 5})
+    records.append({'date': 'someday', 'mood_score': 7, 'energy_level': 5})
+    filename.write_text(json.dumps({'mood_entries': records, 'goals': []}))
+
+    stats = import_entries(db, str(filename))
+    assert (stats['rows'], stats['skipped']) == (2, 2)
+    assert entries(db) == ENTRIES[:2]
+
+
+def test_csv_with_other_headers(db, tmp_path):
+    filename = tmp_path / 'sheet.csv'
+    filename.write_text("Date,Mood,Energy,Sleep,Activity\n"
+                        "2024-03-01,6,4,6.5,yoga\n"
+                        "2024-03-01,8,4,,\n", encoding='utf-8')
+    stats = import_entries(db, str(filename))
+    # The later row for a date wins
+    assert stats['rows'] == 2
+    assert entries(db) == [('2024-03-01', 8, 4, None, None, None, '', '', '', '')]
@@ -0,0 +1,74 @@
+"""Timing spans, their summary and trace files"""
+
+import json
+
+import pytest
+
+import instrumentation
+from instrumentation import explain_query_plan, span, summarize, write_trace
+from tracker_core import fetch_history_page, upsert_entry
+
+
+@pytest.fixture
+def recording():
+    instrumentation.clear()
+    instrumentation.set_enabled(True)
+    yield instrumentation.spans
+    instrumentation.set_enabled(False)
+    instrumentation.clear()
+
+
+def fill(conn, count):
+    for day in range(1, count + 1):
+        upsert_entry(conn, (f'2024-01-{day:02d}', 5, 5, 7.0, 3, 3, '', '', '', ''))
+
+
+def test_nothing_is_recorded_while_disabled(db):
+    instrumentation.clear()
+    fill(db, 3)
+    fetch_history_page(db)
+    with span('ui', 'work') as s:
+        s.rows = 1
+    assert len(instrumentation.spans) == 0
+
+
+def test_sql_and_function_spans(db, recording):
+    fill(db, 5)
+    recording.clear()
+    rows = fetch_history_page(db, limit=3)
+    with span('ui', 'history.populate') as s:
+        s.rows = len(rows)
+
+    kinds = [(s.category, s.name) for s in recording]
+    assert kinds[0] == ('db', 'fetch_history_page')
+    assert kinds[-1] == ('ui', 'history.populate')
+    page_query = next(s for s in recording if s.category == 'sql' and 'LIMIT' in s.sql)
+    # Rows fetched after execute() are counted against the statement
+    assert page_query.rows == 3
+    assert page_query.parameters == (3,)
+    assert next(s for s in recording if s.name == 'fetch_history_page').rows == 3
+
+
+def test_summary_and_query_plans(db, recording):
+    fill(db, 5)
+    groups = {(g['category'], g['name']): g for g in summarize()}
+    upserts = groups['db', 'upsert_entry']
+    assert upserts['calls'] == 5
+    assert upserts['max_seconds'] <= upserts['seconds']
+    assert upserts['slowest'].seconds == upserts['max_seconds']
+
+    plan = explain_query_plan(db, 'SELECT * FROM mood_entries WHERE date = ?', ('2024-01-01',))
+    assert 'USING INDEX' in plan
+
+
+def test_trace_file(db, recording, tmp_path):
+    fill(db, 2)
+    filename = str(tmp_path / 'trace.json')
+    count = write_trace(filename)
+    with open(filename) as f:
+        events = json.load(f)['traceEvents']
+    spans = [e for e in events if e['ph'] == 'X']
+    assert len(spans) == count == len(recording)
+    assert {e['cat'] for e in spans} == {'sql', 'db'}
+    assert min(e['ts'] for e in spans) == 0
+    assert any(e['ph'] == 'M' and e['args']['name'] == 'MainThread' for e in events)
@@ -0,0 +1,139 @@
+"""Upgrading a database written by the original app"""
+
+import sqlite3
+
+import pytest
+
+from tracker_core import MIGRATIONS, migrate_create_tables, migrate_goal_metrics, run_migrations
+
+
+def legacy_database(path, entries, goals=()):
+    """A database as the original app left it: v1 tables, no user_version.
+    `entries` are (date, mood) pairs inserted in id order."""
+    conn = sqlite3.connect(path)
+    migrate_create_tables(conn.cursor())
+    conn.executemany('''
+        INSERT INTO mood_entries (date, mood_score, energy_level, sleep_hours, notes)
+        VALUES (?, ?, 5, 7.0, '')
+    ''', entries)
+    conn.executemany('INSERT INTO goals (title, target_date) VALUES (?, ?)', goals)
+    conn.commit()
+    conn.close()
+
+
+def migrated(path):
+    conn = sqlite3.connect(path)
+    run_migrations(conn)
+    return conn
+
+
+def test_duplicate_dates_are_moved_aside(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    legacy_database(path, [
+        ('2024-01-05', 1),
+        ('2024-01-06', 2),      # superseded by the entry saved later the same day
+        ('2024-01-06', 3),
+        ('2024-01-07', 4),
+    ], goals=[('Sleep more', '2024-03-01')])
+
+    conn = migrated(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    assert conn.execute('SELECT date, mood_score FROM mood_entries ORDER BY date').fetchall() == [
+        ('2024-01-05', 1), ('2024-01-06', 3), ('2024-01-07', 4),
+    ]
+    # Nothing is dropped
+    assert conn.execute('SELECT id, mood_score FROM mood_entries_duplicates').fetchall() == [(2, 2)]
+    assert conn.execute('SELECT title FROM goals').fetchall() == [('Sleep more',)]
+    conn.close()
+
+
+def test_migrations_are_applied_once(tmp_path):
+    path = str(tmp_path / 'tracker.db')
+    migrated(path).close()
+    conn = migrated(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    assert conn.execute('SELECT COUNT(*) FROM mood_entries_duplicates').fetchone()[0] == 0
+    conn.close()
+
+
+def test_one_entry_per_date(tmp_path):
+    conn = migrated(str(tmp_path / 'tracker.db'))
+    conn.execute("INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('2024-01-01', 5, 5)")
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('2024-01-01', 6, 6)")
+    conn.close()
+
+
+def test_unpadded_dates_are_normalised(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    legacy_database(path, [
+        ('2024-1-5', 1),        # superseded by the padded entry saved later
+        ('2024-01-05', 2),
+        ('2024-1-7', 3),        # renamed to 2024-01-07
+        ('yesterday', 4),       # not a date
+        (' 2024-02-1 ', 5),     # also 2024-02-01, superseded
+        ('2024-2-01', 6),
+    ])
+
+    conn = migrated(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    assert conn.execute('SELECT date, mood_score FROM mood_entries ORDER BY date').fetchall() == [
+        ('2024-01-05', 2), ('2024-01-07', 3), ('2024-02-01', 6),
+    ]
+    # Moved aside with their original dates
+    assert conn.execute('SELECT id, date FROM mood_entries_duplicates ORDER BY id').fetchall() == [
+        (1, '2024-1-5'), (4, 'yesterday'), (5, ' 2024-02-1 '),
+    ]
+    assert conn.execute('''
+        SELECT bucket, entries FROM mood_rollups WHERE period = 'month' ORDER BY bucket
+    ''').fetchall() == [('2024-01', 2), ('2024-02', 1)]
+    conn.close()
+
+
+def test_other_programs_can_still_save_unpadded_dates(tmp_path):
+    conn = migrated(str(tmp_path / 'tracker.db'))
+    conn.execute("INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('2024-3-10', 5, 5)")
+    conn.execute("INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('2024-03-11', 5, 5)")
+    conn.commit()
+    # The unpadded date has no week or month bucket, but doesn't fail the write
+    assert conn.execute("SELECT entries FROM mood_rollups WHERE period = 'all'").fetchone() == (2,)
+    conn.close()
+
+
+def test_change_log_before_goal_metrics(tmp_path):
+    # A database last opened by a release without goal metrics (v9)
+    conn = sqlite3.connect(str(tmp_path / 'tracker.db'))
+    version = MIGRATIONS.index(migrate_goal_metrics)
+    for target, migration in enumerate(MIGRATIONS[:version], start=1):
+        migration(conn.cursor())
+        conn.execute(f'PRAGMA user_version = {target}')
+    conn.commit()
+    conn.execute("INSERT INTO goals (uid, title) VALUES ('g1', 'Walk daily')")
+    conn.execute("UPDATE goals SET completed = 1")
+    conn.commit()
+
+    run_migrations(conn)
+    conn.execute("UPDATE goals SET window_days = 7")
+    conn.commit()
+    assert conn.execute('''
+        SELECT op FROM change_log WHERE table_name = 'goals' ORDER BY seq
+    ''').fetchall() == [('upsert',)] * 3
+    conn.close()
+
+
+def test_dates_saved_by_other_programs_are_normalised(tmp_path):
+    path = str(tmp_path / 'tracker.db')
+    conn = sqlite3.connect(path)
+    for target, migration in enumerate(MIGRATIONS[:-1], start=1):
+        migration(conn.cursor())
+        conn.execute(f'PRAGMA user_version = {target}')
+    conn.execute("INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('2024-3-9', 6, 5)")
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM mood_rollups WHERE period = 'week'").fetchone() == (0,)
+
+    run_migrations(conn)
+    assert conn.execute('SELECT date FROM mood_entries').fetchall() == [('2024-03-09',)]
+    assert conn.execute('''
+        SELECT period, bucket, entries FROM mood_rollups WHERE period != 'all' ORDER BY period
+    ''').fetchall() == [('day', '2024-03-09', 1), ('month', '2024-03', 1), ('week', '2024-W10', 1)]
+    conn.close()
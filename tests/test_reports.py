@@ -0,0 +1,77 @@
+"""Batch reports over a directory of user databases"""
+
+import json
+
+import pytest
+
+from reports import find_databases, format_report_stats, generate_reports
+from tracker_core import open_database, upsert_entry
+
+
+def entry(date, mood, sleep=7.0):
+    return (date, mood, 5, sleep, 3, 3, '', '', '', '')
+
+
+def user_database(path, moods):
+    conn = open_database(str(path))
+    for day, mood in enumerate(moods, start=1):
+        upsert_entry(conn, entry(f'2024-01-{day:02d}', mood))
+    conn.close()
+
+
+@pytest.fixture
+def users(tmp_path):
+    data = tmp_path / 'users'
+    data.mkdir()
+    user_database(data / 'alice.db', [4, 6])
+    user_database(data / 'bob.db', [9, 9, 9, 9])
+    (data / 'broken.db').write_bytes(b'not a database' * 100)
+    (data / 'notes.txt').write_text("ignored")
+    return data
+
+
+def test_reports_and_index(users, tmp_path):
+    output = tmp_path / 'reports'
+    stats = generate_reports([str(users)], str(output), workers=2)
+    assert (stats['databases'], stats['reported'], stats['skipped']) == (3, 2, 0)
+    assert [r['user'] for r in stats['failed']] == ['broken']
+    assert sum(w['reports'] for w in stats['workers']) == 3
+    assert "2 of 3 databases reported" in format_report_stats(stats)
+
+    for user in ('alice', 'bob'):
+        for extension in ('txt', 'json', 'html'):
+            assert (output / f'{user}.{extension}').exists()
+    report = json.loads((output / 'alice.json').read_text())
+    assert report['summary']['entries'] == 2
+    assert report['summary']['averages']['mood_score'] == 5.0
+
+    index = json.loads((output / 'index.json').read_text())
+    assert [u['user'] for u in index['users']] == ['alice', 'bob']
+    # Weighted by entries: (4 + 6 + 4 * 9) / 6
+    assert index['totals']['averages']['mood_score'] == pytest.approx(46 / 6)
+    assert 'href="bob.html"' in (output / 'index.html').read_text()
+
+
+def test_resume_skips_unchanged_databases(users, tmp_path):
+    output = str(tmp_path / 'reports')
+    generate_reports([str(users)], output, formats=['json'], workers=1)
+
+    conn = open_database(str(users / 'alice.db'))
+    upsert_entry(conn, entry('2024-01-03', 8))
+    conn.close()
+    stats = generate_reports([str(users)], output, formats=['json'], workers=1, resume=True)
+    # bob is unchanged; alice changed and broken failed last time
+    assert stats['skipped'] == 1
+    assert stats['reported'] == 1
+    index = json.loads((tmp_path / 'reports' / 'index.json').read_text())
+    assert {u['user']: u['entries'] for u in index['users']} == {'alice': 3, 'bob': 4}
+
+
+def test_user_ids_must_be_unique(users, tmp_path):
+    other = tmp_path / 'other'
+    other.mkdir()
+    user_database(other / 'alice.db', [5])
+    with pytest.raises(ValueError, match="'alice'"):
+        find_databases([str(users), str(other)])
+    with pytest.raises(ValueError, match="unknown report formats"):
+        generate_reports([str(users)], str(tmp_path / 'reports'), formats=['pdf'])
@@ -0,0 +1,189 @@
+"""Rollups kept by triggers must match aggregates recomputed from mood_entries"""
+
+import datetime
+import json
+import math
+import random
+import sqlite3
+
+import pytest
+
+from sync import LocalPeer, sync
+from tracker_core import (
+    ENTRY_COLUMNS, ROLLUP_METRICS, build_insights_report, bulk_load_entries, data_version,
+    delete_entry_by_id, import_entries, insert_goal, migrate_create_tables, open_database,
+    run_migrations, upsert_entry,
+)
+
+
+def random_entry(rng, date):
+    """An ENTRY_COLUMNS tuple for `date` with some optional values left out"""
+    def maybe(value):
+        return value if rng.random() > 0.2 else None
+
+    return (date.isoformat(), rng.randint(1, 10), rng.randint(1, 10),
+            maybe(rng.randint(0, 48) / 4), maybe(rng.randint(1, 10)), maybe(rng.randint(1, 10)),
+            '', 'walk' if rng.random() > 0.5 else '', '', '')
+
+
+def random_dates(rng, count, start=datetime.date(2023, 12, 1), days=120):
+    return [start + datetime.timedelta(days=rng.randrange(days)) for _ in range(count)]
+
+
+def expected_rollups(conn):
+    """(period, bucket) -> [entries, then sum, sum of squares, count per metric]"""
+    rollups = {}
+    rows = conn.execute(f"SELECT date, {', '.join(ROLLUP_METRICS.values())} FROM mood_entries")
+    for date, *values in rows:
+        day = datetime.date.fromisoformat(date)
+        buckets = {'day': date, 'week': day.strftime('%Y-W%W'), 'month': date[:7], 'all': 'all'}
+        for period, bucket in buckets.items():
+            totals = rollups.setdefault((period, bucket), [0] * (1 + 3 * len(values)))
+            totals[0] += 1
+            for i, value in enumerate(values):
+                if value is not None:
+                    totals[1 + 3 * i] += value
+                    totals[2 + 3 * i] += value * value
+                    totals[3 + 3 * i] += 1
+    return rollups
+
+
+def expected_sleep_buckets(conn):
+    """Rounded sleep hours -> [entries, mood sum, mood sum of squares]"""
+    buckets = {}
+    for sleep, mood in conn.execute('SELECT sleep_hours, mood_score FROM mood_entries'):
+        if sleep is None:
+            continue
+        # SQLite rounds halves away from zero
+        totals = buckets.setdefault(math.floor(sleep + 0.5), [0, 0, 0])
+        totals[0] += 1
+        totals[1] += mood
+        totals[2] += mood * mood
+    return buckets
+
+
+def assert_rollups_current(conn):
+    stored = {(row[0], row[1]): list(row[2:]) for row in conn.execute('SELECT * FROM mood_rollups')}
+    expected = expected_rollups(conn)
+    assert stored.keys() == expected.keys()
+    for key, totals in expected.items():
+        assert stored[key] == pytest.approx(totals), key
+
+    stored = {row[0]: list(row[1:]) for row in conn.execute('SELECT * FROM sleep_buckets')}
+    assert stored == {bucket: pytest.approx(totals)
+                      for bucket, totals in expected_sleep_buckets(conn).items()}
+
+
+def test_backfill(tmp_path):
+    rng = random.Random(0)
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    migrate_create_tables(conn.cursor())
+    conn.executemany(f'''
+        INSERT INTO mood_entries ({', '.join(ENTRY_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [random_entry(rng, date) for date in sorted(set(random_dates(rng, 150)))])
+    conn.commit()
+
+    run_migrations(conn)
+    assert_rollups_current(conn)
+    conn.close()
+
+
+def test_upserts_and_replacements(db):
+    rng = random.Random(1)
+    for date in random_dates(rng, 200):
+        upsert_entry(db, random_entry(rng, date))
+    assert_rollups_current(db)
+
+
+def test_date_changes(db):
+    rng = random.Random(2)
+    for date in random_dates(rng, 50):
+        upsert_entry(db, random_entry(rng, date))
+    # Moving entries to another day, week and month goes through the update trigger
+    db.execute("UPDATE mood_entries SET date = date(date, '+200 days') WHERE id % 3 = 0")
+    db.commit()
+    assert_rollups_current(db)
+
+
+def test_deletes(db):
+    rng = random.Random(3)
+    for date in random_dates(rng, 100):
+        upsert_entry(db, random_entry(rng, date))
+    ids = [row[0] for row in db.execute('SELECT id FROM mood_entries')]
+    for entry_id in rng.sample(ids, len(ids) // 2):
+        delete_entry_by_id(db, entry_id)
+    assert_rollups_current(db)
+
+    for (entry_id,) in db.execute('SELECT id FROM mood_entries').fetchall():
+        delete_entry_by_id(db, entry_id)
+    assert db.execute('SELECT COUNT(*) FROM mood_rollups').fetchone()[0] == 0
+    assert db.execute('SELECT COUNT(*) FROM sleep_buckets').fetchone()[0] == 0
+
+
+def test_import_over_existing_entries(db, tmp_path):
+    rng = random.Random(4)
+    for date in random_dates(rng, 60):
+        upsert_entry(db, random_entry(rng, date))
+    # Overlaps the saved entries and repeats dates within the file
+    filename = tmp_path / 'entries.ndjson'
+    with open(filename, 'w') as f:
+        for date in random_dates(rng, 300):
+            row = dict(zip(ENTRY_COLUMNS, random_entry(rng, date)))
+            f.write(json.dumps({'table': 'mood_entries', 'row': row}) + '\n')
+    stats = import_entries(db, str(filename), batch_size=64)
+    assert stats['rows'] == 300
+    assert_rollups_current(db)
+
+
+def test_dates_without_a_bucket(db):
+    upsert_entry(db, ('2024-01-01', 6, 5, 7.0, 3, 3, '', '', '', ''))
+    before = db.execute('SELECT * FROM mood_rollups ORDER BY period, bucket').fetchall()
+    # Another program's date has no week bucket; the other periods still count it
+    db.execute("INSERT INTO mood_entries (date, mood_score, energy_level) VALUES ('someday', 2, 2)")
+    db.commit()
+    assert db.execute("SELECT entries FROM mood_rollups WHERE period = 'all'").fetchone() == (2,)
+    assert db.execute("SELECT COUNT(*) FROM mood_rollups WHERE period = 'week'").fetchone() == (1,)
+
+    db.execute("DELETE FROM mood_entries WHERE date = 'someday'")
+    db.commit()
+    assert db.execute('SELECT * FROM mood_rollups ORDER BY period, bucket').fetchall() == before
+
+
+def test_bulk_load_over_existing_entries(db):
+    rng = random.Random(5)
+    for date in random_dates(rng, 60):
+        upsert_entry(db, random_entry(rng, date))
+    loaded = bulk_load_entries(db, (random_entry(rng, date) for date in random_dates(rng, 300)),
+                               batch_size=64)
+    assert loaded == 300
+    assert_rollups_current(db)
+
+
+def test_sync_merge(tmp_path):
+    rng = random.Random(7)
+    local = open_database(str(tmp_path / 'local.db'))
+    remote = open_database(str(tmp_path / 'remote.db'))
+    for conn in (local, remote):
+        for date in random_dates(rng, 80):
+            upsert_entry(conn, random_entry(rng, date))
+
+    sync(local, LocalPeer(remote))
+    for conn in (local, remote):
+        assert_rollups_current(conn)
+        conn.close()
+
+
+def test_insights_report_is_reused_until_the_data_changes(db):
+    rng = random.Random(6)
+    for date in random_dates(rng, 30):
+        upsert_entry(db, random_entry(rng, date))
+
+    report = build_insights_report(db)
+    assert build_insights_report(db) is report
+    upsert_entry(db, ('2024-06-01', 1, 1, 3.0, 10, 10, '', '', '', ''))
+    assert build_insights_report(db) is not report
+    # Goals count as a change too
+    version = data_version(db)[1]
+    insert_goal(db, "Walk", "", None)
+    assert data_version(db)[1] > version
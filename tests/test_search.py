@@ -0,0 +1,81 @@
+"""Full-text search over the entry text fields"""
+
+import pytest
+
+import tracker_core
+from tracker_core import (
+    SNIPPET_END, SNIPPET_START, build_fts_query, delete_entry_by_id, has_search_index,
+    open_database, search_entries, upsert_entry,
+)
+
+
+def entry(date, notes, activities=''):
+    return (date, 6, 5, 7.0, 3, 3, notes, activities, '', '')
+
+
+def dates(rows):
+    return [row[1] for row in rows]
+
+
+@pytest.fixture
+def journal(db):
+    upsert_entry(db, entry('2024-01-01', "Long walk by the river", 'walk'))
+    upsert_entry(db, entry('2024-01-02', "Walked to work, long day", 'running'))
+    upsert_entry(db, entry('2024-01-03', "Café with friends", 'reading'))
+    return db
+
+
+@pytest.mark.parametrize('text, query', [
+    ('long walk', '"long" "walk"'),
+    ('"long walk" run*', '"long walk" "run"*'),
+    ('say "hi', '"say" "hi"'),
+    ('* "" OR', '"OR"'),
+    ('', ''),
+])
+def test_user_input_becomes_a_safe_query(text, query):
+    assert build_fts_query(text) == query
+
+
+def test_search(journal):
+    assert dates(search_entries(journal, 'long walk')) == ['2024-01-01']
+    assert dates(search_entries(journal, '"long day"')) == ['2024-01-02']
+    assert sorted(dates(search_entries(journal, 'walk*'))) == ['2024-01-01', '2024-01-02']
+    assert dates(search_entries(journal, 'run*')) == ['2024-01-02']
+    # Diacritics are folded
+    assert dates(search_entries(journal, 'cafe')) == ['2024-01-03']
+    assert search_entries(journal, '""') == []
+
+    snippet = search_entries(journal, 'river')[0][-1]
+    assert f'{SNIPPET_START}river{SNIPPET_END}' in snippet
+
+
+def test_index_follows_edits_and_deletes(journal):
+    upsert_entry(journal, entry('2024-01-01', "Quiet evening"))
+    assert search_entries(journal, 'river') == []
+    assert dates(search_entries(journal, 'quiet')) == ['2024-01-01']
+
+    entry_id = search_entries(journal, 'friends')[0][0]
+    delete_entry_by_id(journal, entry_id)
+    assert search_entries(journal, 'friends') == []
+
+
+def test_like_fallback_without_the_index(journal):
+    journal.execute('DROP TABLE mood_entries_fts')
+    assert dates(search_entries(journal, 'long walk*')) == ['2024-01-02', '2024-01-01']
+    assert dates(search_entries(journal, '"with friends"')) == ['2024-01-03']
+
+
+def test_index_is_created_once_fts5_is_available(tmp_path, monkeypatch):
+    path = str(tmp_path / 'tracker.db')
+    monkeypatch.setattr(tracker_core, 'fts5_available', lambda cursor: False)
+    conn = open_database(path)
+    upsert_entry(conn, entry('2024-01-01', "Long walk by the river"))
+    assert not has_search_index(conn)
+    conn.close()
+
+    monkeypatch.undo()
+    conn = open_database(path)
+    assert has_search_index(conn)
+    snippet = search_entries(conn, 'river')[0][-1]
+    assert f'{SNIPPET_START}river{SNIPPET_END}' in snippet
+    conn.close()
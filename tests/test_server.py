@@ -0,0 +1,166 @@
+"""The JSON API, served on an ephemeral port"""
+
+import csv
+import http.client
+import io
+import json
+import threading
+
+import pytest
+
+from server import PoolManager, TrackerServer
+from tracker_core import (
+    build_insights_report, entry_cache, entry_caches, insights_cache, mood_model, mood_models,
+    upsert_entry,
+)
+
+
+@pytest.fixture
+def server(tmp_path):
+    pools = PoolManager(str(tmp_path / 'users'), readers=2)
+    server = TrackerServer(('127.0.0.1', 0), pools, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    pools.close()
+
+
+@pytest.fixture
+def request_json(server):
+    client = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=5)
+
+    def request(method, path, body=None, raw=None):
+        data = raw if raw is not None else (None if body is None else json.dumps(body))
+        client.request(method, path, body=data,
+                       headers={'Content-Type': 'application/json'} if data else {})
+        response = client.getresponse()
+        payload = response.read()
+        if response.getheader('Content-Type') == 'application/json':
+            payload = json.loads(payload)
+        return response.status, payload
+
+    yield request
+    client.close()
+
+
+def entry(date, mood, notes=''):
+    return {'date': date, 'mood_score': mood, 'energy_level': 5, 'notes': notes}
+
+
+def test_entries(request_json):
+    assert request_json('GET', '/health') == (200, {'status': 'ok'})
+    status, saved = request_json('POST', '/users/alice/entries', entry('2024-01-01', 6, 'long walk'))
+    assert status == 200
+    request_json('POST', '/users/alice/entries', entry('2024-01-02', 8))
+    # Same date again replaces the entry
+    assert request_json('POST', '/users/alice/entries', entry('2024-01-01', 4, 'long walk'))[1] == saved
+
+    status, rows = request_json('GET', '/users/alice/entries?limit=1')
+    assert status == 200
+    assert [(row['date'], row['mood_score']) for row in rows] == [('2024-01-02', 8)]
+    rows = request_json('GET', '/users/alice/entries?before=2024-01-02')[1]
+    assert [(row['date'], row['mood_score']) for row in rows] == [('2024-01-01', 4)]
+
+    rows = request_json('GET', '/users/alice/search?q=walk')[1]
+    assert [row['id'] for row in rows] == [saved['id']]
+    assert request_json('DELETE', f"/users/alice/entries/{saved['id']}") == (200, {'deleted': saved['id']})
+    assert request_json('GET', '/users/alice/search?q=walk') == (200, [])
+
+    # Users don't see each other's entries
+    assert request_json('GET', '/users/bob/entries') == (200, [])
+
+
+def test_goals_insights_and_export(request_json):
+    status, goal = request_json('POST', '/users/alice/goals', {'title': "Walk daily"})
+    assert status == 200
+    assert request_json('POST', f"/users/alice/goals/{goal['id']}/complete")[0] == 200
+    goals = request_json('GET', '/users/alice/goals')[1]
+    assert [(g['title'], g['completed']) for g in goals] == [("Walk daily", 1)]
+    assert request_json('DELETE', f"/users/alice/goals/{goal['id']}")[0] == 200
+    assert request_json('GET', '/users/alice/goals') == (200, [])
+
+    for day in range(1, 4):
+        request_json('POST', '/users/alice/entries', entry(f'2024-01-0{day}', 5 + day))
+    status, report = request_json('GET', '/users/alice/insights')
+    assert status == 200 and "Total Entries: 3" in report['text']
+
+    status, body = request_json('GET', '/users/alice/export?format=csv')
+    assert status == 200
+    rows = list(csv.reader(io.StringIO(body.decode('utf-8'))))
+    assert [row[:2] for row in rows[1:]] == [['2024-01-01', '6'], ['2024-01-02', '7'],
+                                             ['2024-01-03', '8']]
+    assert request_json('GET', '/users/alice/export?format=xml')[0] == 400
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('GET', '/users/alice/nothing', None, 404),
+    ('GET', '/elsewhere', None, 404),
+    ('PUT', '/users/alice/entries', None, 501),
+    ('DELETE', '/users/alice/entries', None, 405),
+    ('GET', '/users/not..valid/entries', None, 400),
+    ('GET', '/users/alice/entries?limit=ten', None, 400),
+    ('POST', '/users/alice/entries', {'date': '2024-01-01', 'mood_score': 11}, 400),
+    ('POST', '/users/alice/goals', {'title': ' '}, 400),
+    ('POST', '/users/alice/entries', {'date': '2024-01-01', 'mood_score': [7]}, 400),
+    ('POST', '/users/alice/entries', {'date': '2024-01-01', 'mood_score': 7, 'energy_level': 5,
+                                      'sleep_hours': {}}, 400),
+    ('POST', '/users/alice/entries', {'date': '2024-01-01', 'mood_score': 7, 'energy_level': 5,
+                                      'notes': ['a', 'b']}, 400),
+    ('POST', '/users/alice/entries', '[1, 2]', 400),
+    ('POST', '/users/alice/entries', '{"date": ', 400),
+])
+def test_bad_requests(request_json, method, path, body, status):
+    raw = body if isinstance(body, str) else None
+    response_status, payload = request_json(method, path, None if raw else body, raw)
+    assert response_status == status
+    if status != 501:
+        assert 'error' in payload
+
+
+def test_unexpected_errors_are_answered(request_json, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr('server.fetch_history_page', broken)
+    assert request_json('GET', '/users/alice/entries') == (500, {'error': "internal error"})
+    # The connection is still usable
+    assert request_json('GET', '/health') == (200, {'status': 'ok'})
+
+
+def test_idle_pools_are_closed_beyond_the_limit(tmp_path):
+    pools = PoolManager(str(tmp_path), readers=1, max_pools=2)
+    for user in ('a', 'b', 'c'):
+        with pools.checkout(user):
+            pass
+    assert list(pools.pools) == ['b', 'c']
+
+    # A pool in use is never closed, even when it is the oldest
+    with pools.checkout('b'):
+        with pools.checkout('d'):
+            pass
+        with pools.checkout('e'):
+            assert 'b' in pools.pools
+    pools.close()
+    assert (tmp_path / 'a.db').exists()
+
+
+def test_closing_a_pool_frees_its_cached_state(tmp_path):
+    pools = PoolManager(str(tmp_path), readers=1, max_pools=1)
+    path = str(tmp_path / 'a.db')
+    with pools.checkout('a') as pool:
+        with pool.writer() as conn:
+            upsert_entry(conn, ('2024-01-01', 6, 5, 7.0, 3, 3, '', '', '', ''))
+            entry_cache(conn)
+            mood_model(conn)
+            build_insights_report(conn)
+    assert path in entry_caches and path in mood_models and path in insights_cache
+
+    with pools.checkout('b'):
+        pass
+    assert list(pools.pools) == ['b']
+    assert path not in entry_caches
+    assert path not in mood_models
+    assert path not in insights_cache
+    pools.close()
@@ -0,0 +1,63 @@
+"""Lazy tab building and the startup report, without a display"""
+
+import time
+
+from tracker_gui import STARTUP_PHASES, MentalHealthTracker
+
+
+class FakeVar:
+    """tk.StringVar without a Tcl interpreter"""
+
+    def __init__(self):
+        self.value = ""
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def bare_tracker():
+    app = MentalHealthTracker.__new__(MentalHealthTracker)
+    app.started = time.perf_counter()
+    app.startup_phases = {}
+    app.current_job = None
+    app.status_var = FakeVar()
+    return app
+
+
+def test_tabs_are_built_once_on_demand():
+    app = bare_tracker()
+    built = []
+    app.tab_builders = {'.notebook.history': lambda: built.append('history')}
+    app.history_frame = '.notebook.history'
+    assert not app.tab_built(app.history_frame)
+
+    # Refreshing a tab that was never shown has nothing to update
+    app.refresh_history()
+    assert built == []
+
+    app.build_tab(app.history_frame)
+    app.build_tab(app.history_frame)
+    assert built == ['history']
+    assert app.tab_built(app.history_frame)
+
+
+def test_startup_report():
+    app = bare_tracker()
+    for phase in STARTUP_PHASES[:-1]:
+        app.mark_startup(phase, time.perf_counter())
+    # A phase is only recorded the first time
+    first = app.startup_phases['import']
+    app.mark_startup('import', time.perf_counter())
+    assert app.startup_phases['import'] == first
+
+    lines = app.format_startup_report().splitlines()
+    assert len(lines) == 1 + len(STARTUP_PHASES)
+    assert lines[-1].split() == ['goals', 'loaded', 'pending']
+    assert app.status_var.get() == ""
+
+    app.mark_startup('goals loaded', time.perf_counter())
+    assert app.status_var.get().startswith("Ready (started in ")
+    assert 'pending' not in app.format_startup_report()
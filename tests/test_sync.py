@@ -0,0 +1,135 @@
+"""Syncing two databases, in the same process and over a socket"""
+
+import socketserver
+import threading
+import time
+
+import pytest
+
+from sync import LocalPeer, RemotePeer, SyncHandler, sync
+from tracker_core import (
+    ENTRY_COLUMNS, connect, delete_entries, insert_goal, open_database, run_migrations,
+    set_goals_completed, upsert_entry,
+)
+
+
+def entry(date, mood, notes=''):
+    return (date, mood, 5, 7.0, 3, 3, notes, '', '', '')
+
+
+def entries(conn):
+    return conn.execute(f"SELECT {', '.join(ENTRY_COLUMNS)} FROM mood_entries ORDER BY date").fetchall()
+
+
+def goals(conn):
+    return conn.execute('SELECT uid, title, completed FROM goals ORDER BY uid').fetchall()
+
+
+def rollups(conn):
+    return conn.execute('SELECT * FROM mood_rollups ORDER BY period, bucket').fetchall()
+
+
+def later():
+    """Let the change log's millisecond clock move on, so the next change is the latest"""
+    time.sleep(0.01)
+
+
+@pytest.fixture
+def pair(tmp_path):
+    local = open_database(str(tmp_path / 'desktop.db'))
+    remote = open_database(str(tmp_path / 'laptop.db'))
+    yield local, remote
+    local.close()
+    remote.close()
+
+
+def test_first_sync_exchanges_everything(pair):
+    local, remote = pair
+    upsert_entry(local, entry('2024-01-01', 6))
+    upsert_entry(remote, entry('2024-01-02', 7))
+    insert_goal(remote, "Walk daily", "", '2024-06-01')
+
+    stats = sync(local, LocalPeer(remote))
+    assert (stats['sent'], stats['received']) == (1, 2)
+    assert entries(local) == entries(remote) == [entry('2024-01-01', 6), entry('2024-01-02', 7)]
+    assert goals(local) == goals(remote)
+    assert rollups(local) == rollups(remote)
+
+    # Nothing changed since, so nothing is sent back and forth
+    stats = sync(local, LocalPeer(remote))
+    assert (stats['sent'], stats['received']) == (0, 0)
+
+
+def test_later_change_wins_on_both_sides(pair):
+    local, remote = pair
+    upsert_entry(local, entry('2024-01-01', 6))
+    goal_id = insert_goal(local, "Walk daily", "", '2024-06-01')
+    sync(local, LocalPeer(remote))
+
+    upsert_entry(local, entry('2024-01-01', 2, "edited on the desktop"))
+    later()
+    upsert_entry(remote, entry('2024-01-01', 9, "edited on the laptop"))
+    later()
+    set_goals_completed(local, [goal_id])
+
+    sync(local, LocalPeer(remote))
+    assert entries(local) == entries(remote) == [entry('2024-01-01', 9, "edited on the laptop")]
+    assert [row[2] for row in goals(local)] == [row[2] for row in goals(remote)] == [1]
+    assert rollups(local) == rollups(remote)
+
+
+def test_deletes_are_synced(pair):
+    local, remote = pair
+    for day in range(1, 4):
+        upsert_entry(local, entry(f'2024-01-0{day}', day))
+    sync(local, LocalPeer(remote))
+
+    delete_entries(remote, [row[0] for row in remote.execute(
+        "SELECT id FROM mood_entries WHERE date IN ('2024-01-02', '2024-01-03')")])
+    later()
+    # A delete loses to a later edit of the same day
+    upsert_entry(local, entry('2024-01-03', 8))
+
+    sync(local, LocalPeer(remote))
+    assert entries(local) == entries(remote) == [entry('2024-01-01', 1), entry('2024-01-03', 8)]
+    assert rollups(local) == rollups(remote)
+
+
+def test_copy_of_the_same_database_is_refused(pair, tmp_path):
+    local, _ = pair
+    upsert_entry(local, entry('2024-01-01', 6))
+    copy = open_database(str(tmp_path / 'copy.db'))
+    local.backup(copy)
+    with pytest.raises(ValueError, match="same sync identity"):
+        sync(local, LocalPeer(copy))
+    copy.close()
+
+
+def test_sync_over_a_socket(tmp_path):
+    local = open_database(str(tmp_path / 'desktop.db'))
+    # Served from the listener's thread
+    served = connect(str(tmp_path / 'laptop.db'), check_same_thread=False)
+    run_migrations(served)
+    upsert_entry(local, entry('2024-01-01', 6))
+    upsert_entry(served, entry('2024-01-02', 7))
+
+    listener = socketserver.TCPServer(('127.0.0.1', 0), SyncHandler)
+    listener.peer = LocalPeer(served)
+    thread = threading.Thread(target=listener.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        with RemotePeer('127.0.0.1', listener.server_address[1], timeout=5) as peer:
+            stats = sync(local, peer)
+            assert (stats['sent'], stats['received']) == (1, 1)
+            assert stats['bytes_sent'] and stats['bytes_received']
+            assert entries(local) == entries(served)
+
+            # Database errors are answered, and the connection stays open
+            served.close()
+            for _ in range(2):
+                with pytest.raises(ValueError, match="database error"):
+                    sync(local, peer)
+    finally:
+        listener.shutdown()
+        listener.server_close()
+        local.close()
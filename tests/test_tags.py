@@ -0,0 +1,101 @@
+"""Tag tables and the analytics built on them"""
+
+import sqlite3
+
+import pytest
+
+from tracker_core import (
+    bulk_load_entries, build_insights_report, delete_entry_by_id, migrate_create_tables,
+    open_database, split_tags, tag_analytics, tag_effect, top_tags, upsert_entry,
+)
+
+
+def entry(date, mood, anxiety, activities='', triggers='', medications=''):
+    return (date, mood, 5, 7.0, 3, anxiety, '', activities, triggers, medications)
+
+
+def entry_tags(conn):
+    """date -> sorted (kind, name) pairs from the junction table"""
+    tags = {}
+    for date, kind, name in conn.execute('''
+        SELECT e.date, t.kind, t.name FROM entry_tags et
+        JOIN tags t ON t.id = et.tag_id JOIN mood_entries e ON e.id = et.entry_id
+    '''):
+        tags.setdefault(date, []).append((kind, name))
+    return {date: sorted(pairs) for date, pairs in tags.items()}
+
+
+def test_split_tags():
+    assert split_tags(' Walk,  long   run ,walk,, ') == ['Walk', 'long run']
+    assert split_tags(None) == []
+
+
+def test_writes_keep_the_junction_rows_current(db):
+    upsert_entry(db, entry('2024-01-01', 6, 3, 'walk, yoga', 'work'))
+    bulk_load_entries(db, [entry('2024-01-02', 7, 3, 'Walk', '', 'vitamin d')])
+    assert entry_tags(db) == {
+        '2024-01-01': [('activity', 'walk'), ('activity', 'yoga'), ('trigger', 'work')],
+        '2024-01-02': [('activity', 'walk'), ('medication', 'vitamin d')],
+    }
+
+    upsert_entry(db, entry('2024-01-01', 6, 3, 'run'))
+    entry_id = db.execute("SELECT id FROM mood_entries WHERE date = '2024-01-02'").fetchone()[0]
+    delete_entry_by_id(db, entry_id)
+    assert entry_tags(db) == {'2024-01-01': [('activity', 'run')]}
+
+
+def test_migration_splits_existing_entries(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    migrate_create_tables(conn.cursor())
+    conn.execute('''
+        INSERT INTO mood_entries (date, mood_score, energy_level, activities, triggers)
+        VALUES ('2024-01-01', 5, 5, 'walk,gym', 'exams')
+    ''')
+    conn.commit()
+    conn.close()
+
+    conn = open_database(path)
+    assert entry_tags(conn) == {
+        '2024-01-01': [('activity', 'gym'), ('activity', 'walk'), ('trigger', 'exams')],
+    }
+    conn.close()
+
+
+@pytest.fixture
+def journal(db):
+    bulk_load_entries(db, [
+        entry('2024-01-01', 8, 2, 'walk'),
+        entry('2024-01-02', 7, 3, 'walk', 'work'),
+        entry('2024-01-03', 9, 2, 'walk'),
+        entry('2024-01-04', 3, 8, '', 'work'),
+        entry('2024-01-05', 4, 9, '', 'work, news'),
+        entry('2024-01-06', 5, 7, '', 'news'),
+    ])
+    return db
+
+
+def test_tag_analytics(journal):
+    tags = {(t['kind'], t['name']): t for t in tag_analytics(journal, min_entries=2)}
+    assert sorted(tags) == [('activity', 'walk'), ('trigger', 'news'), ('trigger', 'work')]
+    walk = tags['activity', 'walk']
+    assert walk['entries'] == 3
+    assert walk['mood'] == pytest.approx(8)
+    assert walk['mood_delta'] == pytest.approx(8 - 6)
+    assert tags['trigger', 'work']['anxiety_delta'] == pytest.approx(20 / 3 - 31 / 6)
+    assert tag_analytics(journal, 'activity', min_entries=4) == []
+
+
+def test_tag_effect_and_top_tags(journal):
+    assert tag_effect(journal, 'activity', 'walk') == (pytest.approx(8), pytest.approx(4), 3)
+    assert tag_effect(journal, 'activity', 'swim') == (None, pytest.approx(6), 0)
+    with pytest.raises(ValueError):
+        tag_effect(journal, 'activity', 'walk', 'notes')
+    assert top_tags(journal, 'trigger') == [('news', 2), ('work', 2)]
+    assert top_tags(journal, 'trigger', limit=1, min_value=9) == [('news', 1)]
+
+
+def test_insights_mention_tags(journal):
+    report = build_insights_report(journal)
+    assert "TAG INSIGHTS:" in report
+    assert "• Mood is +2.0 on days with walk (3 days)" in report
@@ -0,0 +1,225 @@
+"""The database worker thread"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from forecast import MoodModel
+from tracker_core import (
+    DatabaseWorker, JobCancelled, data_version, delete_entries, delete_goals, entry_cache,
+    entry_caches, fetch_goals, fetch_history_page, insert_goal, mood_model, mood_model_path,
+    mood_models, run_migrations, set_goals_completed, upsert_entry,
+)
+
+
+@pytest.fixture
+def worker(tmp_path):
+    worker = DatabaseWorker(str(tmp_path / 'tracker.db'))
+    worker.start()
+    worker.submit(lambda conn, job: run_migrations(conn))
+    yield worker
+    worker.stop()
+
+
+def run(worker, func, **callbacks):
+    """Submit a job, wait for it and dispatch its callbacks; returns the Job.
+    Any batched writes are committed before the job that waits for them."""
+    done = threading.Event()
+    job = worker.submit(func, **callbacks)
+    worker.submit(lambda conn, job: done.set())
+    assert done.wait(5)
+    worker.dispatch_results()
+    return job
+
+
+def test_jobs_run_in_order_off_the_calling_thread(worker):
+    results = []
+    for i in range(3):
+        run(worker, lambda conn, job, i=i: (i, threading.current_thread().name),
+            on_done=results.append)
+    assert results == [(0, 'db-worker'), (1, 'db-worker'), (2, 'db-worker')]
+
+
+def test_failed_job_is_rolled_back(worker):
+    def fail(conn, job):
+        insert_goal(conn, "half done", "", None, commit=False)
+        raise ValueError("boom")
+
+    errors = []
+    run(worker, fail, on_error=errors.append)
+    assert [str(e) for e in errors] == ["boom"]
+
+    counts = []
+    run(worker, lambda conn, job: conn.execute('SELECT COUNT(*) FROM goals').fetchone()[0],
+        on_done=counts.append)
+    assert counts == [0]
+
+
+def test_progress_and_cancellation(worker):
+    started, release = threading.Event(), threading.Event()
+    progress, errors = [], []
+
+    def long_job(conn, job):
+        started.set()
+        release.wait(5)
+        for step in range(10):
+            job.check_cancelled()
+            job.report_progress(step / 10, f"step {step}")
+
+    job = worker.submit(long_job, on_error=errors.append,
+                        on_progress=lambda fraction, message: progress.append(message))
+    assert started.wait(5)
+    job.cancel()
+    release.set()
+    run(worker, lambda conn, job: None)
+    assert progress == []
+    assert len(errors) == 1 and isinstance(errors[0], JobCancelled)
+
+    run(worker, lambda conn, job: [job.report_progress(i / 2, f"step {i}") for i in range(2)],
+        on_progress=lambda fraction, message: progress.append((fraction, message)))
+    assert progress == [(0.0, "step 0"), (0.5, "step 1")]
+
+
+def test_entry_helpers(worker):
+    ids = []
+    run(worker, lambda conn, job: upsert_entry(
+        conn, ('2024-01-01', 5, 5, 7.0, 3, 3, '', '', '', '')), on_done=ids.append)
+    run(worker, lambda conn, job: upsert_entry(
+        conn, ('2024-01-01', 8, 5, 7.0, 3, 3, 'again', '', '', '')), on_done=ids.append)
+    # A second save for the same date replaces the entry
+    assert ids[0] == ids[1]
+
+    pages = []
+    run(worker, lambda conn, job: fetch_history_page(conn), on_done=pages.append)
+    assert pages == [[(ids[0], '2024-01-01', 8, 5, 7.0, 3, 3, 'again')]]
+
+
+def entry(date, mood=5):
+    return (date, mood, 5, 7.0, 3, 3, '', '', '', '')
+
+
+def test_writes_are_committed_together(worker):
+    outside = sqlite3.connect(worker.db_path)
+    started, release, ids = threading.Event(), threading.Event(), []
+
+    def first(conn, job):
+        started.set()
+        release.wait(5)
+        return upsert_entry(conn, entry('2024-01-01'), commit=False)
+
+    worker.submit(first, on_done=ids.append, write=True)
+    for day in (2, 3):
+        worker.submit(lambda conn, job, day=day: upsert_entry(conn, entry(f'2024-01-0{day}'),
+                                                              commit=False),
+                      on_done=ids.append, write=True)
+    assert started.wait(5)
+    release.set()
+    run(worker, lambda conn, job: None)
+    assert len(ids) == 3
+    assert outside.execute('SELECT COUNT(*) FROM mood_entries').fetchone() == (3,)
+    outside.close()
+
+
+def test_failed_write_is_undone_alone(worker):
+    def fail(conn, job):
+        upsert_entry(conn, entry('2024-01-02'), commit=False)
+        raise ValueError("boom")
+
+    done, errors = [], []
+    worker.submit(lambda conn, job: upsert_entry(conn, entry('2024-01-01'), commit=False),
+                  on_done=done.append, write=True)
+    worker.submit(fail, on_error=errors.append, write=True)
+    run(worker, lambda conn, job: None)
+    assert len(done) == 1 and [str(e) for e in errors] == ["boom"]
+
+    pages = []
+    run(worker, lambda conn, job: fetch_history_page(conn), on_done=pages.append)
+    assert [row[1] for row in pages[0]] == ['2024-01-01']
+
+
+def test_failed_write_is_undone_in_the_entry_cache(worker):
+    run(worker, lambda conn, job: upsert_entry(conn, entry('2024-01-01')))
+    run(worker, entry_cache)
+
+    def fail(conn, job):
+        upsert_entry(conn, entry('2024-01-02'), commit=False)
+        raise ValueError("boom")
+
+    worker.submit(fail, write=True)
+    # Takes the change counter back to the value the undone write had reached
+    worker.submit(lambda conn, job: insert_goal(conn, "Walk", "", None, commit=False),
+                  write=True)
+    pages = []
+    run(worker, lambda conn, job: fetch_history_page(conn), on_done=pages.append)
+    assert [row[1] for row in pages[0]] == ['2024-01-01']
+
+
+def test_failed_commit_fails_every_write_in_the_batch(worker):
+    # A deferred foreign key is only checked at COMMIT
+    run(worker, lambda conn, job: conn.executescript('''
+        PRAGMA foreign_keys = ON;
+        CREATE TABLE parent (id INTEGER PRIMARY KEY);
+        CREATE TABLE child (parent_id REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED);
+    '''))
+    run(worker, lambda conn, job: upsert_entry(conn, entry('2024-01-01')))
+    run(worker, entry_cache)
+    run(worker, lambda conn, job: mood_model(conn))
+
+    errors = []
+    worker.submit(lambda conn, job: upsert_entry(conn, entry('2024-01-01', 9), commit=False),
+                  on_error=errors.append, write=True)
+    worker.submit(lambda conn, job: conn.execute('INSERT INTO child VALUES (1)'),
+                  on_error=errors.append, write=True)
+    run(worker, lambda conn, job: None)
+    assert len(errors) == 2 and all(isinstance(e, sqlite3.IntegrityError) for e in errors)
+
+    # The cache had already seen the save, so it is dropped with the rollback
+    assert worker.db_path not in entry_caches
+    pages = []
+    run(worker, lambda conn, job: fetch_history_page(conn), on_done=pages.append)
+    assert [row[2] for row in pages[0]] == [5]
+    # So is the mood model, while the stored one still matches the database
+    assert worker.db_path not in mood_models
+    versions = []
+    run(worker, lambda conn, job: data_version(conn)[1], on_done=versions.append)
+    assert MoodModel.load(mood_model_path(worker.db_path)).version == versions[0]
+
+
+def test_mood_model_is_stored_after_the_commit(worker):
+    run(worker, lambda conn, job: upsert_entry(conn, entry('2024-01-01')))
+    run(worker, lambda conn, job: mood_model(conn))
+    stored = []
+    for day in (2, 3):
+        worker.submit(lambda conn, job, day=day: upsert_entry(conn, entry(f'2024-01-0{day}'),
+                                                             commit=False),
+                      on_done=lambda entry_id: stored.append(
+                          MoodModel.load(mood_model_path(worker.db_path))),
+                      write=True)
+    versions = []
+    run(worker, lambda conn, job: data_version(conn)[1], on_done=versions.append)
+    assert [model.version for model in stored] == versions * 2
+    assert stored[0].examples == 2
+
+
+def test_multi_row_helpers(worker):
+    def setup(conn, job):
+        ids = [upsert_entry(conn, entry(f'2024-01-0{day}'), commit=False) for day in (1, 2, 3)]
+        goals = [insert_goal(conn, title, '', None, commit=False) for title in 'ABC']
+        return ids, goals
+
+    created = []
+    run(worker, setup, on_done=created.append, write=True)
+    ids, goals = created[0]
+
+    def change(conn, job):
+        delete_entries(conn, ids[:2], commit=False)
+        set_goals_completed(conn, goals[:2], commit=False)
+        delete_goals(conn, goals[1:2], commit=False)
+        return fetch_history_page(conn), fetch_goals(conn)
+
+    results = []
+    run(worker, change, on_done=results.append, write=True)
+    pages, goal_rows = results[0]
+    assert [row[1] for row in pages] == ['2024-01-03']
+    assert [(row[1], row[4]) for row in goal_rows] == [('C', 0), ('A', 1)]
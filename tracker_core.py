@@ -0,0 +1,2444 @@
+"""Headless data layer for the Mental Health Tracker.
+
+Everything here works on a plain sqlite3 connection, so it can be used by the
+Tkinter GUI, the command line, scripts and benchmarks alike without a display.
+"""
+
+import sqlite3
+import json
+import datetime
+import os
+import io
+import re
+import sys
+import csv
+import time
+import queue
+import threading
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from analytics import AnalyticsEngine, format_analytics, numpy_available
+from anomaly import ANOMALY_METRICS, AnomalyDetector
+from archive import ARCHIVE_COLUMNS, ARCHIVE_EXTENSION, ArchiveReader, ArchiveWriter
+from entry_cache import EntryCache
+from forecast import LOW_MOOD, NUMERIC_FEATURES, MoodModel, features, format_forecast
+from goals import GOAL_SPEC_FIELDS, GoalProgress, check_goal, describe_goal, format_goal_progress
+from instrumentation import TracedConnection, add_span, span, traced
+
+
+# Entries per History page
+HISTORY_PAGE_SIZE = 200
+
+# Database location and schema versioning
+DB_PATH = 'mental_health_data.db'
+
+
+def migrate_create_tables(cursor):
+    """v1: base mood_entries and goals tables"""
+    # Create mood entries table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mood_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            mood_score INTEGER NOT NULL,
+            energy_level INTEGER NOT NULL,
+            sleep_hours REAL,
+            stress_level INTEGER,
+            anxiety_level INTEGER,
+            notes TEXT,
+            activities TEXT,
+            triggers TEXT,
+            medications TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create goals table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            target_date TEXT,
+            completed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def migrate_date_indexes(cursor):
+    """v2: one entry per date plus indexes for the date and goal orderings"""
+    # Older databases allowed several entries per date. Keep the newest one
+    # and move the rest aside instead of dropping them.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mood_entries_duplicates AS
+        SELECT * FROM mood_entries WHERE 0
+    ''')
+    cursor.execute('''
+        INSERT INTO mood_entries_duplicates
+        SELECT * FROM mood_entries
+        WHERE id NOT IN (SELECT MAX(id) FROM mood_entries GROUP BY date)
+    ''')
+    cursor.execute('''
+        DELETE FROM mood_entries
+        WHERE id NOT IN (SELECT MAX(id) FROM mood_entries GROUP BY date)
+    ''')
+    
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_mood_entries_date
+        ON mood_entries (date)
+    ''')
+    # Covers the history page and the insights trend without table lookups
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_mood_entries_date_scores
+        ON mood_entries (date, mood_score, energy_level, sleep_hours,
+                         stress_level, anxiety_level)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_goals_completed_target
+        ON goals (completed, target_date)
+    ''')
+
+
+# Aggregated metrics: rollup column prefix -> mood_entries column
+ROLLUP_METRICS = {
+    'mood': 'mood_score',
+    'energy': 'energy_level',
+    'sleep': 'sleep_hours',
+    'stress': 'stress_level',
+    'anxiety': 'anxiety_level',
+}
+
+# Rollup periods: name -> bucket expression for an entry row alias
+ROLLUP_PERIODS = {
+    'day': "{row}.date",
+    'week': "strftime('%Y-W%W', {row}.date)",
+    'month': "substr({row}.date, 1, 7)",
+    'all': "'all'",
+}
+
+
+def has_bucket(bucket):
+    """Condition skipping rows whose date can't be put in a bucket, e.g. the
+    week of 2024-3-5 written by another program, instead of failing the write"""
+    return f"{bucket} IS NOT NULL"
+
+
+def rollup_upsert_sql(row, sign):
+    """SQL adding (sign=1) or removing (sign=-1) one entry row to every rollup"""
+    columns = ['entries']
+    values = [str(sign)]
+    for prefix, column in ROLLUP_METRICS.items():
+        value = f"COALESCE({row}.{column}, 0)"
+        columns += [f'{prefix}_sum', f'{prefix}_sq', f'{prefix}_count']
+        values += [f"{sign} * {value}", f"{sign} * {value} * {value}",
+                   f"{sign} * ({row}.{column} IS NOT NULL)"]
+    updates = ', '.join(f'{c} = {c} + excluded.{c}' for c in columns)
+    
+    statements = []
+    for period, bucket in ROLLUP_PERIODS.items():
+        statements.append(f'''
+            INSERT INTO mood_rollups (period, bucket, {', '.join(columns)})
+            SELECT '{period}', {bucket.format(row=row)}, {', '.join(values)}
+            WHERE {has_bucket(bucket.format(row=row))}
+            ON CONFLICT(period, bucket) DO UPDATE SET {updates};''')
+        if sign < 0:
+            statements.append(f'''
+            DELETE FROM mood_rollups
+            WHERE period = '{period}' AND bucket = {bucket.format(row=row)} AND entries = 0;''')
+    statements.append(f'''
+            INSERT INTO sleep_buckets (bucket, entries, mood_sum, mood_sq)
+            SELECT CAST(ROUND({row}.sleep_hours) AS INTEGER), {sign},
+                   {sign} * {row}.mood_score, {sign} * {row}.mood_score * {row}.mood_score
+            WHERE {row}.sleep_hours IS NOT NULL
+            ON CONFLICT(bucket) DO UPDATE SET
+                entries = entries + excluded.entries,
+                mood_sum = mood_sum + excluded.mood_sum,
+                mood_sq = mood_sq + excluded.mood_sq;''')
+    if sign < 0:
+        statements.append(f'''
+            DELETE FROM sleep_buckets
+            WHERE bucket = CAST(ROUND({row}.sleep_hours) AS INTEGER) AND entries = 0;''')
+    return ''.join(statements)
+
+
+def rollup_apply_sql(source, sign):
+    """Statements adding (sign=1) or removing (sign=-1) all rows of `source`.
+    
+    `source` is a table name or parenthesised query with mood_entries
+    columns. This is the set-based counterpart of rollup_upsert_sql, used for
+    backfills and bulk imports.
+    """
+    columns = ['entries']
+    sums = [f'{sign} * COUNT(*)']
+    for prefix, column in ROLLUP_METRICS.items():
+        value = f"COALESCE(e.{column}, 0)"
+        columns += [f'{prefix}_sum', f'{prefix}_sq', f'{prefix}_count']
+        sums += [f'{sign} * SUM({value})', f'{sign} * SUM({value} * {value})',
+                 f'{sign} * COUNT(e.{column})']
+    updates = ', '.join(f'{c} = {c} + excluded.{c}' for c in columns)
+    
+    statements = []
+    for period, bucket in ROLLUP_PERIODS.items():
+        statements.append(f'''
+            INSERT INTO mood_rollups (period, bucket, {', '.join(columns)})
+            SELECT '{period}', {bucket.format(row='e')}, {', '.join(sums)}
+            FROM {source} e WHERE {has_bucket(bucket.format(row='e'))} GROUP BY 2
+            ON CONFLICT(period, bucket) DO UPDATE SET {updates}''')
+    statements.append(f'''
+            INSERT INTO sleep_buckets (bucket, entries, mood_sum, mood_sq)
+            SELECT CAST(ROUND(e.sleep_hours) AS INTEGER), {sign} * COUNT(*),
+                   {sign} * SUM(e.mood_score), {sign} * SUM(e.mood_score * e.mood_score)
+            FROM {source} e WHERE e.sleep_hours IS NOT NULL GROUP BY 1
+            ON CONFLICT(bucket) DO UPDATE SET
+                entries = entries + excluded.entries,
+                mood_sum = mood_sum + excluded.mood_sum,
+                mood_sq = mood_sq + excluded.mood_sq''')
+    if sign < 0:
+        statements.append('DELETE FROM mood_rollups WHERE entries = 0')
+        statements.append('DELETE FROM sleep_buckets WHERE entries = 0')
+    return statements
+
+
+# Per-row triggers keeping the rollups current
+ROLLUP_TRIGGERS = ('mood_entries_rollup_insert', 'mood_entries_rollup_delete',
+                   'mood_entries_rollup_update')
+
+# Bumped on every data change; used as a cache key for derived results
+BUMP_CHANGE_COUNTER = 'UPDATE change_counter SET value = value + 1;'
+
+
+def create_rollup_triggers(cursor):
+    """Create the triggers that maintain mood_rollups and sleep_buckets"""
+    metric_list = ', '.join(ROLLUP_METRICS.values())
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS mood_entries_rollup_insert
+        AFTER INSERT ON mood_entries BEGIN{rollup_upsert_sql('NEW', 1)}
+            {BUMP_CHANGE_COUNTER}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS mood_entries_rollup_delete
+        AFTER DELETE ON mood_entries BEGIN{rollup_upsert_sql('OLD', -1)}
+            {BUMP_CHANGE_COUNTER}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS mood_entries_rollup_update
+        AFTER UPDATE OF date, {metric_list} ON mood_entries BEGIN{rollup_upsert_sql('OLD', -1)}{rollup_upsert_sql('NEW', 1)}
+            {BUMP_CHANGE_COUNTER}
+        END
+    ''')
+
+
+def drop_rollup_triggers(cursor):
+    """Drop the rollup triggers, e.g. while a bulk load updates rollups itself"""
+    for name in ROLLUP_TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def migrate_rollups(cursor):
+    """v3: incrementally maintained rollups for the Insights tab"""
+    metric_columns = ''.join(f'''
+            {prefix}_sum REAL NOT NULL DEFAULT 0,
+            {prefix}_sq REAL NOT NULL DEFAULT 0,
+            {prefix}_count INTEGER NOT NULL DEFAULT 0,''' for prefix in ROLLUP_METRICS)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS mood_rollups (
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            entries INTEGER NOT NULL DEFAULT 0,{metric_columns}
+            PRIMARY KEY (period, bucket)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sleep_buckets (
+            bucket INTEGER PRIMARY KEY,
+            entries INTEGER NOT NULL DEFAULT 0,
+            mood_sum REAL NOT NULL DEFAULT 0,
+            mood_sq REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO change_counter (id, value) VALUES (1, 0)')
+    
+    create_rollup_triggers(cursor)
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS goals_change_{event.lower()}
+            AFTER {event} ON goals BEGIN
+                {BUMP_CHANGE_COUNTER}
+            END
+        ''')
+    
+    # Backfill from existing entries
+    for statement in rollup_apply_sql('mood_entries', 1):
+        cursor.execute(statement)
+
+
+def migrate_rollup_triggers(cursor):
+    """v4: rollup triggers only clean up the buckets they touched and skip
+    dates without a bucket"""
+    drop_rollup_triggers(cursor)
+    create_rollup_triggers(cursor)
+
+
+# Free-text columns indexed for search
+SEARCH_COLUMNS = ('notes', 'activities', 'triggers', 'medications')
+
+
+def fts5_available(cursor):
+    """Whether this SQLite build includes the FTS5 extension"""
+    try:
+        cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+    except sqlite3.OperationalError:
+        return False
+    cursor.execute('DROP TABLE temp.fts5_probe')
+    return True
+
+
+def has_search_index(cursor):
+    """Whether the FTS5 search index exists in this database"""
+    return cursor.execute('''
+        SELECT 1 FROM sqlite_master WHERE name = 'mood_entries_fts'
+    ''').fetchone() is not None
+
+
+def migrate_search_index(cursor):
+    """v5: FTS5 index over the free-text columns, kept in sync by triggers.
+    
+    Skipped on SQLite builds without FTS5; search_entries then falls back to
+    LIKE scans until run_migrations finds FTS5 available and creates it.
+    """
+    if fts5_available(cursor):
+        create_search_index(cursor)
+
+
+def create_search_index(cursor):
+    """Create the FTS5 index and its triggers, then fill it from mood_entries"""
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'NEW.{c}' for c in SEARCH_COLUMNS)
+    old_values = ', '.join(f'OLD.{c}' for c in SEARCH_COLUMNS)
+    # External content table: the index stores only tokens, not a second copy
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS mood_entries_fts USING fts5(
+            {columns}, content='mood_entries', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS mood_entries_fts_insert
+        AFTER INSERT ON mood_entries BEGIN
+            INSERT INTO mood_entries_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS mood_entries_fts_delete
+        AFTER DELETE ON mood_entries BEGIN
+            INSERT INTO mood_entries_fts (mood_entries_fts, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS mood_entries_fts_update
+        AFTER UPDATE OF {columns} ON mood_entries BEGIN
+            INSERT INTO mood_entries_fts (mood_entries_fts, rowid, {columns})
+            VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO mood_entries_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+    cursor.execute("INSERT INTO mood_entries_fts (mood_entries_fts) VALUES ('rebuild')")
+
+
+# Tag kinds -> mood_entries column holding them as comma-separated text
+TAG_KINDS = {
+    'activity': 'activities',
+    'trigger': 'triggers',
+    'medication': 'medications',
+}
+
+
+def split_tags(text):
+    """Split comma-separated tag text into unique, trimmed names"""
+    names = []
+    seen = set()
+    for name in (text or '').split(','):
+        name = ' '.join(name.split())
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def write_entry_tags(cursor, rows, tag_cache=None):
+    """Replace the junction rows for (entry_id, activities, triggers, medications) rows.
+    
+    New tag names are added to the tags dictionary. `tag_cache` maps
+    (kind, lower-case name) to tag id and can be shared across calls.
+    """
+    tag_cache = {} if tag_cache is None else tag_cache
+    links = []
+    entry_ids = []
+    
+    for row in rows:
+        entry_id = row[0]
+        entry_ids.append((entry_id,))
+        for kind, text in zip(TAG_KINDS, row[1:]):
+            for name in split_tags(text):
+                key = (kind, name.lower())
+                tag_id = tag_cache.get(key)
+                if tag_id is None:
+                    cursor.execute('INSERT OR IGNORE INTO tags (kind, name) VALUES (?, ?)',
+                                   (kind, name))
+                    tag_id = cursor.execute('SELECT id FROM tags WHERE kind = ? AND name = ?',
+                                            (kind, name)).fetchone()[0]
+                    tag_cache[key] = tag_id
+                links.append((entry_id, tag_id))
+    
+    cursor.executemany('DELETE FROM entry_tags WHERE entry_id = ?', entry_ids)
+    cursor.executemany('INSERT OR IGNORE INTO entry_tags (entry_id, tag_id) VALUES (?, ?)', links)
+
+
+def migrate_tags(cursor):
+    """v6: tag dictionary and entry-tag junction tables"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL COLLATE NOCASE,
+            UNIQUE (kind, name)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS entry_tags (
+            entry_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (entry_id, tag_id)
+        ) WITHOUT ROWID
+    ''')
+    # Tag -> entries lookups, e.g. every day with a given activity
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_entry_tags_tag
+        ON entry_tags (tag_id, entry_id)
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS mood_entries_tags_delete
+        AFTER DELETE ON mood_entries BEGIN
+            DELETE FROM entry_tags WHERE entry_id = OLD.id;
+        END
+    ''')
+    
+    # One-time split of the existing comma-separated columns
+    tag_cache = {}
+    rows = cursor.connection.execute('''
+        SELECT id, activities, triggers, medications FROM mood_entries
+    ''')
+    while True:
+        batch = rows.fetchmany(EXPORT_BATCH_SIZE)
+        if not batch:
+            break
+        write_entry_tags(cursor, batch, tag_cache)
+
+
+# Random id for a new goal or tracker instance
+RANDOM_ID_SQL = 'lower(hex(randomblob(16)))'
+
+# Columns whose changes are recorded in the change log, per synced table, as of v7.
+# Frozen: a migration adding synced columns recreates the update trigger with its own list
+CHANGE_LOG_COLUMNS = {
+    'mood_entries': ('date', 'mood_score', 'energy_level', 'sleep_hours', 'stress_level',
+                     'anxiety_level', 'notes', 'activities', 'triggers', 'medications'),
+    'goals': ('uid', 'title', 'description', 'target_date', 'completed'),
+}
+
+# Column identifying a synced row across databases
+CHANGE_LOG_KEYS = {'mood_entries': 'date', 'goals': 'uid'}
+
+
+def create_change_log_triggers(cursor, tables):
+    """Create the triggers recording changes in change_log; `tables` maps each
+    table to the columns whose changes are recorded"""
+    for table, columns in tables.items():
+        key = CHANGE_LOG_KEYS[table]
+        changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in columns)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_change_log_insert
+            AFTER INSERT ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', NEW.{key}, 'upsert');
+            END
+        ''')
+        # Upserts that change nothing aren't logged, so re-importing a file is not a change
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_change_log_update
+            AFTER UPDATE ON {table} WHEN {changed} BEGIN
+                INSERT INTO change_log (table_name, row_key, op)
+                SELECT '{table}', OLD.{key}, 'delete' WHERE OLD.{key} IS NOT NEW.{key};
+                INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', NEW.{key}, 'upsert');
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_change_log_delete
+            AFTER DELETE ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_key, op) VALUES ('{table}', OLD.{key}, 'delete');
+            END
+        ''')
+
+
+def migrate_change_log(cursor):
+    """v7: append-only change log, sync identity and peers, and stable goal ids"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+            origin TEXT
+        )
+    ''')
+    # Latest change of a row, for conflict resolution
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_change_log_row
+        ON change_log (table_name, row_key, seq)
+    ''')
+    cursor.execute('CREATE TABLE IF NOT EXISTS sync_identity (instance_id TEXT NOT NULL)')
+    cursor.execute(f'''
+        INSERT INTO sync_identity SELECT {RANDOM_ID_SQL}
+        WHERE NOT EXISTS (SELECT 1 FROM sync_identity)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            peer_id TEXT PRIMARY KEY,
+            received_seq INTEGER NOT NULL DEFAULT 0,
+            synced_at TEXT
+        )
+    ''')
+    
+    # Goal ids are local; synced goals are matched on uid
+    cursor.execute('ALTER TABLE goals ADD COLUMN uid TEXT')
+    cursor.execute(f'UPDATE goals SET uid = {RANDOM_ID_SQL}')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_goals_uid ON goals (uid)')
+    
+    create_change_log_triggers(cursor, CHANGE_LOG_COLUMNS)
+    
+    # Existing rows count as changes made here, so the first sync sends them
+    for table, key in CHANGE_LOG_KEYS.items():
+        cursor.execute(f'''
+            INSERT INTO change_log (table_name, row_key, op)
+            SELECT '{table}', {key}, 'upsert' FROM {table} ORDER BY {key}
+        ''')
+
+
+def migrate_alerts(cursor):
+    """v8: anomaly detector state and the alerts it raises"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS anomaly_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            state TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            value REAL,
+            expected REAL,
+            score REAL,
+            message TEXT NOT NULL,
+            dismissed INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_alerts_dismissed_date
+        ON alerts (dismissed, date)
+    ''')
+
+
+def migrate_goal_metrics(cursor):
+    """v9: goals defined against a metric, and their progress accumulators"""
+    cursor.execute('ALTER TABLE goals ADD COLUMN kind TEXT')
+    cursor.execute('ALTER TABLE goals ADD COLUMN metric TEXT')
+    cursor.execute('ALTER TABLE goals ADD COLUMN comparison TEXT')
+    cursor.execute('ALTER TABLE goals ADD COLUMN target REAL')
+    cursor.execute('ALTER TABLE goals ADD COLUMN window_days INTEGER')
+    cursor.execute('ALTER TABLE goals ADD COLUMN start_date TEXT')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goal_progress (
+            goal_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            value REAL,
+            logged INTEGER,
+            progress REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS goals_progress_delete
+        AFTER DELETE ON goals BEGIN
+            DELETE FROM goal_progress WHERE goal_id = OLD.id;
+        END
+    ''')
+    
+    # The definitions are synced too, so the change log covers the new columns
+    cursor.execute('DROP TRIGGER IF EXISTS goals_change_log_update')
+    create_change_log_triggers(cursor, {
+        'goals': CHANGE_LOG_COLUMNS['goals']
+        + ('kind', 'metric', 'comparison', 'target', 'window_days', 'start_date'),
+    })
+
+
+@traced()
+def fetch_rollups(conn, period, since=None):
+    """Fetch (bucket, entries, mean, stddev per metric...) rows for a period.
+    
+    Means and standard deviations are derived from the stored sums and sums of
+    squares, so the cost depends on the number of buckets, not entries.
+    """
+    rows = conn.execute('''
+        SELECT * FROM mood_rollups WHERE period = ? AND bucket >= ?
+        ORDER BY bucket
+    ''', (period, since or '')).fetchall()
+    
+    result = []
+    for row in rows:
+        values = [row[1], row[2]]
+        for i in range(len(ROLLUP_METRICS)):
+            total, squares, count = row[3 + i * 3:6 + i * 3]
+            if count:
+                mean = total / count
+                values += [mean, max(squares / count - mean * mean, 0) ** 0.5]
+            else:
+                values += [None, None]
+        result.append(tuple(values))
+    return result
+
+
+def normalize_entry_dates(cursor):
+    """v10: entry dates saved without zero padding, e.g. 2024-3-5, rewritten as ISO.
+    
+    Older versions validated dates with strptime, which accepts them, but
+    the rollups have no week bucket for them. Where a rewritten date
+    collides with another entry the newest is kept and the rest moved
+    aside, as in v2; dates that don't parse at all are moved aside too.
+    """
+    rows = cursor.execute('''
+        SELECT id, date FROM mood_entries
+        WHERE date IS NULL OR date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+    ''').fetchall()
+    aside = []
+    targets = {}
+    for entry_id, date in rows:
+        try:
+            date = datetime.datetime.strptime(date.strip(), "%Y-%m-%d").date().isoformat()
+        except (AttributeError, ValueError):
+            aside.append(entry_id)
+            continue
+        targets.setdefault(date, []).append(entry_id)
+    
+    renames = []
+    for date, entry_ids in targets.items():
+        existing = cursor.execute('SELECT id FROM mood_entries WHERE date = ?', (date,)).fetchone()
+        candidates = entry_ids + ([existing[0]] if existing else [])
+        newest = max(candidates)
+        aside.extend(i for i in candidates if i != newest)
+        if newest in entry_ids:
+            renames.append((date, newest))
+    
+    cursor.executemany('''
+        INSERT INTO mood_entries_duplicates SELECT * FROM mood_entries WHERE id = ?
+    ''', [(i,) for i in aside])
+    cursor.executemany('DELETE FROM mood_entries WHERE id = ?', [(i,) for i in aside])
+    cursor.executemany('UPDATE mood_entries SET date = ? WHERE id = ?', renames)
+
+
+# Applied in order; the list position + 1 is the resulting user_version
+MIGRATIONS = [
+    migrate_create_tables,
+    migrate_date_indexes,
+    migrate_rollups,
+    migrate_rollup_triggers,
+    migrate_search_index,
+    migrate_tags,
+    migrate_change_log,
+    migrate_alerts,
+    migrate_goal_metrics,
+    normalize_entry_dates,
+]
+
+
+# Connection pragma profiles. "tuned" suits the app's many small journaling
+# writes: WAL with synchronous=NORMAL only fsyncs at checkpoints, and reads
+# come from a larger page cache and the memory map. "safe" keeps SQLite's
+# rollback journal and full fsyncs, e.g. for databases on network drives.
+CONNECTION_PROFILES = {
+    'tuned': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16384,  # negative means KiB, so 16 MiB
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'wal_autocheckpoint': 1000,
+        'busy_timeout': 5000,
+    },
+    'safe': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+}
+DEFAULT_PROFILE = 'tuned'
+
+# Pragmas reported by active_pragmas()
+REPORTED_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size',
+                    'temp_store', 'wal_autocheckpoint', 'busy_timeout', 'page_size')
+
+# Seconds of worker idle time between checkpoint/optimize passes
+MAINTENANCE_INTERVAL = 300
+
+# Write jobs are committed together once the worker has seen no new write for
+# GROUP_COMMIT_DELAY seconds, and at the latest GROUP_COMMIT_MAX_DELAY after
+# the first write of the batch
+GROUP_COMMIT_DELAY = 0.05
+GROUP_COMMIT_MAX_DELAY = 0.5
+
+
+def connect(db_path=DB_PATH, profile=DEFAULT_PROFILE, check_same_thread=True):
+    """Open a connection and apply a connection pragma profile.
+    
+    Pass check_same_thread=False for connections handed between threads, such
+    as pooled ones; the caller must then make sure only one thread uses the
+    connection at a time.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread,
+                           factory=TracedConnection)
+    for name, value in CONNECTION_PROFILES[profile].items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def open_database(db_path=DB_PATH, profile=DEFAULT_PROFILE):
+    """Open a connection to the tracker database with an up to date schema"""
+    conn = connect(db_path, profile)
+    run_migrations(conn)
+    return conn
+
+
+def active_pragmas(conn):
+    """Return the current value of each tuning pragma on a connection"""
+    synchronous = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+    temp_store = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+    values = {}
+    for name in REPORTED_PRAGMAS:
+        value = conn.execute(f'PRAGMA {name}').fetchone()[0]
+        if name == 'synchronous':
+            value = synchronous.get(value, value)
+        elif name == 'temp_store':
+            value = temp_store.get(value, value)
+        values[name] = value
+    return values
+
+
+def run_maintenance(conn, closing=False):
+    """Checkpoint the WAL and let SQLite refresh its planner statistics.
+    
+    When closing, the WAL is also truncated so the -wal file stays small
+    between sessions. optimize runs first, as the statistics it writes
+    would otherwise go into a fresh WAL after the checkpoint.
+    """
+    conn.execute('PRAGMA optimize')
+    mode = 'TRUNCATE' if closing else 'PASSIVE'
+    conn.execute(f'PRAGMA wal_checkpoint({mode})')
+
+
+def run_migrations(conn):
+    """Apply any pending migrations, each in its own transaction"""
+    cursor = conn.cursor()
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            cursor.execute('BEGIN')
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    # v5 was skipped by a build without FTS5: create the index once one has it
+    if not has_search_index(cursor) and fts5_available(cursor):
+        try:
+            cursor.execute('BEGIN')
+            create_search_index(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+# Entry columns in the order the form and importers supply them
+ENTRY_COLUMNS = ('date', 'mood_score', 'energy_level', 'sleep_hours', 'stress_level',
+                 'anxiety_level', 'notes', 'activities', 'triggers', 'medications')
+
+# CSV export header and the entry columns written under it
+CSV_HEADER = ['Date', 'Mood Score', 'Energy Level', 'Sleep Hours',
+              'Stress Level', 'Anxiety Level', 'Activities',
+              'Triggers', 'Medications', 'Notes']
+CSV_COLUMNS = ('date', 'mood_score', 'energy_level', 'sleep_hours', 'stress_level',
+               'anxiety_level', 'activities', 'triggers', 'medications', 'notes')
+
+# Rows fetched per batch by the streaming exporters; also how often they
+# check for cancellation and report progress
+EXPORT_BATCH_SIZE = 1000
+
+
+# Conflict clause replacing an existing entry for the same date
+UPSERT_ON_CONFLICT = '''
+    ON CONFLICT(date) DO UPDATE SET
+        mood_score = excluded.mood_score,
+        energy_level = excluded.energy_level,
+        sleep_hours = excluded.sleep_hours,
+        stress_level = excluded.stress_level,
+        anxiety_level = excluded.anxiety_level,
+        notes = excluded.notes,
+        activities = excluded.activities,
+        triggers = excluded.triggers,
+        medications = excluded.medications
+'''
+# Insert an ENTRY_COLUMNS tuple, replacing any existing entry for that date
+UPSERT_ENTRY_SQL = '''
+    INSERT INTO mood_entries 
+    (date, mood_score, energy_level, sleep_hours, stress_level, 
+     anxiety_level, notes, activities, triggers, medications)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+''' + UPSERT_ON_CONFLICT
+
+
+# Columnar entry caches per database file: path -> EntryCache
+entry_caches = {}
+entry_caches_lock = threading.Lock()
+
+
+def entry_cache(conn, load=True):
+    """Return an EntryCache matching the current contents of `conn`'s database.
+    
+    The cache is loaded on first use and reused until the change counter
+    shows a write it did not see. With load=False, returns None rather than
+    loading. In-memory databases get a fresh, unshared cache each time.
+    """
+    path, version = data_version(conn)
+    with entry_caches_lock:
+        cache = entry_caches.get(path)
+        if path and cache is not None and cache.version == version:
+            return cache
+        if not load:
+            return None
+        with span('db', 'entry_cache_load') as s:
+            cache = EntryCache.load(conn, version)
+            s.rows = len(cache)
+        if path:
+            entry_caches[path] = cache
+        return cache
+
+
+def write_through(conn, version_before, apply):
+    """Apply a committed change to the cached entries with `apply(cache)`.
+    
+    `version_before` is the change counter read before the write. If the
+    cache was already behind it, another connection wrote in between, so the
+    cache is dropped and reloaded on next use instead.
+    """
+    path, version = data_version(conn)
+    with entry_caches_lock:
+        cache = entry_caches.get(path)
+        if cache is None:
+            return
+        if cache.version == version_before:
+            apply(cache)
+            cache.version = version
+        else:
+            del entry_caches[path]
+
+
+def drop_entry_cache(conn):
+    """Forget the cached entries of `conn`'s database, e.g. after a rollback
+    undid changes that were already written through"""
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    with entry_caches_lock:
+        entry_caches.pop(path, None)
+
+
+# Next-day mood models per database file: path -> MoodModel
+mood_models = {}
+mood_models_lock = threading.Lock()
+
+# Entries a model is trained on when it has to be rebuilt from the database
+MODEL_BOOTSTRAP_ENTRIES = 3 * 365
+
+# Columns the forecast features are built from
+FORECAST_COLUMNS = ('date',) + tuple(NUMERIC_FEATURES) + tuple(TAG_KINDS.values())
+
+
+def mood_model_path(path):
+    """Where the mood model of a database file is stored"""
+    return path + '.mood-model.json'
+
+
+def forecast_features(row, target_date):
+    """Features predicting `target_date` from a FORECAST_COLUMNS row"""
+    entry = dict(zip(FORECAST_COLUMNS, row))
+    tags = [(kind, name) for kind, column in TAG_KINDS.items()
+            for name in split_tags(entry[column])]
+    return features(entry, tags, target_date)
+
+
+def next_day(date):
+    return (datetime.date.fromisoformat(date) + datetime.timedelta(days=1)).isoformat()
+
+
+def forecast_examples(rows):
+    """(features, next-day mood) pairs from date-ordered FORECAST_COLUMNS rows"""
+    previous = None
+    for row in rows:
+        if previous is not None and row[1] is not None and next_day(previous[0]) == row[0]:
+            yield forecast_features(previous, row[0]), row[1]
+        previous = row
+
+
+def mood_model(conn):
+    """Return the MoodModel for `conn`'s database.
+    
+    The stored model is used while its change counter matches the
+    database's; otherwise (first use, an import, a write from another
+    program) it is retrained on the last MODEL_BOOTSTRAP_ENTRIES entries.
+    In-memory databases get a fresh, unstored model each time.
+    """
+    path, version = data_version(conn)
+    with mood_models_lock:
+        model = mood_models.get(path)
+        if model is None and path:
+            model = MoodModel.load(mood_model_path(path))
+        if model is None or model.version != version:
+            model = MoodModel(version)
+            rows = conn.execute(f'''
+                SELECT * FROM (
+                    SELECT {', '.join(FORECAST_COLUMNS)} FROM mood_entries
+                    ORDER BY date DESC LIMIT ?
+                ) ORDER BY date
+            ''', (MODEL_BOOTSTRAP_ENTRIES,))
+            for x, y in forecast_examples(rows):
+                model.update(x, y)
+            if path and not conn.in_transaction:
+                model.save(mood_model_path(path))
+        if path:
+            mood_models[path] = model
+        return model
+
+
+def train_mood_model(conn, version_before, dates=()):
+    """Teach the stored mood model the examples completed by saving `dates`.
+    
+    Each saved day is an input for the next day and a target for the
+    previous one. Examples aren't unlearnt when an entry is replaced or
+    deleted; the model only moves on to the new change counter. A model
+    that was already behind is left for mood_model() to rebuild.
+    
+    The model is only stored once the saves are committed; inside an open
+    transaction (the worker's group commit) save_mood_model() stores it.
+    """
+    path, version = data_version(conn)
+    if not path:
+        return
+    with mood_models_lock:
+        model = mood_models.get(path) or MoodModel.load(mood_model_path(path))
+        if model is None or model.version != version_before:
+            return
+        for date in dates:
+            rows = conn.execute(f'''
+                SELECT {', '.join(FORECAST_COLUMNS)} FROM mood_entries
+                WHERE date BETWEEN date(?, '-1 day') AND date(?, '+1 day') ORDER BY date
+            ''', (date, date))
+            for x, y in forecast_examples(rows):
+                model.update(x, y)
+        model.version = version
+        mood_models[path] = model
+        if not conn.in_transaction:
+            model.save(mood_model_path(path))
+
+
+def save_mood_model(conn):
+    """Store the mood model of `conn`'s database if it is up to date with
+    what was just committed"""
+    path, version = data_version(conn)
+    with mood_models_lock:
+        model = mood_models.get(path)
+        if path and model is not None and model.version == version:
+            model.save(mood_model_path(path))
+
+
+def drop_mood_model(conn):
+    """Forget the in-memory mood model of `conn`'s database, e.g. after a
+    rollback undid the saves it learnt; the stored one is still valid"""
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    with mood_models_lock:
+        mood_models.pop(path, None)
+
+
+@traced()
+def forecast_mood(conn):
+    """Forecast the mood of the day after the latest entry.
+    
+    Returns a dict with the date, predicted mood, whether it looks like a
+    low day and the typical error so far, or None until the model has
+    enough examples.
+    """
+    model = mood_model(conn)
+    row = conn.execute(f'''
+        SELECT {', '.join(FORECAST_COLUMNS)} FROM mood_entries ORDER BY date DESC LIMIT 1
+    ''').fetchone()
+    if row is None or not model.ready():
+        return None
+    target = next_day(row[0])
+    mood = model.predict(forecast_features(row, target))
+    return {
+        'date': target,
+        'mood': mood,
+        'low': mood <= LOW_MOOD,
+        'rmse': model.rmse(),
+        'examples': model.examples,
+    }
+
+
+def load_detector(conn):
+    """The stored AnomalyDetector, or None if there is no usable one"""
+    row = conn.execute('SELECT version, state FROM anomaly_state').fetchone()
+    if row is None:
+        return None
+    try:
+        detector = AnomalyDetector.from_dict(json.loads(row[1]))
+    except (ValueError, KeyError, TypeError):
+        return None
+    detector.version = row[0]
+    return detector
+
+
+def store_detector(conn, detector, version):
+    detector.version = version
+    conn.execute('INSERT OR REPLACE INTO anomaly_state (id, version, state) VALUES (1, ?, ?)',
+                 (version, json.dumps(detector.to_dict())))
+
+
+def rebuild_detector(conn, exclude_date=None):
+    """A detector fed every entry in date order, without raising alerts"""
+    detector = AnomalyDetector()
+    rows = conn.execute(f'''
+        SELECT date, {', '.join(ANOMALY_METRICS)} FROM mood_entries
+        WHERE date IS NOT ? ORDER BY date
+    ''', (exclude_date,))
+    for row in rows:
+        detector.update(row[0], dict(zip(ANOMALY_METRICS, row[1:])))
+    return detector
+
+
+def detect_anomalies(conn, version_before, entry, previous):
+    """Update the anomaly detector with a saved entry and store its alerts.
+    
+    Runs inside the save's transaction. `previous` holds the ANOMALY_METRICS
+    values the entry replaced, if any. When the stored state doesn't match
+    `version_before` (first save, an import, a sync) it is rebuilt from the
+    other entries first. Returns the new alerts.
+    """
+    date = entry[0]
+    detector = load_detector(conn)
+    if detector is None or detector.version != version_before:
+        detector = rebuild_detector(conn, exclude_date=date)
+        previous = None
+    values = dict(zip(ENTRY_COLUMNS, entry))
+    if previous is not None:
+        previous = dict(zip(ANOMALY_METRICS, previous))
+    alerts = detector.update(date, values, previous)
+    store_detector(conn, detector, data_version(conn)[1])
+    
+    # Alerts about the replaced values no longer apply
+    conn.execute('DELETE FROM alerts WHERE date = ? AND NOT dismissed', (date,))
+    conn.executemany('''
+        INSERT INTO alerts (date, metric, kind, value, expected, score, message)
+        VALUES (:date, :metric, :kind, :value, :expected, :score, :message)
+    ''', alerts)
+    return alerts
+
+
+def forget_anomalies(conn, version_before, rows):
+    """Take deleted (date, ANOMALY_METRICS...) rows out of the detector"""
+    conn.executemany('DELETE FROM alerts WHERE date = ? AND NOT dismissed',
+                     [(row[0],) for row in rows])
+    detector = load_detector(conn)
+    if detector is None or detector.version != version_before:
+        return
+    for row in rows:
+        detector.remove(dict(zip(ANOMALY_METRICS, row[1:])))
+    store_detector(conn, detector, data_version(conn)[1])
+
+
+# Undismissed alerts listed in the Insights report
+INSIGHTS_ALERTS = 5
+
+# Alert columns returned by fetch_alerts()
+ALERT_FIELDS = ('id', 'date', 'metric', 'kind', 'value', 'expected', 'score', 'message',
+                'dismissed')
+
+
+@traced()
+def fetch_alerts(conn, include_dismissed=False, date=None, limit=HISTORY_PAGE_SIZE):
+    """Alerts as dicts, newest entry date first"""
+    rows = conn.execute(f'''
+        SELECT {', '.join(ALERT_FIELDS)} FROM alerts
+        WHERE (? OR NOT dismissed) AND (? IS NULL OR date = ?)
+        ORDER BY date DESC, id LIMIT ?
+    ''', (include_dismissed, date, date, limit)).fetchall()
+    return [dict(zip(ALERT_FIELDS, row)) for row in rows]
+
+
+def dismiss_alerts(conn, alert_ids, commit=True):
+    """Hide alerts from fetch_alerts() unless dismissed ones are asked for"""
+    conn.executemany('UPDATE alerts SET dismissed = 1 WHERE id = ?', [(i,) for i in alert_ids])
+    # Alerts don't bump the change counter, so the cached report must go
+    insights_cache.pop(data_version(conn)[0], None)
+    if commit:
+        conn.commit()
+
+
+@traced()
+def upsert_entry(conn, entry, commit=True):
+    """Insert an entry, replacing any existing entry for the same date.
+    
+    Returns the id of the stored row. With commit=False the change is left in
+    the open transaction for the caller (usually the worker's group commit).
+    """
+    version_before = data_version(conn)[1]
+    cursor = conn.cursor()
+    previous = cursor.execute(f'''
+        SELECT {', '.join(ANOMALY_METRICS)} FROM mood_entries WHERE date = ?
+    ''', (entry[0],)).fetchone()
+    cursor.execute(UPSERT_ENTRY_SQL, entry)
+    
+    cursor.execute('SELECT id, created_at FROM mood_entries WHERE date = ?', (entry[0],))
+    entry_id, created_at = cursor.fetchone()
+    write_entry_tags(cursor, [(entry_id, entry[7], entry[8], entry[9])])
+    track_goals(conn, version_before, entry)
+    detect_anomalies(conn, version_before, entry, previous)
+    if commit:
+        conn.commit()
+    write_through(conn, version_before,
+                  lambda cache: cache.upsert(entry_id, entry, created_at))
+    train_mood_model(conn, version_before, [entry[0]])
+    return entry_id
+
+
+@traced()
+def fetch_history_page(conn, before_date=None, limit=HISTORY_PAGE_SIZE):
+    """Fetch up to `limit` entries older than `before_date`, newest first.
+    
+    Served from the entry cache when it is loaded and current.
+    """
+    cache = entry_cache(conn, load=False)
+    if cache is not None:
+        return cache.history_page(before_date, limit)
+    if before_date is not None:
+        return conn.execute('''
+            SELECT id, date, mood_score, energy_level, sleep_hours, stress_level,
+                   anxiety_level, notes FROM mood_entries
+            WHERE date < ? ORDER BY date DESC LIMIT ?
+        ''', (before_date, limit)).fetchall()
+    return conn.execute('''
+        SELECT id, date, mood_score, energy_level, sleep_hours, stress_level,
+               anxiety_level, notes FROM mood_entries
+        ORDER BY date DESC LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+# Markers placed around matched terms in search snippets
+SNIPPET_START = '«'
+SNIPPET_END = '»'
+
+
+def build_fts_query(text):
+    """Turn free user input into a safe FTS5 query.
+    
+    Words are matched as terms (all must appear), "quoted text" as a phrase
+    and a trailing * as a prefix, e.g.  run* "bad sleep" work
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase.strip():
+            terms.append('"' + phrase.replace('"', '') + '"')
+        elif word:
+            prefix = word.endswith('*')
+            word = word.rstrip('*').replace('"', '')
+            if word:
+                terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+@traced()
+def search_entries(conn, text, limit=HISTORY_PAGE_SIZE):
+    """Search notes, activities, triggers and medications.
+    
+    Returns history-shaped rows (id, date, scores..., snippet), best matches
+    first, with matched terms wrapped in SNIPPET_START/SNIPPET_END.
+    """
+    query = build_fts_query(text)
+    if not query:
+        return []
+    
+    if has_search_index(conn):
+        return conn.execute('''
+            SELECT e.id, e.date, e.mood_score, e.energy_level, e.sleep_hours,
+                   e.stress_level, e.anxiety_level,
+                   snippet(mood_entries_fts, -1, ?, ?, '...', 10)
+            FROM mood_entries_fts
+            JOIN mood_entries e ON e.id = mood_entries_fts.rowid
+            WHERE mood_entries_fts MATCH ?
+            ORDER BY rank LIMIT ?
+        ''', (SNIPPET_START, SNIPPET_END, query, limit)).fetchall()
+    
+    # No FTS5 in this SQLite build: every word must appear in some column
+    words = [w.strip('"*') for w in re.findall(r'"[^"]*"|\S+', text)]
+    words = [w for w in words if w]
+    if not words:
+        return []
+    conditions = ' AND '.join(
+        '(' + ' OR '.join(f"{c} LIKE ?" for c in SEARCH_COLUMNS) + ')' for _ in words)
+    params = [f'%{w}%' for w in words for _ in SEARCH_COLUMNS]
+    return conn.execute(f'''
+        SELECT id, date, mood_score, energy_level, sleep_hours, stress_level,
+               anxiety_level, notes FROM mood_entries
+        WHERE {conditions} ORDER BY date DESC LIMIT ?
+    ''', params + [limit]).fetchall()
+
+
+def delete_entry_by_id(conn, entry_id, commit=True):
+    """Delete a single mood entry"""
+    delete_entries(conn, [entry_id], commit)
+
+
+@traced()
+def delete_entries(conn, entry_ids, commit=True):
+    """Delete several mood entries in one transaction"""
+    entry_ids = list(entry_ids)
+    version_before = data_version(conn)[1]
+    deleted, dates = [], {}
+    for entry_id in entry_ids:
+        for row in conn.execute(f'''
+            SELECT date, {', '.join(ANOMALY_METRICS)} FROM mood_entries WHERE id = ?
+        ''', (entry_id,)):
+            deleted.append(row)
+            dates[entry_id] = row[0]
+    conn.executemany('DELETE FROM mood_entries WHERE id = ?', [(i,) for i in entry_ids])
+    untrack_goals(conn, version_before, [row[0] for row in deleted])
+    forget_anomalies(conn, version_before, deleted)
+    if commit:
+        conn.commit()
+    
+    def apply(cache):
+        for entry_id, date in dates.items():
+            cache.delete(entry_id, date)
+    
+    write_through(conn, version_before, apply)
+    train_mood_model(conn, version_before)
+
+
+def goal_spec(values):
+    """A goal dict from GOAL_SPEC_FIELDS values, or None for goals without a
+    metric (or with a definition that doesn't check out, e.g. from a sync)"""
+    if values[0] is None:
+        return None
+    try:
+        spec = check_goal(*values[:5])
+        datetime.date.fromisoformat(values[5])
+    except (ValueError, TypeError):
+        return None
+    return dict(zip(GOAL_SPEC_FIELDS, spec + (values[5],)))
+
+
+def goal_value(goal, entry):
+    """What an entry (dict of ENTRY_COLUMNS values) adds to a goal's window"""
+    if goal['kind'] == 'count':
+        names = {name.lower() for name in split_tags(entry['activities'])}
+        return 1 if goal['metric'].lower() in names else None
+    return entry[goal['metric']]
+
+
+def load_goal_progress(conn):
+    """(goal id, goal, stored GoalProgress or None) for each open metric goal"""
+    rows = conn.execute(f'''
+        SELECT g.id, {', '.join('g.' + f for f in GOAL_SPEC_FIELDS)}, p.version, p.state
+        FROM goals g LEFT JOIN goal_progress p ON p.goal_id = g.id
+        WHERE g.kind IS NOT NULL AND NOT g.completed
+    ''').fetchall()
+    goals = []
+    for row in rows:
+        goal = goal_spec(row[1:7])
+        if goal is None:
+            continue
+        progress = None
+        if row[8] is not None:
+            try:
+                progress = GoalProgress.from_dict(json.loads(row[8]), goal)
+                progress.version = row[7]
+            except (ValueError, KeyError, TypeError):
+                pass
+        goals.append((row[0], goal, progress))
+    return goals
+
+
+def rebuild_goal_progress(conn, goal):
+    """A goal's accumulator fed from the entries in its window"""
+    progress = GoalProgress(goal)
+    end = conn.execute('SELECT MAX(date) FROM mood_entries').fetchone()[0]
+    if end is None or end < goal['start_date']:
+        return progress
+    progress.end = end
+    column = 'activities' if goal['kind'] == 'count' else goal['metric']
+    rows = conn.execute(f'''
+        SELECT date, {column} FROM mood_entries WHERE date >= ? ORDER BY date
+    ''', (progress.window_start(),))
+    for date, value in rows:
+        progress.update(date, goal_value(goal, {column: value}))
+    return progress
+
+
+def keep_goal_progress(conn, version_before):
+    """Move the goal states that were current at `version_before` on to the
+    change counter, after a write that changed goals but no entries"""
+    conn.execute('UPDATE goal_progress SET version = ? WHERE version = ?',
+                 (data_version(conn)[1], version_before))
+
+
+def save_goal_progress(conn, tracked):
+    """Complete the met goals among (goal id, GoalProgress) pairs and store
+    every accumulator; returns the ids of the completed goals"""
+    version_before = data_version(conn)[1]
+    evaluated = [(goal_id, progress, progress.evaluate()) for goal_id, progress in tracked]
+    met = [goal_id for goal_id, _, result in evaluated if result[3]]
+    if met:
+        conn.executemany('UPDATE goals SET completed = 1 WHERE id = ?', [(i,) for i in met])
+        keep_goal_progress(conn, version_before)
+    version = data_version(conn)[1]
+    conn.executemany('''
+        INSERT OR REPLACE INTO goal_progress (goal_id, version, state, value, logged, progress)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(goal_id, version, json.dumps(progress.to_dict()), value, logged, fraction)
+          for goal_id, progress, (value, logged, fraction, _) in evaluated])
+    return met
+
+
+def track_goals(conn, version_before, entry):
+    """Add a saved entry to every open metric goal's window.
+    
+    Runs inside the save's transaction, after the entry is written. Goals
+    whose stored state doesn't match `version_before` (new goals, an
+    import, a sync) are rebuilt from their window instead. Goals the entry
+    meets are completed; returns their ids.
+    """
+    values = dict(zip(ENTRY_COLUMNS, entry))
+    tracked = []
+    for goal_id, goal, progress in load_goal_progress(conn):
+        if progress is None or progress.version != version_before:
+            progress = rebuild_goal_progress(conn, goal)
+        else:
+            progress.update(entry[0], goal_value(goal, values))
+        tracked.append((goal_id, progress))
+    return save_goal_progress(conn, tracked)
+
+
+def untrack_goals(conn, version_before, dates):
+    """Take deleted entry dates out of every open metric goal's window"""
+    tracked = []
+    for goal_id, goal, progress in load_goal_progress(conn):
+        if (progress is None or progress.version != version_before
+                or not all(progress.remove(date) for date in dates)):
+            progress = rebuild_goal_progress(conn, goal)
+        tracked.append((goal_id, progress))
+    return save_goal_progress(conn, tracked)
+
+
+@traced()
+def insert_goal(conn, title, description, target_date, kind=None, metric=None, comparison='>=',
+                target=None, window_days=None, start_date=None, commit=True):
+    """Add a new goal and return its id.
+    
+    With a `kind` the goal tracks a metric (see goals.py) from `start_date`,
+    today by default; its progress is evaluated straight away. Raises
+    ValueError for an invalid definition.
+    """
+    version_before = data_version(conn)[1]
+    spec = (None,) * len(GOAL_SPEC_FIELDS)
+    if kind is not None:
+        start_date = datetime.date.fromisoformat(
+            start_date or datetime.date.today().isoformat()).isoformat()
+        spec = check_goal(kind, metric, comparison, target, window_days) + (start_date,)
+    cursor = conn.execute(f'''
+        INSERT INTO goals (uid, title, description, target_date, {', '.join(GOAL_SPEC_FIELDS)})
+        VALUES ({RANDOM_ID_SQL}, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (title, description, target_date or None) + spec)
+    goal_id = cursor.lastrowid
+    keep_goal_progress(conn, version_before)
+    if kind is not None:
+        goal = dict(zip(GOAL_SPEC_FIELDS, spec))
+        save_goal_progress(conn, [(goal_id, rebuild_goal_progress(conn, goal))])
+    if commit:
+        conn.commit()
+    return goal_id
+
+
+@traced()
+def fetch_goals(conn):
+    """Fetch all goals, open goals first, ordered by target date.
+    
+    Rows are (id, title, description, target_date, completed,
+    GOAL_SPEC_FIELDS..., value, days logged, progress); the last nine are
+    None for goals without a metric. Progress of open goals is worked out
+    again if entries changed behind the stored state's back.
+    """
+    rows = conn.execute(f'''
+        SELECT g.id, g.title, g.description, g.target_date, g.completed,
+               {', '.join('g.' + f for f in GOAL_SPEC_FIELDS)},
+               p.value, p.logged, p.progress, p.version
+        FROM goals g LEFT JOIN goal_progress p ON p.goal_id = g.id
+        ORDER BY g.completed, g.target_date
+    ''').fetchall()
+    version = data_version(conn)[1]
+    goals = []
+    for row in rows:
+        if not row[4] and row[5] is not None and row[-1] != version:
+            goal = goal_spec(row[5:11])
+            if goal is not None:
+                value, logged, progress, _ = rebuild_goal_progress(conn, goal).evaluate()
+                row = row[:11] + (value, logged, progress, version)
+        goals.append(row[:-1])
+    return goals
+
+
+def format_goal(row):
+    """A fetch_goals() row's metric and, while it is open, its progress; ''
+    for goals without a metric. Completed goals are no longer tracked"""
+    goal = goal_spec(row[5:11])
+    if goal is None:
+        return ""
+    if row[4]:
+        return describe_goal(goal)
+    return f"{describe_goal(goal)}: {format_goal_progress(goal, *row[11:14])}"
+
+
+def set_goal_completed(conn, goal_id, commit=True):
+    """Mark a goal as completed"""
+    set_goals_completed(conn, [goal_id], commit)
+
+
+@traced()
+def set_goals_completed(conn, goal_ids, commit=True):
+    """Mark several goals as completed in one transaction"""
+    version_before = data_version(conn)[1]
+    conn.executemany('UPDATE goals SET completed = 1 WHERE id = ?', [(i,) for i in goal_ids])
+    keep_goal_progress(conn, version_before)
+    if commit:
+        conn.commit()
+
+
+def delete_goal_by_id(conn, goal_id, commit=True):
+    """Delete a single goal"""
+    delete_goals(conn, [goal_id], commit)
+
+
+@traced()
+def delete_goals(conn, goal_ids, commit=True):
+    """Delete several goals in one transaction"""
+    version_before = data_version(conn)[1]
+    conn.executemany('DELETE FROM goals WHERE id = ?', [(i,) for i in goal_ids])
+    keep_goal_progress(conn, version_before)
+    if commit:
+        conn.commit()
+
+
+# Metrics tag analytics can compare
+TAG_METRICS = ('mood_score', 'energy_level', 'sleep_hours', 'stress_level', 'anxiety_level')
+
+# Smallest difference from the overall average worth mentioning in Insights
+TAG_DELTA_THRESHOLD = 0.1
+
+
+@traced()
+def tag_analytics(conn, kind=None, min_entries=3):
+    """Per-tag averages and their difference from the overall averages.
+    
+    Returns dicts with kind, name, entries and, for mood, stress and anxiety,
+    the average on tagged days plus `<metric>_delta` against all days. Tags
+    seen on fewer than `min_entries` days are left out.
+    """
+    overall = conn.execute('''
+        SELECT mood_sum / entries, stress_sum / NULLIF(stress_count, 0),
+               anxiety_sum / NULLIF(anxiety_count, 0)
+        FROM mood_rollups WHERE period = 'all'
+    ''').fetchone()
+    if overall is None:
+        return []
+    
+    rows = conn.execute('''
+        SELECT t.kind, t.name, COUNT(*), AVG(e.mood_score), AVG(e.stress_level),
+               AVG(e.anxiety_level)
+        FROM entry_tags et
+        JOIN tags t ON t.id = et.tag_id
+        JOIN mood_entries e ON e.id = et.entry_id
+        WHERE ? IS NULL OR t.kind = ?
+        GROUP BY et.tag_id
+        HAVING COUNT(*) >= ?
+    ''', (kind, kind, min_entries)).fetchall()
+    
+    results = []
+    for tag_kind, name, entries, mood, stress, anxiety in rows:
+        result = {'kind': tag_kind, 'name': name, 'entries': entries}
+        for metric, value, base in (('mood', mood, overall[0]), ('stress', stress, overall[1]),
+                                    ('anxiety', anxiety, overall[2])):
+            result[metric] = value
+            result[f'{metric}_delta'] = None if value is None or base is None else value - base
+        results.append(result)
+    return results
+
+
+def tag_effect(conn, kind, name, metric='mood_score'):
+    """Average of `metric` on days with and without a tag.
+    
+    Answers questions like "average mood on days I exercised" with an index
+    range scan over that tag's entries. Returns (with, without, days) where
+    either average is None when there is no data.
+    """
+    if metric not in TAG_METRICS:
+        raise ValueError(f"unknown metric {metric!r}")
+    tagged = conn.execute(f'''
+        SELECT SUM(e.{metric}), COUNT(e.{metric}), COUNT(*)
+        FROM tags t
+        JOIN entry_tags et ON et.tag_id = t.id
+        JOIN mood_entries e ON e.id = et.entry_id
+        WHERE t.kind = ? AND t.name = ?
+    ''', (kind, name)).fetchone()
+    prefix = {v: k for k, v in ROLLUP_METRICS.items()}[metric]
+    total = conn.execute(f'''
+        SELECT {prefix}_sum, {prefix}_count FROM mood_rollups WHERE period = 'all'
+    ''').fetchone() or (0, 0)
+    
+    tagged_sum, tagged_count, days = tagged[0] or 0, tagged[1], tagged[2]
+    with_tag = tagged_sum / tagged_count if tagged_count else None
+    other_count = total[1] - tagged_count
+    without_tag = (total[0] - tagged_sum) / other_count if other_count else None
+    return with_tag, without_tag, days
+
+
+def top_tags(conn, kind, metric='anxiety_level', min_value=7, limit=5):
+    """Most frequent tags of `kind` on days where `metric` >= `min_value`.
+    
+    E.g. top triggers on high-anxiety days. Returns (name, days) pairs.
+    """
+    if metric not in TAG_METRICS:
+        raise ValueError(f"unknown metric {metric!r}")
+    return conn.execute(f'''
+        SELECT t.name, COUNT(*) AS days
+        FROM mood_entries e
+        JOIN entry_tags et ON et.entry_id = e.id
+        JOIN tags t ON t.id = et.tag_id
+        WHERE e.{metric} >= ? AND t.kind = ?
+        GROUP BY t.id ORDER BY days DESC, t.name LIMIT ?
+    ''', (min_value, kind, limit)).fetchall()
+
+
+# Mood change per day below which the recent trend is reported as stable
+TREND_STABLE_SLOPE = 0.1
+
+
+def mood_slope(rows):
+    """Least squares slope of mood per day over (date, mood) rows"""
+    points = [(datetime.date.fromisoformat(date).toordinal(), mood) for date, mood in rows]
+    x_mean = sum(x for x, _ in points) / len(points)
+    y_mean = sum(y for _, y in points) / len(points)
+    sxx = sum((x - x_mean) ** 2 for x, _ in points)
+    if not sxx:
+        return 0.0
+    return sum((x - x_mean) * (y - y_mean) for x, y in points) / sxx
+
+
+def format_average(value, unit):
+    """Format an average to one decimal, or 'n/a' when nothing was recorded"""
+    return "n/a" if value is None else f"{value:.1f}{unit}"
+
+
+def data_version(conn):
+    """Return (database file, change counter) identifying the current data"""
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    value = conn.execute('SELECT value FROM change_counter').fetchone()[0]
+    return path, value
+
+
+# Insights text per database file: path -> (change counter, text)
+insights_cache = {}
+
+
+# Averages reported by insights_summary(), in the order the rollup query returns them
+SUMMARY_METRICS = ('mood_score', 'energy_level', 'sleep_hours', 'stress_level', 'anxiety_level')
+
+
+def insights_summary(conn):
+    """Headline figures of the Insights report as a dict, for machine-readable reports"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT entries, mood_sum / entries, energy_sum / entries,
+               sleep_sum / NULLIF(sleep_count, 0),
+               stress_sum / NULLIF(stress_count, 0),
+               anxiety_sum / NULLIF(anxiety_count, 0)
+        FROM mood_rollups WHERE period = 'all'
+    ''')
+    stats = cursor.fetchone()
+    cursor.execute('SELECT MIN(date), MAX(date) FROM mood_entries')
+    first_date, last_date = cursor.fetchone()
+    cursor.execute('SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM goals')
+    goals, goals_completed = cursor.fetchone()
+    return {
+        'entries': stats[0] if stats else 0,
+        'first_date': first_date,
+        'last_date': last_date,
+        'averages': dict(zip(SUMMARY_METRICS, stats[1:] if stats else [None] * 5)),
+        'goals': goals,
+        'goals_completed': goals_completed,
+    }
+
+
+def build_insights_report(conn, job=None):
+    """Build the Insights tab text, reusing the last report if nothing changed"""
+    path, version = data_version(conn)
+    cached = insights_cache.get(path)
+    if path and cached and cached[0] == version:
+        return cached[1]
+    
+    text = compute_insights_report(conn, job)
+    insights_cache[path] = (version, text)
+    return text
+
+
+@traced()
+def compute_insights_report(conn, job=None):
+    """Compute the Insights text from the rollup tables"""
+    cursor = conn.cursor()
+    lines = []
+    
+    # Get basic statistics from the whole-history rollup
+    cursor.execute('''
+        SELECT entries, mood_sum / entries, energy_sum / entries,
+               sleep_sum / NULLIF(sleep_count, 0),
+               stress_sum / NULLIF(stress_count, 0),
+               anxiety_sum / NULLIF(anxiety_count, 0)
+        FROM mood_rollups WHERE period = 'all'
+    ''')
+    stats = cursor.fetchone()
+    
+    if stats is None:
+        return "No data available for analysis.\n"
+    
+    # Date range comes straight off the ends of the date index
+    cursor.execute('SELECT MIN(date), MAX(date) FROM mood_entries')
+    stats = stats + cursor.fetchone()
+    
+    # Basic statistics
+    lines.append("=== MENTAL HEALTH INSIGHTS ===\n\n")
+    lines.append(f"Analysis Period: {stats[6]} to {stats[7]}\n")
+    lines.append(f"Total Entries: {stats[0]}\n\n")
+    
+    lines.append("AVERAGES:\n")
+    lines.append(f"• Mood Score: {stats[1]:.1f}/10\n")
+    lines.append(f"• Energy Level: {stats[2]:.1f}/10\n")
+    lines.append(f"• Sleep Hours: {format_average(stats[3], ' hours')}\n")
+    lines.append(f"• Stress Level: {format_average(stats[4], '/10')}\n")
+    lines.append(f"• Anxiety Level: {format_average(stats[5], '/10')}\n\n")
+    
+    if job:
+        job.check_cancelled()
+        job.report_progress(0.25, "Analysing trends...")
+    
+    # Mood trends
+    cursor.execute('''
+        SELECT date, mood_score FROM mood_entries 
+        ORDER BY date DESC LIMIT 7
+    ''')
+    recent_moods = cursor.fetchall()
+    
+    if len(recent_moods) >= 2:
+        slope = mood_slope(recent_moods)
+        if abs(slope) < TREND_STABLE_SLOPE:
+            trend = "stable"
+        else:
+            trend = "improving" if slope > 0 else "declining"
+        lines.append(f"RECENT TREND: Your mood appears to be {trend} "
+                     f"over the last {len(recent_moods)} entries.\n\n")
+    
+    if job:
+        job.check_cancelled()
+        job.report_progress(0.5, "Analysing sleep...")
+    
+    # Sleep correlation
+    cursor.execute('''
+        SELECT bucket, mood_sum / entries AS avg_mood
+        FROM sleep_buckets
+        ORDER BY avg_mood DESC
+        LIMIT 3
+    ''')
+    sleep_data = cursor.fetchall()
+    
+    if sleep_data:
+        lines.append("SLEEP INSIGHTS:\n")
+        lines.append(f"• Best mood with ~{sleep_data[0][0]} hours of sleep\n")
+        if len(sleep_data) > 1:
+            lines.append(f"• Good mood also with ~{sleep_data[1][0]} hours\n")
+        lines.append("\n")
+    
+    if job:
+        job.check_cancelled()
+        job.report_progress(0.6, "Analysing tags...")
+    
+    # Activities and triggers that move mood and anxiety the most
+    tags = tag_analytics(conn)
+    activities = sorted((t for t in tags if t['kind'] == 'activity'),
+                        key=lambda t: t['mood_delta'], reverse=True)
+    triggers = sorted((t for t in tags if t['kind'] == 'trigger' and t['anxiety_delta'] is not None),
+                      key=lambda t: t['anxiety_delta'], reverse=True)
+    
+    if activities or triggers:
+        lines.append("TAG INSIGHTS:\n")
+        for tag in activities[:3]:
+            if tag['mood_delta'] >= TAG_DELTA_THRESHOLD:
+                lines.append(f"• Mood is {tag['mood_delta']:+.1f} on days with {tag['name']} "
+                             f"({tag['entries']} days)\n")
+        for tag in activities[::-1][:1]:
+            if tag['mood_delta'] <= -TAG_DELTA_THRESHOLD:
+                lines.append(f"• Mood is {tag['mood_delta']:+.1f} on days with {tag['name']}\n")
+        for tag in triggers[:3]:
+            if tag['anxiety_delta'] >= TAG_DELTA_THRESHOLD:
+                lines.append(f"• Anxiety is {tag['anxiety_delta']:+.1f} when {tag['name']} "
+                             f"is a trigger ({tag['entries']} days)\n")
+        lines.append("\n")
+    
+    if numpy_available():
+        if job:
+            job.check_cancelled()
+            job.report_progress(0.7, "Running advanced analytics...")
+        engine = AnalyticsEngine.from_cache(entry_cache(conn))
+        if len(engine) >= 3:
+            lines.append(format_analytics(engine.summary()))
+    
+    forecast = forecast_mood(conn)
+    if forecast is not None:
+        lines.append("MOOD FORECAST:\n")
+        lines.append(f"• {format_forecast(forecast)}\n\n")
+    
+    alerts = fetch_alerts(conn, limit=INSIGHTS_ALERTS)
+    if alerts:
+        lines.append("RECENT ALERTS:\n")
+        for alert in alerts:
+            lines.append(f"• {alert['date']}: {alert['message']}\n")
+        lines.append("\n")
+    
+    if job:
+        job.check_cancelled()
+        job.report_progress(0.8, "Analysing goals...")
+    
+    # Goal progress
+    cursor.execute('SELECT COUNT(*), SUM(completed) FROM goals')
+    goal_stats = cursor.fetchone()
+    
+    if goal_stats[0] > 0:
+        completion_rate = (goal_stats[1] or 0) / goal_stats[0] * 100
+        lines.append("GOAL PROGRESS:\n")
+        lines.append(f"• {goal_stats[1] or 0} of {goal_stats[0]} goals completed ")
+        lines.append(f"({completion_rate:.1f}%)\n")
+        for row in fetch_goals(conn):
+            if not row[4] and format_goal(row):
+                lines.append(f"• {row[1]}: {format_goal(row)}\n")
+        lines.append("\n")
+    
+    # Recommendations
+    lines.append("RECOMMENDATIONS:\n")
+    
+    if stats[1] < 6:  # Low mood
+        lines.append("• Consider activities that boost your mood\n")
+    if stats[3] is not None and stats[3] < 7:  # Low sleep
+        lines.append("• Aim for more sleep (7-9 hours recommended)\n")
+    if stats[4] is not None and stats[4] > 6:  # High stress
+        lines.append("• Practice stress reduction techniques\n")
+    if stats[5] is not None and stats[5] > 6:  # High anxiety
+        lines.append("• Consider anxiety management strategies\n")
+    
+    lines.append("• Continue tracking for better insights\n")
+    lines.append("• Consult healthcare providers for persistent concerns\n")
+    
+    return "".join(lines)
+
+
+def iter_batches(cursor, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of rows from an executed cursor without fetching them all"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def export_rows(conn, filename, write_header, write_batch, write_footer,
+                job=None, newline=None, encoding=None):
+    """Shared driver for the streaming exporters.
+    
+    `write_batch(conn)` yields (text, mood entry count) chunks built from
+    EXPORT_BATCH_SIZE rows at a time, so the encoded output is never held in
+    memory whole.
+    Returns a dict of export statistics, including the time spent in file
+    writes as opposed to reading and encoding rows.
+    """
+    start = time.perf_counter()
+    total = conn.execute('SELECT COUNT(*) FROM mood_entries').fetchone()[0]
+    count = 0
+    write_seconds = 0.0
+    
+    try:
+        with open(filename, 'w', newline=newline, encoding=encoding) as f:
+            write_header(f)
+            for text, rows in write_batch(conn):
+                written = time.perf_counter()
+                f.write(text)
+                write_seconds += time.perf_counter() - written
+                count += rows
+                if job:
+                    job.check_cancelled()
+                    job.report_progress(count / max(total, 1),
+                                        f"Exported {count} of {total} entries")
+            write_footer(f)
+            size = f.tell()
+    except JobCancelled:
+        # Don't leave a half-written export behind
+        os.remove(filename)
+        raise
+    
+    seconds = time.perf_counter() - start
+    add_span('db', 'export_rows.write', write_seconds, start=start)
+    add_span('db', 'export_rows.encode', seconds - write_seconds, count, start=start)
+    return export_stats(count, size, seconds, write_seconds)
+
+
+def export_stats(rows, size, seconds, write_seconds=None):
+    """Summarise an export's throughput and the process's peak memory"""
+    stats = {
+        'rows': rows,
+        'bytes': size,
+        'seconds': seconds,
+        'write_seconds': write_seconds,
+        'rows_per_sec': rows / seconds if seconds else 0.0,
+        'mb_per_sec': size / 1e6 / seconds if seconds else 0.0,
+        'peak_rss_mb': None,
+    }
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stats['peak_rss_mb'] = peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10)
+    return stats
+
+
+def format_export_stats(stats):
+    """One-line human readable summary of export_stats()"""
+    text = (f"{stats['rows']} entries, {stats['bytes'] / 1e6:.1f} MB in "
+            f"{stats['seconds']:.2f}s ({stats['rows_per_sec']:.0f} rows/s)")
+    if stats['write_seconds'] is not None and stats['seconds']:
+        text += f", {stats['write_seconds'] / stats['seconds']:.0%} of it writing"
+    if stats['peak_rss_mb'] is not None:
+        text += f", peak memory {stats['peak_rss_mb']:.0f} MB"
+    return text
+
+
+@traced()
+def export_json(conn, filename, job=None):
+    """Export mood entries and goals to a JSON file.
+    
+    The output is byte-for-byte what json.dump(..., indent=2, default=str)
+    produces for the whole export, but each record is encoded as it is read.
+    """
+    encoder = json.JSONEncoder(indent=2, default=str)
+    
+    def write_records(columns, batches, last):
+        first = True
+        for rows in batches:
+            parts = []
+            for row in rows:
+                record = encoder.encode(dict(zip(columns, row)))
+                parts.append(("\n    " if first else ",\n    ") + record.replace("\n", "\n    "))
+                first = False
+            yield "".join(parts), len(rows)
+        # Empty lists stay on one line, as json.dump writes them
+        yield ("]" if first else "\n  ]") + ("" if last else ",\n"), 0
+    
+    def write_batch(conn):
+        cursor = conn.execute('SELECT * FROM mood_entries')
+        columns = [description[0] for description in cursor.description]
+        yield from write_records(columns, iter_batches(cursor), False)
+        yield '  "goals": [', 0
+        cursor = conn.execute('SELECT * FROM goals')
+        columns = [description[0] for description in cursor.description]
+        for text, _ in write_records(columns, iter_batches(cursor), True):
+            yield text, 0
+    
+    def write_header(f):
+        f.write('{\n  "export_date": ')
+        f.write(encoder.encode(datetime.datetime.now().isoformat()))
+        f.write(',\n  "mood_entries": [')
+    
+    return export_rows(conn, filename, write_header, write_batch,
+                       lambda f: f.write("\n}"), job)
+
+
+@traced()
+def export_ndjson(conn, filename, job=None):
+    """Export mood entries and goals as newline-delimited JSON.
+    
+    The first line holds the export date; every following line is one
+    {"table": ..., "row": {...}} record.
+    """
+    encoder = json.JSONEncoder(default=str)
+    
+    def write_records(table, columns, batches):
+        for rows in batches:
+            yield "".join(encoder.encode({'table': table, 'row': dict(zip(columns, row))}) + "\n"
+                          for row in rows), len(rows)
+    
+    def write_batch(conn):
+        cursor = conn.execute('SELECT * FROM mood_entries')
+        columns = [description[0] for description in cursor.description]
+        yield from write_records('mood_entries', columns, iter_batches(cursor))
+        cursor = conn.execute('SELECT * FROM goals')
+        columns = [description[0] for description in cursor.description]
+        for text, _ in write_records('goals', columns, iter_batches(cursor)):
+            yield text, 0
+    
+    def write_header(f):
+        f.write(encoder.encode({'export_date': datetime.datetime.now().isoformat()}) + "\n")
+    
+    return export_rows(conn, filename, write_header, write_batch, lambda f: None, job,
+                       encoding='utf-8')
+
+
+@traced()
+def export_csv(conn, filename, job=None):
+    """Export mood entries to a CSV file"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def write_batch(conn):
+        cursor = conn.execute(f'''
+            SELECT {', '.join(CSV_COLUMNS)} FROM mood_entries ORDER BY date
+        ''')
+        for rows in iter_batches(cursor):
+            writer.writerows(rows)
+            yield buffer.getvalue(), len(rows)
+            buffer.seek(0)
+            buffer.truncate()
+    
+    return export_rows(conn, filename,
+                       lambda f: csv.writer(f).writerow(CSV_HEADER),
+                       write_batch, lambda f: None, job,
+                       newline='', encoding='utf-8')
+
+
+@traced()
+def export_archive(conn, filename, job=None):
+    """Export mood entries to a compact binary archive (see archive.py)"""
+    start = time.perf_counter()
+    total = conn.execute('SELECT COUNT(*) FROM mood_entries').fetchone()[0]
+    count = 0
+    
+    try:
+        with open(filename, 'wb') as f:
+            writer = ArchiveWriter(f)
+            cursor = conn.execute(f'''
+                SELECT {', '.join(ARCHIVE_COLUMNS)} FROM mood_entries ORDER BY date
+            ''')
+            for rows in iter_batches(cursor):
+                writer.add_rows(rows)
+                count += len(rows)
+                if job:
+                    job.check_cancelled()
+                    job.report_progress(count / max(total, 1),
+                                        f"Archived {count} of {total} entries")
+            writer.close()
+            size = f.tell()
+    except JobCancelled:
+        os.remove(filename)
+        raise
+    
+    return export_stats(count, size, time.perf_counter() - start)
+
+
+# Header aliases accepted by the CSV importer, after lower-casing and
+# replacing spaces with underscores
+IMPORT_ALIASES = {
+    'mood': 'mood_score',
+    'energy': 'energy_level',
+    'sleep': 'sleep_hours',
+    'stress': 'stress_level',
+    'anxiety': 'anxiety_level',
+    'note': 'notes',
+    'activity': 'activities',
+    'trigger': 'triggers',
+    'medication': 'medications',
+}
+
+# Rows written per executemany call while importing
+IMPORT_BATCH_SIZE = 5000
+
+
+def coerce_level(value, name, required=False):
+    """Coerce a 1-10 rating; blank values are allowed unless required"""
+    if value is None or value == '':
+        if required:
+            raise ValueError(f"missing {name}")
+        return None
+    try:
+        try:
+            level = int(value)
+        except ValueError:
+            level = round(float(value))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} {value!r} is not a number") from None
+    if not 1 <= level <= 10:
+        raise ValueError(f"{name} {value!r} is outside 1-10")
+    return level
+
+
+def coerce_text(value, name):
+    """Coerce a free-text field; lists and objects (e.g. from JSON) are rejected"""
+    if isinstance(value, (dict, list, tuple)):
+        raise ValueError(f"{name} must be text")
+    return str(value or '')
+
+
+def coerce_entry(record):
+    """Validate a dict of column -> value and return an ENTRY_COLUMNS tuple.
+    
+    Raises ValueError describing the first problem found.
+    """
+    date = datetime.date.fromisoformat(str(record.get('date') or '').strip()[:10]).isoformat()
+    
+    sleep = record.get('sleep_hours')
+    if sleep is None or sleep == '':
+        sleep = None
+    else:
+        try:
+            sleep = float(sleep)
+        except (TypeError, ValueError):
+            raise ValueError(f"sleep_hours {sleep!r} is not a number") from None
+        if not 0 <= sleep <= 24:
+            raise ValueError(f"sleep_hours {sleep!r} is outside 0-24")
+    
+    return (
+        date,
+        coerce_level(record.get('mood_score'), 'mood_score', required=True),
+        coerce_level(record.get('energy_level'), 'energy_level', required=True),
+        sleep,
+        coerce_level(record.get('stress_level'), 'stress_level'),
+        coerce_level(record.get('anxiety_level'), 'anxiety_level'),
+        coerce_text(record.get('notes'), 'notes'),
+        coerce_text(record.get('activities'), 'activities'),
+        coerce_text(record.get('triggers'), 'triggers'),
+        coerce_text(record.get('medications'), 'medications'),
+    )
+
+
+def iter_csv_records(f):
+    """Yield dicts from the app's CSV export or any CSV with similar headers"""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = []
+    for name in header:
+        key = name.strip().lower().replace(' ', '_')
+        columns.append(IMPORT_ALIASES.get(key, key))
+    for row in reader:
+        yield dict(zip(columns, row))
+
+
+def iter_json_records(f, chunk_size=1 << 16):
+    """Yield mood entries from the app's JSON export without loading it whole.
+    
+    Reads the file in chunks and decodes one object of the "mood_entries"
+    array at a time. Goals in the export are not imported.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    
+    def read_more():
+        nonlocal buffer, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+    
+    # Find the opening bracket of the mood_entries array
+    while True:
+        start = buffer.find('"mood_entries"')
+        bracket = buffer.find('[', start) if start >= 0 else -1
+        if bracket >= 0:
+            break
+        if eof:
+            raise ValueError("no mood_entries array found")
+        read_more()
+    buffer = buffer[bracket + 1:]
+    pos = 0
+    
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer = buffer[pos:]
+            pos = 0
+            read_more()
+            continue
+        yield record
+
+
+def iter_ndjson_records(f):
+    """Yield mood entries from the app's NDJSON export"""
+    for line in f:
+        record = json.loads(line)
+        if record.get('table') == 'mood_entries':
+            yield record['row']
+
+
+@traced()
+def import_entries(conn, filename, job=None, batch_size=IMPORT_BATCH_SIZE):
+    """Bulk import mood entries from a CSV, JSON, NDJSON or archive file.
+    
+    Rows are validated as they are read and loaded with bulk_load_entries;
+    entries whose date already exists are replaced and invalid rows are
+    skipped. Returns a dict of import statistics.
+    """
+    start = time.perf_counter()
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ARCHIVE_EXTENSION:
+        f = ArchiveReader(filename)
+        records = f.iter_records()
+        position = f.tell
+    else:
+        if extension == '.json':
+            reader = iter_json_records
+        elif extension in ('.ndjson', '.jsonl'):
+            reader = iter_ndjson_records
+        else:
+            reader = iter_csv_records
+        f = open(filename, newline='', encoding='utf-8-sig')
+        records = reader(f)
+        position = f.buffer.tell
+    
+    size = os.path.getsize(filename)
+    errors = []
+    
+    with f:
+        def valid_entries():
+            for line, record in enumerate(records, start=1):
+                try:
+                    yield coerce_entry(record)
+                except (ValueError, TypeError) as e:
+                    errors.append(f"record {line}: {e}")
+        
+        def on_batch(loaded):
+            if job:
+                job.check_cancelled()
+                job.report_progress(position() / max(size, 1), f"Read {loaded} entries")
+        
+        imported = bulk_load_entries(conn, valid_entries(), batch_size, on_batch)
+    
+    seconds = time.perf_counter() - start
+    return {
+        'rows': imported,
+        'skipped': len(errors),
+        'errors': errors[:10],
+        'seconds': seconds,
+        'rows_per_sec': imported / seconds if seconds else 0.0,
+    }
+
+
+@traced()
+def bulk_load_entries(conn, entries, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+    """Upsert an iterable of ENTRY_COLUMNS tuples in a single transaction.
+    
+    Entries are staged with executemany in `batch_size` batches and then
+    merged into mood_entries; later entries for a date replace earlier ones.
+    `on_batch(count)` is called after each staged batch and may raise to
+    abort the load. Returns the number of entries loaded.
+    """
+    stage_sql = 'INSERT OR REPLACE INTO temp.import_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+    loaded = 0
+    try:
+        conn.execute('BEGIN')
+        conn.execute('''
+            CREATE TEMP TABLE import_staging (
+                date TEXT PRIMARY KEY, mood_score INTEGER, energy_level INTEGER,
+                sleep_hours REAL, stress_level INTEGER, anxiety_level INTEGER,
+                notes TEXT, activities TEXT, triggers TEXT, medications TEXT
+            )
+        ''')
+        
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                conn.executemany(stage_sql, batch)
+                loaded += len(batch)
+                batch = []
+                if on_batch:
+                    on_batch(loaded)
+        conn.executemany(stage_sql, batch)
+        loaded += len(batch)
+        
+        merge_staged_entries(conn)
+        conn.execute('DROP TABLE temp.import_staging')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        conn.execute('DROP TABLE IF EXISTS temp.import_staging')
+        raise
+    return loaded
+
+
+@traced()
+def merge_staged_entries(conn):
+    """Upsert temp.import_staging into mood_entries with set-based rollups.
+    
+    Per-row rollup triggers are dropped for the merge and the rollups are
+    adjusted once for the replaced and the new rows instead. Must run inside
+    the caller's transaction.
+    """
+    cursor = conn.cursor()
+    columns = ', '.join(ENTRY_COLUMNS)
+    replaced = '''(SELECT m.* FROM mood_entries m
+                   JOIN temp.import_staging s ON s.date = m.date)'''
+    
+    for statement in rollup_apply_sql(replaced, -1):
+        cursor.execute(statement)
+    
+    drop_rollup_triggers(cursor)
+    cursor.execute(f'''
+        INSERT INTO mood_entries ({columns})
+        SELECT {columns} FROM temp.import_staging WHERE true
+    ''' + UPSERT_ON_CONFLICT)
+    create_rollup_triggers(cursor)
+    
+    for statement in rollup_apply_sql('temp.import_staging', 1):
+        cursor.execute(statement)
+    cursor.execute(BUMP_CHANGE_COUNTER)
+    
+    tagged = conn.execute('''
+        SELECT m.id, s.activities, s.triggers, s.medications
+        FROM temp.import_staging s JOIN mood_entries m ON m.date = s.date
+    ''')
+    tag_cache = {}
+    for rows in iter_batches(tagged):
+        write_entry_tags(cursor, rows, tag_cache)
+
+
+def format_import_stats(stats):
+    """Human readable summary of import_entries() statistics"""
+    text = (f"Imported {stats['rows']} entries in {stats['seconds']:.2f}s "
+            f"({stats['rows_per_sec']:.0f} rows/s)")
+    if stats['skipped']:
+        text += f"\n{stats['skipped']} invalid rows skipped:\n" + "\n".join(stats['errors'])
+    return text
+
+
+class JobCancelled(Exception):
+    """Raised inside a background job when the user cancels it"""
+
+
+class Job:
+    """A unit of work queued on the database worker"""
+    
+    def __init__(self, worker, func, on_done=None, on_error=None, on_progress=None,
+                 write=False):
+        self.worker = worker
+        self.func = func
+        self.write = write
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        """Ask the job to stop at its next checkpoint"""
+        self.cancel_event.set()
+    
+    def check_cancelled(self):
+        """Called from the job to bail out once cancel() has been requested"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+    
+    def report_progress(self, fraction, message=""):
+        """Called from the job to send progress back to the GUI thread"""
+        if self.on_progress:
+            self.worker.results.put((self.on_progress, (fraction, message)))
+
+
+class DatabaseWorker:
+    """Runs database work on a dedicated thread with its own connection.
+    
+    Jobs are taken from a request queue in order. Their results are put on a
+    result queue, which the GUI drains from its own thread with `root.after`.
+    
+    Write jobs (submitted with write=True, and calling the write functions
+    with commit=False) share one transaction: each runs in its own savepoint
+    and they are committed together once no further write arrives for
+    GROUP_COMMIT_DELAY, at most GROUP_COMMIT_MAX_DELAY after the first, or
+    before any other job runs. Their callbacks fire after the commit.
+    """
+    
+    def __init__(self, db_path, profile=DEFAULT_PROFILE):
+        self.db_path = db_path
+        self.profile = profile
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def submit(self, func, on_done=None, on_error=None, on_progress=None, write=False):
+        """Queue `func(conn, job)` and return its Job handle"""
+        job = Job(self, func, on_done, on_error, on_progress, write)
+        self.requests.put(job)
+        return job
+    
+    def stop(self):
+        """Finish queued jobs, then close the connection"""
+        self.requests.put(None)
+        self.thread.join()
+    
+    def dispatch_results(self):
+        """Run pending callbacks; must be called from the GUI thread"""
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+    
+    def _run(self):
+        conn = connect(self.db_path, self.profile)
+        maintained_at = conn.total_changes
+        # (job, result) of writes waiting for the group commit
+        pending = []
+        first_write = 0.0
+        try:
+            while True:
+                if pending and time.monotonic() - first_write >= GROUP_COMMIT_MAX_DELAY:
+                    self._commit_writes(conn, pending)
+                try:
+                    job = self.requests.get(
+                        timeout=GROUP_COMMIT_DELAY if pending else MAINTENANCE_INTERVAL)
+                except queue.Empty:
+                    if pending:
+                        self._commit_writes(conn, pending)
+                    # Idle: checkpoint and optimize if anything was written
+                    elif conn.total_changes != maintained_at:
+                        run_maintenance(conn)
+                        maintained_at = conn.total_changes
+                    continue
+                if job is not None and job.write:
+                    if not pending:
+                        first_write = time.monotonic()
+                    self._run_write(conn, job, pending)
+                    continue
+                if pending:
+                    self._commit_writes(conn, pending)
+                if job is None:
+                    run_maintenance(conn, closing=True)
+                    break
+                try:
+                    result = job.func(conn, job)
+                except Exception as e:
+                    conn.rollback()
+                    if job.on_error:
+                        self.results.put((job.on_error, (e,)))
+                else:
+                    if job.on_done:
+                        self.results.put((job.on_done, (result,)))
+        finally:
+            conn.close()
+    
+    def _run_write(self, conn, job, pending):
+        """Run a write job inside the shared transaction"""
+        if not conn.in_transaction:
+            conn.execute('BEGIN')
+        conn.execute('SAVEPOINT write_job')
+        try:
+            result = job.func(conn, job)
+        except Exception as e:
+            if conn.in_transaction:
+                # Undo only this job; earlier writes in the batch still commit
+                conn.execute('ROLLBACK TO write_job')
+                conn.execute('RELEASE write_job')
+                # The cache and the mood model may have seen the undone writes
+                drop_entry_cache(conn)
+                drop_mood_model(conn)
+            else:
+                self._deliver_writes(pending)
+            if job.on_error:
+                self.results.put((job.on_error, (e,)))
+            return
+        pending.append((job, result))
+        if conn.in_transaction:
+            conn.execute('RELEASE write_job')
+        else:
+            # The job committed by itself, taking the whole batch with it
+            self._deliver_writes(pending)
+    
+    def _commit_writes(self, conn, pending):
+        """Commit the batched writes and report each job's outcome"""
+        try:
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            drop_entry_cache(conn)
+            drop_mood_model(conn)
+            for job, _ in pending:
+                if job.on_error:
+                    self.results.put((job.on_error, (e,)))
+            pending.clear()
+            return
+        save_mood_model(conn)
+        self._deliver_writes(pending)
+    
+    def _deliver_writes(self, pending):
+        for job, result in pending:
+            if job.on_done:
+                self.results.put((job.on_done, (result,)))
+        pending.clear()
@@ -0,0 +1,1414 @@
+"""Tkinter GUI for the Mental Health Tracker"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import datetime
+import os
+import threading
+import time
+
+from archive import ARCHIVE_EXTENSION
+from backup import SNAPSHOT_SUFFIX, BackupScheduler, format_snapshot, restore_snapshot
+import instrumentation
+from charts import (
+    CHART_METRICS, CHART_Y_MAX, DOWNSAMPLERS, chart_points, date_ticks,
+    load_chart_series, series_range,
+)
+from instrumentation import (
+    add_span, clear as clear_spans, explain_query_plan, set_enabled, span, summarize,
+    write_trace,
+)
+from tracker_core import (
+    DB_PATH, DEFAULT_PROFILE, HISTORY_PAGE_SIZE, DatabaseWorker, JobCancelled,
+    build_insights_report, coerce_entry, delete_entries, delete_goals, dismiss_alerts,
+    entry_cache, export_archive, export_csv, export_json, export_ndjson, fetch_alerts,
+    fetch_goals, fetch_history_page, forecast_mood, format_export_stats, format_forecast,
+    format_goal, format_import_stats, import_entries, insert_goal, run_migrations,
+    search_entries, set_goals_completed, upsert_entry,
+)
+
+
+# Fraction of the history scrollbar after which the next page is loaded
+HISTORY_LOAD_THRESHOLD = 0.9
+
+# How often the GUI collects results from the database worker
+WORKER_POLL_MS = 50
+
+# Chart plot margins in pixels, leaving room for the axis labels
+CHART_MARGIN = 15
+CHART_MARGIN_LEFT = 40
+CHART_MARGIN_BOTTOM = 30
+
+# Zoom factor per mouse wheel step and the narrowest zoom in days
+CHART_ZOOM_STEP = 1.25
+CHART_MIN_DAYS = 7
+
+# Notebook tabs as (frame attribute, title, method filling the frame in). The
+# first tab is built straight away, the others the first time they are needed
+TABS = (
+    ('mood_frame', "Daily Entry", 'create_mood_entry_tab'),
+    ('history_frame', "History", 'create_history_tab'),
+    ('goals_frame', "Goals", 'create_goals_tab'),
+    ('insights_frame', "Insights", 'create_insights_tab'),
+    ('charts_frame', "Charts", 'create_charts_tab'),
+    ('export_frame', "Export", 'create_export_tab'),
+    ('diagnostics_frame', "Diagnostics", 'create_diagnostics_tab'),
+)
+
+# What a new goal can track, as (choice, goal kind, metric)
+GOAL_TRACKING = (
+    ("Nothing (mark it complete yourself)", None, None),
+    ("Average mood", 'average', 'mood_score'),
+    ("Average energy", 'average', 'energy_level'),
+    ("Average sleep (hours)", 'average', 'sleep_hours'),
+    ("Average stress", 'average', 'stress_level'),
+    ("Average anxiety", 'average', 'anxiety_level'),
+    ("Days with an activity", 'count', None),
+)
+
+# Goal comparison choices and the comparison each stands for
+GOAL_COMPARISON_CHOICES = {"at least": '>=', "at most": '<='}
+
+# Phases of the startup report, in the order they are listed
+STARTUP_PHASES = ('import', 'window', 'widgets', 'first paint', 'database open',
+                  'history loaded', 'goals loaded')
+
+
+class MentalHealthTracker:
+    def __init__(self, db_path=DB_PATH, profile=DEFAULT_PROFILE, started=None):
+        # Startup report: phase -> (start, end) in seconds since `started`,
+        # which callers take before importing the app's modules
+        self.started = time.perf_counter() if started is None else started
+        self.startup_phases = {}
+        self.first_paint = None
+        self.mark_startup('import', self.started)
+        
+        self.db_path = db_path
+        self.profile = profile
+        begin = time.perf_counter()
+        self.root = tk.Tk()
+        self.root.title("Mental Health Tracker")
+        self.root.geometry("900x700")
+        self.root.configure(bg='#f0f8ff')
+        self.mark_startup('window', begin)
+        
+        # Initialize database
+        self.init_database()
+        
+        # Create GUI
+        begin = time.perf_counter()
+        self.create_widgets()
+        self.mark_startup('widgets', begin)
+        
+        # History and goals are loaded once the first screen is on display
+        self.root.bind('<Map>', self.on_map, add='+')
+    
+    def init_database(self):
+        """Start the database worker and bring the schema up to date"""
+        self.worker = DatabaseWorker(self.db_path, self.profile)
+        self.worker.start()
+        self.current_job = None
+        
+        # Scheduled snapshots run on their own thread and connection; their
+        # outcome is handed to the GUI thread through the worker's results
+        self.backups = BackupScheduler(
+            self.db_path, profile=self.profile,
+            on_done=lambda manifest: self.worker.results.put((self.on_backup_done, (manifest,))),
+            on_error=lambda e: self.worker.results.put((self.on_backup_error, (e,))))
+        
+        def on_migrated(result):
+            self.mark_startup('database open', begin)
+            self.backups.start()
+        
+        begin = time.perf_counter()
+        self.worker.submit(lambda conn, job: run_migrations(conn), on_migrated,
+                           lambda e: messagebox.showerror(
+                               "Error", f"Failed to open database: {e}"))
+        self.poll_worker()
+    
+    def on_map(self, event):
+        """Start loading data after the window is first drawn"""
+        if str(event.widget) == str(self.root) and self.first_paint is None:
+            self.first_paint = time.perf_counter()
+            self.root.after_idle(self.load_initial_data)
+    
+    def load_initial_data(self):
+        """Build the History and Goals tabs, which load their first data"""
+        self.mark_startup('first paint', self.started + self.startup_phases['widgets'][1])
+        # One tab per idle callback, so events are handled in between
+        self.root.after_idle(self.build_tab, self.history_frame)
+        self.root.after_idle(self.build_tab, self.goals_frame)
+        # Then fill the entry cache in the background so later pages,
+        # insights and exports don't go back to SQLite
+        self.root.after_idle(self.worker.submit, lambda conn, job: entry_cache(conn))
+    
+    def mark_startup(self, phase, begin):
+        """Record that a startup phase ran from `begin` until now"""
+        if phase in self.startup_phases:
+            return
+        end = time.perf_counter()
+        self.startup_phases[phase] = (begin - self.started, end - self.started)
+        add_span('ui', f'startup {phase}', end - begin, start=begin)
+        if len(self.startup_phases) == len(STARTUP_PHASES) and not self.current_job:
+            self.status_var.set(f"Ready (started in {(end - self.started) * 1e3:.0f} ms)")
+    
+    def format_startup_report(self):
+        """The startup phases with their duration and when they finished"""
+        lines = [f"{'Startup phase':<16} {'Took ms':>8} {'Done at ms':>11}"]
+        for phase in STARTUP_PHASES:
+            if phase in self.startup_phases:
+                begin, end = self.startup_phases[phase]
+                lines.append(f"{phase:<16} {(end - begin) * 1e3:>8.1f} {end * 1e3:>11.1f}")
+            else:
+                lines.append(f"{phase:<16} {'pending':>8}")
+        return "\n".join(lines)
+    
+    def create_widgets(self):
+        """Create the main GUI interface"""
+        self.create_status_bar()
+        
+        # Create notebook for tabs
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        # Add every tab, but only fill in the first one
+        self.tab_builders = {}
+        for attribute, title, builder in TABS:
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=title)
+            setattr(self, attribute, frame)
+            self.tab_builders[str(frame)] = getattr(self, builder)
+        self.build_tab(self.mood_frame)
+        
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+    
+    def build_tab(self, frame):
+        """Create a tab's widgets the first time it is needed"""
+        builder = self.tab_builders.pop(str(frame), None)
+        if builder is not None:
+            with span('ui', builder.__name__):
+                builder()
+    
+    def tab_built(self, frame):
+        """Whether a tab's widgets exist yet"""
+        return str(frame) not in self.tab_builders
+    
+    def create_status_bar(self):
+        """Create the status bar used to track long background jobs"""
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side='bottom', fill='x', padx=10, pady=(0, 10))
+        
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side='left')
+        
+        self.cancel_btn = ttk.Button(status_frame, text="Cancel", state='disabled',
+                                     command=self.cancel_current_job)
+        self.cancel_btn.pack(side='right')
+        self.progress_bar = ttk.Progressbar(status_frame, length=200, maximum=100)
+        self.progress_bar.pack(side='right', padx=10)
+    
+    def create_mood_entry_tab(self):
+        """Create the mood entry tab"""
+        # Main container with padding
+        main_container = ttk.Frame(self.mood_frame)
+        main_container.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        # Title
+        title_label = ttk.Label(main_container, text="Daily Mental Health Check-in", 
+                               font=('Arial', 16, 'bold'))
+        title_label.pack(pady=(0, 20))
+        
+        # Date selection
+        date_frame = ttk.Frame(main_container)
+        date_frame.pack(fill='x', pady=(0, 15))
+        ttk.Label(date_frame, text="Date:").pack(side='left')
+        self.date_var = tk.StringVar(value=datetime.date.today().strftime("%Y-%m-%d"))
+        self.date_entry = ttk.Entry(date_frame, textvariable=self.date_var, width=12)
+        self.date_entry.pack(side='left', padx=(10, 0))
+        
+        # Mood score (1-10)
+        mood_frame = ttk.LabelFrame(main_container, text="Mood Assessment", padding=15)
+        mood_frame.pack(fill='x', pady=(0, 15))
+        
+        ttk.Label(mood_frame, text="Overall Mood (1=Very Low, 10=Excellent):").pack(anchor='w')
+        self.mood_var = tk.IntVar(value=5)
+        self.mood_scale = ttk.Scale(mood_frame, from_=1, to=10, variable=self.mood_var, 
+                                   orient='horizontal', length=400)
+        self.mood_scale.pack(fill='x', pady=5)
+        self.mood_label = ttk.Label(mood_frame, text="5")
+        self.mood_label.pack()
+        self.mood_scale.configure(command=self.update_mood_label)
+        
+        # Energy level
+        ttk.Label(mood_frame, text="Energy Level (1=Exhausted, 10=Energetic):").pack(anchor='w', pady=(15, 0))
+        self.energy_var = tk.IntVar(value=5)
+        self.energy_scale = ttk.Scale(mood_frame, from_=1, to=10, variable=self.energy_var, 
+                                     orient='horizontal', length=400)
+        self.energy_scale.pack(fill='x', pady=5)
+        self.energy_label = ttk.Label(mood_frame, text="5")
+        self.energy_label.pack()
+        self.energy_scale.configure(command=self.update_energy_label)
+        
+        # Sleep hours
+        sleep_frame = ttk.Frame(mood_frame)
+        sleep_frame.pack(fill='x', pady=(15, 0))
+        ttk.Label(sleep_frame, text="Hours of Sleep:").pack(side='left')
+        self.sleep_var = tk.StringVar(value="8")
+        sleep_spinbox = ttk.Spinbox(sleep_frame, from_=0, to=24, textvariable=self.sleep_var, 
+                                   width=5, increment=0.5)
+        sleep_spinbox.pack(side='left', padx=(10, 0))
+        
+        # Stress and anxiety levels
+        levels_frame = ttk.Frame(mood_frame)
+        levels_frame.pack(fill='x', pady=(15, 0))
+        
+        stress_frame = ttk.Frame(levels_frame)
+        stress_frame.pack(side='left', fill='x', expand=True, padx=(0, 10))
+        ttk.Label(stress_frame, text="Stress Level (1-10):").pack()
+        self.stress_var = tk.IntVar(value=5)
+        stress_scale = ttk.Scale(stress_frame, from_=1, to=10, variable=self.stress_var, 
+                                orient='horizontal', length=180)
+        stress_scale.pack()
+        
+        anxiety_frame = ttk.Frame(levels_frame)
+        anxiety_frame.pack(side='left', fill='x', expand=True)
+        ttk.Label(anxiety_frame, text="Anxiety Level (1-10):").pack()
+        self.anxiety_var = tk.IntVar(value=5)
+        anxiety_scale = ttk.Scale(anxiety_frame, from_=1, to=10, variable=self.anxiety_var, 
+                                 orient='horizontal', length=180)
+        anxiety_scale.pack()
+        
+        # Activities
+        activities_frame = ttk.LabelFrame(main_container, text="Activities & Notes", padding=15)
+        activities_frame.pack(fill='both', expand=True, pady=(0, 15))
+        
+        ttk.Label(activities_frame, text="Activities (comma-separated):").pack(anchor='w')
+        self.activities_var = tk.StringVar()
+        activities_entry = ttk.Entry(activities_frame, textvariable=self.activities_var)
+        activities_entry.pack(fill='x', pady=(5, 15))
+        
+        ttk.Label(activities_frame, text="Triggers/Stressors:").pack(anchor='w')
+        self.triggers_var = tk.StringVar()
+        triggers_entry = ttk.Entry(activities_frame, textvariable=self.triggers_var)
+        triggers_entry.pack(fill='x', pady=(5, 15))
+        
+        ttk.Label(activities_frame, text="Medications:").pack(anchor='w')
+        self.medications_var = tk.StringVar()
+        medications_entry = ttk.Entry(activities_frame, textvariable=self.medications_var)
+        medications_entry.pack(fill='x', pady=(5, 15))
+        
+        ttk.Label(activities_frame, text="Additional Notes:").pack(anchor='w')
+        self.notes_text = tk.Text(activities_frame, height=4, wrap='word')
+        self.notes_text.pack(fill='both', expand=True, pady=5)
+        
+        # Save button
+        save_btn = ttk.Button(main_container, text="Save Entry", command=self.save_entry)
+        save_btn.pack(pady=10)
+    
+    def create_history_tab(self):
+        """Create the history viewing tab"""
+        # Controls frame
+        controls_frame = ttk.Frame(self.history_frame)
+        controls_frame.pack(fill='x', padx=20, pady=20)
+        
+        ttk.Label(controls_frame, text="Search:").pack(side='left')
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(controls_frame, textvariable=self.search_var, width=40)
+        search_entry.pack(side='left', padx=(10, 5))
+        search_entry.bind('<Return>', lambda event: self.search_history())
+        ttk.Button(controls_frame, text="Search", command=self.search_history).pack(side='left')
+        ttk.Button(controls_frame, text="Clear", command=self.clear_search).pack(side='left', padx=5)
+        
+        refresh_btn = ttk.Button(controls_frame, text="Refresh", command=self.refresh_history)
+        refresh_btn.pack(side='right')
+        
+        # Search tips; matched words in notes are shown between « and »
+        ttk.Label(self.history_frame, foreground='gray',
+                  text='Words must all match; use "quotes" for phrases and run* for prefixes'
+                  ).pack(anchor='w', padx=20, pady=(0, 10))
+        
+        # History treeview
+        tree_frame = ttk.Frame(self.history_frame)
+        tree_frame.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        
+        # Create treeview with scrollbars
+        self.history_tree = ttk.Treeview(tree_frame, columns=('Date', 'Mood', 'Energy', 'Sleep', 
+                                                              'Stress', 'Anxiety', 'Notes'), 
+                                        show='headings', height=15)
+        
+        # Configure columns
+        self.history_tree.heading('Date', text='Date')
+        self.history_tree.heading('Mood', text='Mood')
+        self.history_tree.heading('Energy', text='Energy')
+        self.history_tree.heading('Sleep', text='Sleep (h)')
+        self.history_tree.heading('Stress', text='Stress')
+        self.history_tree.heading('Anxiety', text='Anxiety')
+        self.history_tree.heading('Notes', text='Notes')
+        
+        # Configure column widths
+        self.history_tree.column('Date', width=100)
+        self.history_tree.column('Mood', width=50)
+        self.history_tree.column('Energy', width=60)
+        self.history_tree.column('Sleep', width=70)
+        self.history_tree.column('Stress', width=50)
+        self.history_tree.column('Anxiety', width=50)
+        self.history_tree.column('Notes', width=300)
+        
+        # Loaded window state: entry dates in display order
+        self.history_keys = []
+        self.history_exhausted = False
+        self.history_load_pending = False
+        self.history_generation = 0
+        self.history_query = ""
+        
+        # Scrollbars (vertical scrolling pulls in further pages on demand)
+        self.history_scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=self.history_tree.yview)
+        h_scrollbar = ttk.Scrollbar(tree_frame, orient='horizontal', command=self.history_tree.xview)
+        self.history_tree.configure(yscrollcommand=self.on_history_scroll, xscrollcommand=h_scrollbar.set)
+        
+        # Pack treeview and scrollbars
+        self.history_tree.pack(side='left', fill='both', expand=True)
+        self.history_scrollbar.pack(side='right', fill='y')
+        h_scrollbar.pack(side='bottom', fill='x')
+        
+        # Delete button
+        delete_btn = ttk.Button(self.history_frame, text="Delete Selected Entry", 
+                               command=self.delete_entry)
+        delete_btn.pack(pady=(0, 20))
+        
+        self.refresh_history()
+    
+    def create_goals_tab(self):
+        """Create the goals management tab"""
+        # Goals input frame
+        input_frame = ttk.LabelFrame(self.goals_frame, text="Add New Goal", padding=15)
+        input_frame.pack(fill='x', padx=20, pady=20)
+        
+        ttk.Label(input_frame, text="Goal Title:").pack(anchor='w')
+        self.goal_title_var = tk.StringVar()
+        ttk.Entry(input_frame, textvariable=self.goal_title_var).pack(fill='x', pady=(5, 15))
+        
+        ttk.Label(input_frame, text="Description:").pack(anchor='w')
+        self.goal_desc_text = tk.Text(input_frame, height=3, wrap='word')
+        self.goal_desc_text.pack(fill='x', pady=(5, 15))
+        
+        ttk.Label(input_frame, text="Target Date (YYYY-MM-DD):").pack(anchor='w')
+        self.goal_date_var = tk.StringVar()
+        ttk.Entry(input_frame, textvariable=self.goal_date_var).pack(fill='x', pady=(5, 15))
+        
+        ttk.Label(input_frame, text="Track Progress:").pack(anchor='w')
+        track_frame = ttk.Frame(input_frame)
+        track_frame.pack(fill='x', pady=(5, 15))
+        
+        self.goal_track_var = tk.StringVar(value=GOAL_TRACKING[0][0])
+        ttk.Combobox(track_frame, textvariable=self.goal_track_var, state='readonly', width=32,
+                     values=[choice for choice, _, _ in GOAL_TRACKING]).pack(side='left')
+        self.goal_comparison_var = tk.StringVar(value="at least")
+        ttk.Combobox(track_frame, textvariable=self.goal_comparison_var, state='readonly', width=8,
+                     values=list(GOAL_COMPARISON_CHOICES)).pack(side='left', padx=(10, 5))
+        self.goal_target_var = tk.StringVar()
+        ttk.Entry(track_frame, textvariable=self.goal_target_var, width=6).pack(side='left')
+        ttk.Label(track_frame, text="over the last").pack(side='left', padx=5)
+        self.goal_window_var = tk.StringVar(value="30")
+        ttk.Entry(track_frame, textvariable=self.goal_window_var, width=4).pack(side='left')
+        ttk.Label(track_frame, text="days   Activity:").pack(side='left', padx=5)
+        self.goal_activity_var = tk.StringVar()
+        ttk.Entry(track_frame, textvariable=self.goal_activity_var, width=15).pack(side='left')
+        
+        ttk.Button(input_frame, text="Add Goal", command=self.add_goal).pack()
+        
+        # Goals list frame
+        list_frame = ttk.LabelFrame(self.goals_frame, text="Current Goals", padding=15)
+        list_frame.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        
+        # Goals treeview
+        self.goals_tree = ttk.Treeview(list_frame, columns=('Title', 'Description', 'Target Date',
+                                                           'Progress', 'Status'),
+                                      show='headings', height=10)
+        
+        self.goals_tree.heading('Title', text='Title')
+        self.goals_tree.heading('Description', text='Description')
+        self.goals_tree.heading('Target Date', text='Target Date')
+        self.goals_tree.heading('Progress', text='Progress')
+        self.goals_tree.heading('Status', text='Status')
+        
+        self.goals_tree.column('Title', width=120)
+        self.goals_tree.column('Description', width=160)
+        self.goals_tree.column('Target Date', width=90)
+        self.goals_tree.column('Progress', width=300)
+        self.goals_tree.column('Status', width=90)
+        
+        self.goals_tree.pack(fill='both', expand=True)
+        
+        # Goals control buttons
+        goals_btn_frame = ttk.Frame(list_frame)
+        goals_btn_frame.pack(fill='x', pady=(10, 0))
+        
+        ttk.Button(goals_btn_frame, text="Mark Complete", 
+                  command=self.complete_goal).pack(side='left', padx=(0, 10))
+        ttk.Button(goals_btn_frame, text="Delete Goal", 
+                  command=self.delete_goal).pack(side='left')
+        ttk.Button(goals_btn_frame, text="Refresh", 
+                  command=self.refresh_goals).pack(side='right')
+        
+        self.refresh_goals()
+    
+    def create_insights_tab(self):
+        """Create the insights and analytics tab"""
+        # Alerts raised by the anomaly detector as entries were saved
+        alerts_frame = ttk.LabelFrame(self.insights_frame, text="Alerts", padding=15)
+        alerts_frame.pack(fill='x', padx=20, pady=(20, 0))
+        
+        self.alerts_tree = ttk.Treeview(alerts_frame, columns=('Date', 'Alert'),
+                                       show='headings', height=4)
+        self.alerts_tree.heading('Date', text='Date')
+        self.alerts_tree.heading('Alert', text='Alert')
+        self.alerts_tree.column('Date', width=100, stretch=False)
+        self.alerts_tree.column('Alert', width=600)
+        self.alerts_tree.pack(side='left', fill='x', expand=True)
+        
+        ttk.Button(alerts_frame, text="Dismiss",
+                  command=self.dismiss_selected_alerts).pack(side='right', padx=(10, 0))
+        
+        # Analytics frame
+        analytics_frame = ttk.LabelFrame(self.insights_frame, text="Mental Health Analytics", padding=20)
+        analytics_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        
+        self.insights_text = tk.Text(analytics_frame, wrap='word', state='disabled')
+        self.insights_text.pack(fill='both', expand=True)
+        
+        # Refresh button
+        ttk.Button(self.insights_frame, text="Generate Insights", 
+                  command=self.generate_insights).pack(pady=20)
+        
+        self.refresh_alerts()
+    
+    def create_charts_tab(self):
+        """Create the tab charting each metric over time"""
+        controls = ttk.Frame(self.charts_frame)
+        controls.pack(fill='x', padx=20, pady=(20, 5))
+        
+        self.chart_metric_vars = {}
+        for metric, (label, colour) in CHART_METRICS.items():
+            var = tk.BooleanVar(value=True)
+            self.chart_metric_vars[metric] = var
+            tk.Checkbutton(controls, text=label, variable=var, fg=colour,
+                           command=self.draw_chart).pack(side='left')
+        
+        ttk.Button(controls, text="Reset Zoom",
+                  command=self.reset_chart_zoom).pack(side='right')
+        self.chart_method_var = tk.StringVar(value=DOWNSAMPLERS[0])
+        method = ttk.Combobox(controls, textvariable=self.chart_method_var,
+                              values=DOWNSAMPLERS, state='readonly', width=8)
+        method.pack(side='right', padx=10)
+        method.bind('<<ComboboxSelected>>', lambda e: self.draw_chart())
+        
+        self.chart_canvas = tk.Canvas(self.charts_frame, bg='white', highlightthickness=0)
+        self.chart_canvas.pack(fill='both', expand=True, padx=20)
+        
+        self.chart_info_var = tk.StringVar(value="Scroll to zoom, drag to pan")
+        ttk.Label(self.charts_frame, textvariable=self.chart_info_var).pack(pady=(5, 20))
+        
+        # Series per rollup period, the visible date range and the line items
+        self.chart_series = None
+        self.chart_view = None
+        self.chart_lines = {}
+        self.chart_drag_x = None
+        self.chart_redraw_pending = False
+        
+        self.chart_canvas.bind('<Configure>', lambda e: self.schedule_chart_redraw())
+        self.chart_canvas.bind('<MouseWheel>', self.on_chart_wheel)
+        self.chart_canvas.bind('<Button-4>', self.on_chart_wheel)
+        self.chart_canvas.bind('<Button-5>', self.on_chart_wheel)
+        self.chart_canvas.bind('<ButtonPress-1>', self.on_chart_press)
+        self.chart_canvas.bind('<B1-Motion>', self.on_chart_drag)
+        self.chart_canvas.bind('<Double-Button-1>', lambda e: self.reset_chart_zoom())
+    
+    def create_export_tab(self):
+        """Create the data export tab"""
+        export_container = ttk.Frame(self.export_frame)
+        export_container.pack(expand=True)
+        
+        ttk.Label(export_container, text="Export Your Data", 
+                 font=('Arial', 14, 'bold')).pack(pady=20)
+        
+        ttk.Button(export_container, text="Export to JSON", 
+                  command=self.export_to_json).pack(pady=10)
+        ttk.Button(export_container, text="Export to CSV", 
+                  command=self.export_to_csv).pack(pady=10)
+        ttk.Button(export_container, text="Export to NDJSON", 
+                  command=self.export_to_ndjson).pack(pady=10)
+        ttk.Button(export_container, text="Export to Archive", 
+                  command=self.export_to_archive).pack(pady=10)
+        
+        ttk.Label(export_container, text="Import Entries", 
+                 font=('Arial', 14, 'bold')).pack(pady=20)
+        
+        ttk.Button(export_container, text="Import from CSV/JSON/Archive", 
+                  command=self.import_from_file).pack(pady=10)
+        
+        ttk.Label(export_container, text="Backups", 
+                 font=('Arial', 14, 'bold')).pack(pady=20)
+        
+        ttk.Button(export_container, text="Back Up Now", 
+                  command=self.backup_now).pack(pady=10)
+        ttk.Button(export_container, text="Restore from Backup...", 
+                  command=self.restore_backup).pack(pady=10)
+    
+    def create_diagnostics_tab(self):
+        """Create the tab summarising timing spans of database and UI work"""
+        controls = ttk.Frame(self.diagnostics_frame)
+        controls.pack(fill='x', padx=20, pady=20)
+        
+        self.tracing_var = tk.BooleanVar(value=instrumentation.enabled)
+        ttk.Checkbutton(controls, text="Record timings", variable=self.tracing_var,
+                        command=lambda: set_enabled(self.tracing_var.get())).pack(side='left')
+        ttk.Button(controls, text="Refresh",
+                  command=self.refresh_diagnostics).pack(side='left', padx=10)
+        ttk.Button(controls, text="Clear", command=self.clear_diagnostics).pack(side='left')
+        ttk.Button(controls, text="Save Trace...", command=self.save_trace).pack(side='right')
+        ttk.Button(controls, text="Explain Query Plan",
+                  command=self.explain_selected_span).pack(side='right', padx=10)
+        
+        tree_frame = ttk.Frame(self.diagnostics_frame)
+        tree_frame.pack(fill='both', expand=True, padx=20)
+        
+        columns = ('Kind', 'Calls', 'Total', 'Mean', 'Max', 'Rows', 'Name')
+        self.diagnostics_tree = ttk.Treeview(tree_frame, columns=columns, show='headings',
+                                             height=12)
+        headings = {'Total': 'Total ms', 'Mean': 'Mean ms', 'Max': 'Max ms'}
+        widths = {'Kind': 40, 'Calls': 60, 'Total': 80, 'Mean': 70, 'Max': 70, 'Rows': 70,
+                  'Name': 400}
+        for column in columns:
+            self.diagnostics_tree.heading(column, text=headings.get(column, column))
+            self.diagnostics_tree.column(column, width=widths[column],
+                                         anchor='w' if column == 'Name' else 'e')
+        
+        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical',
+                                  command=self.diagnostics_tree.yview)
+        self.diagnostics_tree.configure(yscrollcommand=scrollbar.set)
+        self.diagnostics_tree.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        self.diagnostics_tree.bind('<<TreeviewSelect>>', lambda e: self.show_selected_span())
+        
+        self.diagnostics_text = tk.Text(self.diagnostics_frame, height=8, wrap='word',
+                                        state='disabled')
+        self.diagnostics_text.pack(fill='x', padx=20, pady=20)
+        
+        # Summary groups by treeview iid, for the detail and explain views
+        self.diagnostics_groups = {}
+    
+    def update_mood_label(self, value):
+        """Update mood scale label"""
+        self.mood_label.config(text=str(int(float(value))))
+    
+    def update_energy_label(self, value):
+        """Update energy scale label"""
+        self.energy_label.config(text=str(int(float(value))))
+    
+    def save_entry(self):
+        """Save a new mood entry to the database"""
+        try:
+            # Dates are stored as ISO, so 2024-3-5 is saved as 2024-03-05
+            date = datetime.datetime.strptime(self.date_var.get().strip(), "%Y-%m-%d")
+            entry = coerce_entry({
+                'date': date.date().isoformat(),
+                'mood_score': self.mood_var.get(),
+                'energy_level': self.energy_var.get(),
+                'sleep_hours': self.sleep_var.get(),
+                'stress_level': self.stress_var.get(),
+                'anxiety_level': self.anxiety_var.get(),
+                'notes': self.notes_text.get("1.0", tk.END).strip(),
+                'activities': self.activities_var.get(),
+                'triggers': self.triggers_var.get(),
+                'medications': self.medications_var.get(),
+            })
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid date format or sleep hours: {e}")
+            return
+        date = entry[0]
+        
+        def save(conn, job):
+            entry_id = upsert_entry(conn, entry, commit=False)
+            return entry_id, forecast_mood(conn), fetch_alerts(conn, date=date), fetch_goals(conn)
+        
+        def on_done(result):
+            entry_id, forecast, alerts, goals = result
+            message = "Entry saved successfully!"
+            achieved = []
+            if self.tab_built(self.goals_frame):
+                achieved = [row[1] for row in goals
+                            if row[4] and self.goals_tree.exists(str(row[0]))
+                            and self.goals_tree.set(str(row[0]), 'Status') != "Completed"]
+                self.show_goals(goals)
+            if achieved:
+                message += "\n\n" + "\n".join(f"Goal achieved: {title}" for title in achieved)
+            if forecast is not None:
+                message += "\n\n" + format_forecast(forecast)
+                self.status_var.set(format_forecast(forecast))
+            if alerts:
+                message += "\n\n" + "\n".join(alert['message'] for alert in alerts)
+                self.refresh_alerts()
+            if alerts or forecast is not None and forecast['low']:
+                messagebox.showwarning("Entry Saved", message)
+            else:
+                messagebox.showinfo("Success", message)
+            
+            # Clear form
+            self.clear_form()
+            if self.tab_built(self.history_frame) and not self.history_query:
+                self.remove_history_row(entry_id)
+                self.insert_history_row((entry_id,) + entry[:7])
+        
+        self.worker.submit(save, on_done,
+                           lambda e: messagebox.showerror("Error", f"Failed to save entry: {e}"),
+                           write=True)
+    
+    def clear_form(self):
+        """Clear the entry form"""
+        self.date_var.set(datetime.date.today().strftime("%Y-%m-%d"))
+        self.mood_var.set(5)
+        self.energy_var.set(5)
+        self.sleep_var.set("8")
+        self.stress_var.set(5)
+        self.anxiety_var.set(5)
+        self.activities_var.set("")
+        self.triggers_var.set("")
+        self.medications_var.set("")
+        self.notes_text.delete("1.0", tk.END)
+    
+    def refresh_history(self):
+        """Reset the history treeview and load the first page"""
+        if not self.tab_built(self.history_frame):
+            # Building the tab loads the first page
+            return
+        if self.history_query:
+            self.search_history()
+            return
+        
+        self.reset_history_tree()
+        self.load_history_page()
+    
+    def reset_history_tree(self):
+        """Clear the history treeview and its paging state"""
+        # Clear existing items
+        self.history_tree.delete(*self.history_tree.get_children())
+        self.history_keys = []
+        self.history_exhausted = False
+        # Pages requested before this reset are discarded when they arrive
+        self.history_generation += 1
+        self.history_load_pending = False
+    
+    def search_history(self):
+        """Show the best matching entries for the search box text"""
+        self.history_query = self.search_var.get().strip()
+        self.reset_history_tree()
+        if not self.history_query:
+            self.load_history_page()
+            return
+        
+        # Results are ranked, not paged, so scrolling must not fetch pages
+        self.history_exhausted = True
+        generation = self.history_generation
+        query = self.history_query
+        
+        def on_done(rows):
+            if generation != self.history_generation:
+                return
+            for row in rows:
+                self.history_tree.insert('', 'end', iid=str(row[0]),
+                                         values=self.format_history_row(row, 80))
+                self.history_keys.append(row[1])
+            self.status_var.set(f"{len(rows)} matching entries")
+        
+        self.worker.submit(lambda conn, job: search_entries(conn, query), on_done,
+                           lambda e: messagebox.showerror("Error", f"Search failed: {e}"))
+    
+    def clear_search(self):
+        """Leave search results and go back to the full history"""
+        self.search_var.set("")
+        self.search_history()
+    
+    def load_history_page(self):
+        """Fetch the next page of history using keyset pagination on date"""
+        if self.history_exhausted or self.history_load_pending:
+            return
+        self.history_load_pending = True
+        
+        generation = self.history_generation
+        before_date = self.history_keys[-1] if self.history_keys else None
+        
+        def on_done(rows):
+            if generation != self.history_generation:
+                return
+            self.history_load_pending = False
+            if len(rows) < HISTORY_PAGE_SIZE:
+                self.history_exhausted = True
+            self.mark_startup('history loaded', self.first_paint or self.started)
+            
+            with span('ui', 'history_populate') as s:
+                s.rows = len(rows)
+                for row in rows:
+                    # A row saved while the page was in flight may already be shown
+                    if self.history_tree.exists(str(row[0])):
+                        continue
+                    self.history_tree.insert('', 'end', iid=str(row[0]),
+                                             values=self.format_history_row(row))
+                    self.history_keys.append(row[1])
+        
+        def on_error(e):
+            self.history_load_pending = False
+            messagebox.showerror("Error", f"Failed to load history: {e}")
+        
+        self.worker.submit(lambda conn, job: fetch_history_page(conn, before_date),
+                           on_done, on_error)
+    
+    def format_history_row(self, row, width=50):
+        """Build treeview values from an (id, date, ..., notes) row"""
+        # Truncate notes if too long
+        notes = (row[7] or "").replace("\n", " ")
+        notes = notes[:width] + "..." if len(notes) > width else notes
+        return (row[1], row[2], row[3], row[4], row[5], row[6], notes)
+    
+    def on_history_scroll(self, first, last):
+        """Update the scrollbar and load more rows near the bottom"""
+        self.history_scrollbar.set(first, last)
+        if float(last) >= HISTORY_LOAD_THRESHOLD:
+            self.load_history_page()
+    
+    def insert_history_row(self, row):
+        """Insert a single entry into the loaded window at its sorted position"""
+        index = next((i for i, d in enumerate(self.history_keys) if d < row[1]),
+                     len(self.history_keys))
+        if index == len(self.history_keys) and not self.history_exhausted:
+            # Older than everything loaded; it will arrive with a later page
+            return
+        self.history_keys.insert(index, row[1])
+        self.history_tree.insert('', index, iid=str(row[0]),
+                                 values=self.format_history_row(row))
+    
+    def remove_history_row(self, entry_id):
+        """Remove a single entry from the loaded window"""
+        iid = str(entry_id)
+        if self.history_tree.exists(iid):
+            self.history_keys.pop(self.history_tree.index(iid))
+            self.history_tree.delete(iid)
+    
+    def delete_entry(self):
+        """Delete the selected history entries"""
+        selection = self.history_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select an entry to delete.")
+            return
+        
+        count = len(selection)
+        question = ("Are you sure you want to delete this entry?" if count == 1 else
+                    f"Are you sure you want to delete these {count} entries?")
+        if messagebox.askyesno("Confirm", question):
+            entry_ids = [int(iid) for iid in selection]
+            
+            def on_done(result):
+                for entry_id in entry_ids:
+                    self.remove_history_row(entry_id)
+                self.status_var.set(f"Deleted {count} {'entry' if count == 1 else 'entries'}")
+                self.refresh_goals()
+            
+            self.worker.submit(lambda conn, job: delete_entries(conn, entry_ids, commit=False),
+                               on_done,
+                               lambda e: messagebox.showerror("Error", f"Failed to delete entry: {e}"),
+                               write=True)
+    
+    def add_goal(self):
+        """Add a new goal"""
+        title = self.goal_title_var.get().strip()
+        description = self.goal_desc_text.get("1.0", tk.END).strip()
+        target_date = self.goal_date_var.get().strip()
+        
+        if not title:
+            messagebox.showwarning("Warning", "Please enter a goal title.")
+            return
+        
+        try:
+            if target_date:
+                datetime.datetime.strptime(target_date, "%Y-%m-%d")
+        except ValueError:
+            messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD.")
+            return
+        
+        tracking = {}
+        kind, metric = next((kind, metric) for choice, kind, metric in GOAL_TRACKING
+                            if choice == self.goal_track_var.get())
+        if kind is not None:
+            try:
+                tracking = {
+                    'kind': kind,
+                    'metric': metric or self.goal_activity_var.get().strip(),
+                    'comparison': GOAL_COMPARISON_CHOICES[self.goal_comparison_var.get()],
+                    'target': float(self.goal_target_var.get()),
+                    'window_days': int(self.goal_window_var.get()),
+                }
+            except ValueError:
+                messagebox.showerror("Error", "Enter a number to aim for and a number of days.")
+                return
+        
+        def add(conn, job):
+            goal_id = insert_goal(conn, title, description, target_date, commit=False, **tracking)
+            return next(row for row in fetch_goals(conn) if row[0] == goal_id)
+        
+        def on_done(row):
+            messagebox.showinfo("Success", "Goal added successfully!")
+            
+            # Clear form
+            self.goal_title_var.set("")
+            self.goal_desc_text.delete("1.0", tk.END)
+            self.goal_date_var.set("")
+            self.goal_track_var.set(GOAL_TRACKING[0][0])
+            self.goal_target_var.set("")
+            self.goal_activity_var.set("")
+            
+            self.insert_goal_row(row)
+        
+        self.worker.submit(add,
+                           on_done,
+                           lambda e: messagebox.showerror("Error", f"Failed to add goal: {e}"),
+                           write=True)
+    
+    def refresh_goals(self):
+        """Refresh the goals treeview"""
+        if not self.tab_built(self.goals_frame):
+            # Building the tab loads the goals
+            return
+        
+        def on_done(rows):
+            self.show_goals(rows)
+            self.mark_startup('goals loaded', self.first_paint or self.started)
+        
+        self.worker.submit(lambda conn, job: fetch_goals(conn), on_done,
+                           lambda e: messagebox.showerror("Error", f"Failed to load goals: {e}"))
+    
+    def show_goals(self, rows):
+        """Replace the goals treeview contents with fetch_goals() rows"""
+        with span('ui', 'goals_populate') as s:
+            s.rows = len(rows)
+            self.goals_tree.delete(*self.goals_tree.get_children())
+            
+            for row in rows:
+                self.goals_tree.insert('', 'end', iid=str(row[0]), values=self.goal_values(row),
+                                       tags=(str(row[0]),))
+    
+    def goal_values(self, row):
+        """Treeview values for a fetch_goals() row"""
+        status = "Completed" if row[4] else "In Progress"
+        description = row[2][:100] + "..." if len(row[2]) > 100 else row[2]
+        return (row[1], description, row[3] or "No target", format_goal(row), status)
+    
+    def goal_sort_key(self, iid):
+        """Sort key matching fetch_goals(): open goals first, then by target date"""
+        target = self.goals_tree.set(iid, 'Target Date')
+        status = self.goals_tree.set(iid, 'Status')
+        return (status == "Completed", "" if target == "No target" else target)
+    
+    def insert_goal_row(self, row):
+        """Insert a single fetch_goals() row at its sorted position"""
+        iid = str(row[0])
+        self.goals_tree.insert('', 'end', iid=iid, values=self.goal_values(row), tags=(iid,))
+        self.move_goal_row(iid)
+    
+    def move_goal_row(self, iid):
+        """Move a goal row to where fetch_goals() would have put it"""
+        self.goals_tree.detach(iid)
+        key = self.goal_sort_key(iid)
+        children = self.goals_tree.get_children()
+        index = next((i for i, child in enumerate(children)
+                      if self.goal_sort_key(child) > key), len(children))
+        self.goals_tree.move(iid, '', index)
+    
+    def selected_goal_ids(self, action):
+        """Ids of the selected goals, warning if there are none"""
+        selection = self.goals_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", f"Please select a goal to {action}.")
+        return [int(self.goals_tree.item(iid)['tags'][0]) for iid in selection]
+    
+    def complete_goal(self):
+        """Mark the selected goals as complete"""
+        goal_ids = self.selected_goal_ids("complete")
+        if not goal_ids:
+            return
+        
+        def on_done(result):
+            for goal_id in goal_ids:
+                iid = str(goal_id)
+                if self.goals_tree.exists(iid):
+                    self.goals_tree.set(iid, 'Status', "Completed")
+                    self.move_goal_row(iid)
+            self.status_var.set(f"Completed {len(goal_ids)} "
+                                f"{'goal' if len(goal_ids) == 1 else 'goals'}")
+        
+        self.worker.submit(lambda conn, job: set_goals_completed(conn, goal_ids, commit=False),
+                           on_done,
+                           lambda e: messagebox.showerror("Error", f"Failed to update goal: {e}"),
+                           write=True)
+    
+    def delete_goal(self):
+        """Delete the selected goals"""
+        goal_ids = self.selected_goal_ids("delete")
+        if not goal_ids:
+            return
+        
+        count = len(goal_ids)
+        question = ("Are you sure you want to delete this goal?" if count == 1 else
+                    f"Are you sure you want to delete these {count} goals?")
+        if messagebox.askyesno("Confirm", question):
+            def on_done(result):
+                for goal_id in goal_ids:
+                    if self.goals_tree.exists(str(goal_id)):
+                        self.goals_tree.delete(str(goal_id))
+                self.status_var.set(f"Deleted {count} {'goal' if count == 1 else 'goals'}")
+            
+            self.worker.submit(lambda conn, job: delete_goals(conn, goal_ids, commit=False),
+                               on_done,
+                               lambda e: messagebox.showerror("Error", f"Failed to delete goal: {e}"),
+                               write=True)
+    
+    def set_insights_text(self, text):
+        """Replace the contents of the read-only insights widget"""
+        with span('ui', 'insights_render'):
+            self.insights_text.config(state='normal')
+            self.insights_text.delete("1.0", tk.END)
+            self.insights_text.insert(tk.END, text)
+            self.insights_text.config(state='disabled')
+    
+    def refresh_alerts(self):
+        """Reload the undismissed alerts"""
+        if not self.tab_built(self.insights_frame):
+            return
+        
+        def on_done(alerts):
+            self.alerts_tree.delete(*self.alerts_tree.get_children())
+            for alert in alerts:
+                self.alerts_tree.insert('', 'end', iid=str(alert['id']),
+                                        values=(alert['date'], alert['message']))
+        
+        self.worker.submit(lambda conn, job: fetch_alerts(conn), on_done,
+                           lambda e: messagebox.showerror("Error", f"Failed to load alerts: {e}"))
+    
+    def dismiss_selected_alerts(self):
+        """Dismiss the selected alerts"""
+        alert_ids = [int(iid) for iid in self.alerts_tree.selection()]
+        if not alert_ids:
+            messagebox.showwarning("Warning", "Please select alerts to dismiss")
+            return
+        
+        def on_done(result):
+            self.alerts_tree.delete(*[str(i) for i in alert_ids])
+        
+        self.worker.submit(lambda conn, job: dismiss_alerts(conn, alert_ids, commit=False),
+                           on_done,
+                           lambda e: messagebox.showerror("Error", f"Failed to dismiss alerts: {e}"),
+                           write=True)
+    
+    def generate_insights(self):
+        """Generate insights based on historical data"""
+        self.set_insights_text("Generating insights...\n")
+        self.refresh_alerts()
+        
+        def on_error(e):
+            if isinstance(e, JobCancelled):
+                self.set_insights_text("Insights cancelled.\n")
+            else:
+                self.set_insights_text(f"Error generating insights: {e}")
+        
+        self.start_long_job("Generating insights...", build_insights_report,
+                            self.set_insights_text, on_error)
+    
+    def on_tab_changed(self, event):
+        """Build a tab on first selection; reload the chart series or the
+        timings whenever their tab is shown"""
+        selected = self.notebook.select()
+        self.build_tab(selected)
+        if selected == str(self.charts_frame):
+            self.load_charts()
+        elif selected == str(self.diagnostics_frame):
+            self.refresh_diagnostics()
+    
+    def load_charts(self):
+        """Read the rollup series in the background and redraw"""
+        def on_done(series):
+            self.chart_series = series
+            full = series_range(series)
+            if self.chart_view is None or full is None:
+                self.chart_view = full
+            self.draw_chart()
+        
+        self.worker.submit(lambda conn, job: load_chart_series(conn), on_done,
+                           lambda e: self.chart_info_var.set(f"Failed to load charts: {e}"))
+    
+    def schedule_chart_redraw(self):
+        """Coalesce bursts of resize events into one redraw"""
+        if not self.chart_redraw_pending:
+            self.chart_redraw_pending = True
+            self.root.after_idle(self.draw_chart)
+    
+    def draw_chart(self):
+        """Draw the visible range of each selected metric"""
+        self.chart_redraw_pending = False
+        canvas = self.chart_canvas
+        if self.chart_series is None:
+            return
+        if self.chart_view is None:
+            canvas.delete('all')
+            self.chart_lines = {}
+            canvas.create_text(canvas.winfo_width() // 2, canvas.winfo_height() // 2,
+                               text="No entries to chart yet", tags='axis')
+            return
+        
+        start = time.perf_counter()
+        width = canvas.winfo_width() - CHART_MARGIN_LEFT - CHART_MARGIN
+        height = canvas.winfo_height() - CHART_MARGIN - CHART_MARGIN_BOTTOM
+        if width < 10 or height < 10:
+            return
+        
+        metrics = [m for m, var in self.chart_metric_vars.items() if var.get()]
+        period, lines = chart_points(self.chart_series, self.chart_view, width, height,
+                                     metrics, self.chart_method_var.get(),
+                                     CHART_MARGIN_LEFT, CHART_MARGIN)
+        
+        self.draw_chart_axes(width, height)
+        for metric in CHART_METRICS:
+            coords = lines.get(metric, [])
+            item = self.chart_lines.get(metric)
+            # A line needs at least two points
+            if len(coords) < 4:
+                if item:
+                    canvas.delete(item)
+                    del self.chart_lines[metric]
+                continue
+            if item:
+                canvas.coords(item, coords)
+            else:
+                self.chart_lines[metric] = canvas.create_line(
+                    coords, fill=CHART_METRICS[metric][1], width=2)
+        
+        points = sum(len(c) // 2 for c in lines.values())
+        elapsed = (time.perf_counter() - start) * 1e3
+        add_span('ui', 'chart_draw', elapsed / 1e3, points, start)
+        self.chart_info_var.set(f"{period.capitalize()} averages, {points} points "
+                                f"drawn in {elapsed:.1f} ms. Scroll to zoom, drag to pan, "
+                                f"double-click to reset.")
+    
+    def draw_chart_axes(self, width, height):
+        """Redraw the grid and axis labels for a width x height plot"""
+        canvas = self.chart_canvas
+        canvas.delete('axis')
+        left, top = CHART_MARGIN_LEFT, CHART_MARGIN
+        for value in range(0, CHART_Y_MAX + 1, 2):
+            y = top + height - value * height / CHART_Y_MAX
+            canvas.create_line(left, y, left + width, y, fill='#e6e6e6', tags='axis')
+            canvas.create_text(left - 8, y, text=str(value), anchor='e', tags='axis')
+        
+        x0, x1 = self.chart_view
+        for ordinal, label in date_ticks(x0, x1):
+            x = left + (ordinal - x0) * width / ((x1 - x0) or 1)
+            canvas.create_line(x, top + height, x, top + height + 5, tags='axis')
+            canvas.create_text(x, top + height + 8, text=label, anchor='n', tags='axis')
+        canvas.tag_lower('axis')
+    
+    def chart_ordinal_at(self, x):
+        """Date ordinal under canvas x coordinate `x`"""
+        x0, x1 = self.chart_view
+        width = max(self.chart_canvas.winfo_width() - CHART_MARGIN_LEFT - CHART_MARGIN, 1)
+        return x0 + (x - CHART_MARGIN_LEFT) * (x1 - x0) / width
+    
+    def on_chart_wheel(self, event):
+        """Zoom in or out around the date under the pointer"""
+        if not self.chart_view:
+            return
+        zoom_in = event.num == 4 or event.delta > 0
+        factor = 1 / CHART_ZOOM_STEP if zoom_in else CHART_ZOOM_STEP
+        full = series_range(self.chart_series)
+        centre = self.chart_ordinal_at(event.x)
+        x0, x1 = self.chart_view
+        span = min(max((x1 - x0) * factor, CHART_MIN_DAYS), (full[1] - full[0]) or 1)
+        ratio = (centre - x0) / ((x1 - x0) or 1)
+        self.set_chart_view(centre - span * ratio, span)
+    
+    def on_chart_press(self, event):
+        """Remember where a drag started"""
+        self.chart_drag_x = event.x
+    
+    def on_chart_drag(self, event):
+        """Pan the chart with the mouse"""
+        if not self.chart_view or self.chart_drag_x is None:
+            return
+        shift = self.chart_ordinal_at(self.chart_drag_x) - self.chart_ordinal_at(event.x)
+        self.chart_drag_x = event.x
+        x0, x1 = self.chart_view
+        self.set_chart_view(x0 + shift, x1 - x0)
+    
+    def set_chart_view(self, start, span):
+        """Show `span` days from `start`, kept within the charted history"""
+        first, last = series_range(self.chart_series)
+        start = min(max(start, first), max(last - span, first))
+        self.chart_view = (start, start + span)
+        self.schedule_chart_redraw()
+    
+    def reset_chart_zoom(self):
+        """Show the whole history"""
+        if self.chart_series is not None:
+            self.chart_view = series_range(self.chart_series)
+            self.draw_chart()
+    
+    def refresh_diagnostics(self):
+        """Show the totals of the recorded spans, largest first"""
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        self.diagnostics_groups = {}
+        for i, group in enumerate(summarize()):
+            iid = str(i)
+            self.diagnostics_groups[iid] = group
+            rows = "" if group['rows'] is None else group['rows']
+            self.diagnostics_tree.insert('', 'end', iid=iid, values=(
+                group['category'], group['calls'], f"{group['seconds'] * 1e3:.2f}",
+                f"{group['seconds'] / group['calls'] * 1e3:.2f}",
+                f"{group['max_seconds'] * 1e3:.2f}", rows, group['name']))
+        text = self.format_startup_report()
+        if not instrumentation.enabled and not self.diagnostics_groups:
+            text += ("\n\nTick \"Record timings\" and use the app; the time spent in each SQL "
+                     "statement, database call and view update is summarised above.")
+        self.set_diagnostics_text(text)
+    
+    def selected_group(self):
+        """The summary group of the selected Diagnostics row, or None"""
+        selection = self.diagnostics_tree.selection()
+        return self.diagnostics_groups.get(selection[0]) if selection else None
+    
+    def set_diagnostics_text(self, text):
+        """Replace the contents of the read-only diagnostics detail widget"""
+        self.diagnostics_text.config(state='normal')
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.insert(tk.END, text)
+        self.diagnostics_text.config(state='disabled')
+    
+    def show_selected_span(self):
+        """Show the statement and parameters of the selected group's slowest span"""
+        group = self.selected_group()
+        if group is None:
+            return
+        slowest = group['slowest']
+        text = f"Slowest call: {slowest.seconds * 1e3:.2f} ms on thread {slowest.thread}\n"
+        if slowest.sql is not None:
+            text += f"\n{slowest.sql.strip()}\n\nParameters: {slowest.parameters!r}\n"
+        self.set_diagnostics_text(text)
+    
+    def explain_selected_span(self):
+        """Run EXPLAIN QUERY PLAN for the selected statement"""
+        group = self.selected_group()
+        if group is None or group['slowest'].sql is None:
+            messagebox.showwarning("Warning", "Please select an SQL statement to explain.")
+            return
+        
+        slowest = group['slowest']
+        self.worker.submit(
+            lambda conn, job: explain_query_plan(conn, slowest.sql, slowest.parameters),
+            lambda plan: self.set_diagnostics_text(f"{slowest.sql.strip()}\n\nQuery plan:\n{plan}"),
+            lambda e: self.set_diagnostics_text(f"Could not explain this statement: {e}"))
+    
+    def clear_diagnostics(self):
+        """Forget the recorded spans"""
+        clear_spans()
+        self.set_diagnostics_text("")
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        self.diagnostics_groups = {}
+    
+    def save_trace(self):
+        """Write the recorded spans to a Chrome trace file"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Trace files", "*.json"), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        try:
+            count = write_trace(filename)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save trace: {e}")
+            return
+        self.status_var.set(f"Saved {count} spans to {filename}")
+    
+    def export_to_json(self):
+        """Export data to JSON format"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        self.start_export(filename, export_json)
+    
+    def export_to_csv(self):
+        """Export mood entries to CSV format"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        self.start_export(filename, export_csv)
+    
+    def export_to_ndjson(self):
+        """Export data to newline-delimited JSON format"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".ndjson",
+            filetypes=[("NDJSON files", "*.ndjson"), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        self.start_export(filename, export_ndjson)
+    
+    def export_to_archive(self):
+        """Export mood entries to the compact binary archive format"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=ARCHIVE_EXTENSION,
+            filetypes=[("Archive files", "*" + ARCHIVE_EXTENSION), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        self.start_export(filename, export_archive)
+    
+    def import_from_file(self):
+        """Bulk import mood entries from a CSV, JSON, NDJSON or archive file"""
+        filename = filedialog.askopenfilename(
+            filetypes=[("Supported files", "*.csv *.json *.ndjson *.jsonl *" + ARCHIVE_EXTENSION),
+                       ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        def on_done(stats):
+            messagebox.showinfo("Import Complete", format_import_stats(stats))
+            self.refresh_history()
+            self.refresh_goals()
+        
+        def on_error(e):
+            if isinstance(e, JobCancelled):
+                self.status_var.set("Import cancelled")
+            else:
+                messagebox.showerror("Error", f"Failed to import data: {e}")
+        
+        self.start_long_job("Importing...", lambda conn, job: import_entries(conn, filename, job),
+                            on_done, on_error)
+    
+    def backup_now(self):
+        """Take a snapshot in the background"""
+        self.status_var.set("Backing up...")
+        threading.Thread(target=self.backups.snapshot_now, daemon=True).start()
+    
+    def on_backup_done(self, manifest):
+        """Report a finished snapshot in the status bar"""
+        self.status_var.set(f"Backed up {format_snapshot(manifest)}")
+    
+    def on_backup_error(self, e):
+        """Report a failed snapshot in the status bar"""
+        self.status_var.set(f"Backup failed: {e}")
+    
+    def restore_backup(self):
+        """Replace the current data with a chosen snapshot"""
+        filename = filedialog.askopenfilename(
+            initialdir=self.backups.backup_dir if os.path.isdir(self.backups.backup_dir) else None,
+            filetypes=[("Snapshots", "*" + SNAPSHOT_SUFFIX), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        if not messagebox.askyesno("Confirm", "Replace all current data with this backup? "
+                                              "The current data is backed up first."):
+            return
+        
+        def on_done(manifest):
+            self.status_var.set(f"Restored {format_snapshot(manifest)}")
+            self.refresh_history()
+            self.refresh_goals()
+            self.refresh_alerts()
+        
+        self.start_long_job("Restoring...",
+                            lambda conn, job: restore_snapshot(conn, os.path.dirname(filename),
+                                                               os.path.basename(filename)),
+                            on_done,
+                            lambda e: messagebox.showerror("Error", f"Failed to restore backup: {e}"))
+    
+    def start_export(self, filename, exporter):
+        """Run an exporter in the background and report the outcome"""
+        def on_error(e):
+            if isinstance(e, JobCancelled):
+                self.status_var.set("Export cancelled")
+            else:
+                messagebox.showerror("Error", f"Failed to export data: {e}")
+        
+        self.start_long_job("Exporting...", lambda conn, job: exporter(conn, filename, job),
+                            lambda stats: messagebox.showinfo(
+                                "Success", f"Data exported to {filename}\n{format_export_stats(stats)}"),
+                            on_error)
+    
+    def start_long_job(self, message, func, on_done, on_error):
+        """Queue a cancellable job and track it in the status bar"""
+        if self.current_job:
+            messagebox.showwarning("Warning", "Please wait for the current task to finish.")
+            return
+        
+        def finish(callback, arg):
+            self.current_job = None
+            self.progress_bar['value'] = 0
+            self.cancel_btn.config(state='disabled')
+            self.status_var.set("Ready")
+            callback(arg)
+        
+        self.status_var.set(message)
+        self.cancel_btn.config(state='normal')
+        self.current_job = self.worker.submit(
+            func,
+            lambda result: finish(on_done, result),
+            lambda e: finish(on_error, e),
+            self.update_progress,
+        )
+    
+    def update_progress(self, fraction, message):
+        """Show progress reported by the running job"""
+        self.progress_bar['value'] = fraction * 100
+        if message:
+            self.status_var.set(message)
+    
+    def cancel_current_job(self):
+        """Cancel the running long job, if any"""
+        if self.current_job:
+            self.current_job.cancel()
+            self.status_var.set("Cancelling...")
+    
+    def poll_worker(self):
+        """Deliver finished database work to the GUI thread"""
+        self.worker.dispatch_results()
+        self.root.after(WORKER_POLL_MS, self.poll_worker)
+    
+    def run(self):
+        """Start the application"""
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.root.mainloop()
+    
+    def on_closing(self):
+        """Handle application closing"""
+        if self.current_job:
+            self.current_job.cancel()
+        self.backups.stop()
+        self.worker.stop()
+        self.root.destroy()